@@ -1,19 +1,36 @@
 import os
 import sys
+import time
 import threading
+import multiprocessing
 from PyQt6.QtWidgets import QApplication, QMainWindow, QVBoxLayout, QWidget
 from PyQt6.QtWebEngineWidgets import QWebEngineView
-from PyQt6.QtCore import QUrl
+from PyQt6.QtNetwork import QNetworkAccessManager, QNetworkRequest, QNetworkReply
+from PyQt6.QtCore import QUrl, QTimer
 from PyQt6.QtGui import QIcon
-from app import run_flask  # Importa a função para rodar o Flask
 
 sys.dont_write_bytecode = True # Desativa o __pycache__
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
+URL_SERVIDOR = "http://127.0.0.1:5000"
+INTERVALO_SAUDE_MS = 100        # Intervalo entre as consultas a /saude
+TEMPO_MAX_PARTIDA_S = 60        # Sem resposta até lá, mostra o erro
+
+TELA_CARREGANDO = """
+<html><body style="margin:0;height:100vh;display:flex;align-items:center;justify-content:center;
+font-family:sans-serif;color:#555;background:#f5f5f5">Iniciando o Leitor...</body></html>
+"""
+TELA_ERRO = """
+<html><body style="margin:0;height:100vh;display:flex;align-items:center;justify-content:center;
+font-family:sans-serif;color:#a00;background:#f5f5f5">Não foi possível iniciar o servidor do Leitor.</body></html>
+"""
+
 class FlaskThread(threading.Thread):
     """Thread para rodar o Flask sem bloquear a UI."""
     def run(self):
+        # Importado aqui: a janela aparece sem esperar pelo app
+        from app import run_flask
         run_flask()
 
 def resource_path(relative_path):
@@ -27,8 +44,9 @@ def resource_path(relative_path):
 
 
 class MainWindow(QMainWindow):
-    def __init__(self):
+    def __init__(self, servidor: threading.Thread):
         super().__init__()
+        self.servidor = servidor
         self.setWindowTitle("Leitor - Desktop")
         self.resize(1920, 1080)
         self.center_window()
@@ -46,7 +64,8 @@ class MainWindow(QMainWindow):
 
         # Criar um widget de navegador embutido
         self.browser = QWebEngineView()
-        self.browser.setUrl(QUrl("http://127.0.0.1:5000"))   # Carrega a interface Flask
+        self.browser.setHtml(TELA_CARREGANDO)
+        self.aguardar_servidor()   # Carrega a interface Flask quando ela responder
 
         # Layout da interface
         layout = QVBoxLayout()
@@ -56,13 +75,37 @@ class MainWindow(QMainWindow):
         container.setLayout(layout)
         self.setCentralWidget(container)
 
-# Iniciar o Flask em uma thread separada
-flask_thread = FlaskThread()
-flask_thread.daemon = True
-flask_thread.start()
+    def aguardar_servidor(self):
+        """Consulta /saude (sem bloquear a UI) até o Flask responder."""
+        self.rede = QNetworkAccessManager(self)
+        self.inicio_espera = time.monotonic()
+        self.consultar_saude()
+
+    def consultar_saude(self):
+        resposta = self.rede.get(QNetworkRequest(QUrl(URL_SERVIDOR + "/saude")))
+        resposta.finished.connect(lambda: self.saude_respondida(resposta))
+
+    def saude_respondida(self, resposta):
+        pronto = resposta.error() == QNetworkReply.NetworkError.NoError
+        resposta.deleteLater()
+        if pronto:
+            self.browser.setUrl(QUrl(URL_SERVIDOR))
+        elif not self.servidor.is_alive() or time.monotonic() - self.inicio_espera > TEMPO_MAX_PARTIDA_S:
+            self.browser.setHtml(TELA_ERRO)
+        else:
+            QTimer.singleShot(INTERVALO_SAUDE_MS, self.consultar_saude)
+
+if __name__ == "__main__":
+    # Necessário para os processos de renderização (spawn) no executável empacotado
+    multiprocessing.freeze_support()
+
+    # Iniciar o Flask em uma thread separada
+    flask_thread = FlaskThread()
+    flask_thread.daemon = True
+    flask_thread.start()
 
-# Iniciar a aplicação Qt
-app = QApplication(sys.argv)
-window = MainWindow()
-window.showMaximized()
-sys.exit(app.exec())
+    # Iniciar a aplicação Qt
+    app = QApplication(sys.argv)
+    window = MainWindow(flask_thread)
+    window.showMaximized()
+    sys.exit(app.exec())
@@ -1,32 +1,33 @@
-import os
 import sys
 import json
-import pickle
-import google.generativeai as genai
-from flask import Flask, request, render_template, redirect, url_for, flash, session
-from markdown import markdown
+from flask import Flask, request, render_template, redirect, url_for, flash, get_flashed_messages, session, jsonify, Response, stream_with_context
 import logging
 logger = logging.getLogger(__name__)
 
 from src.utils.constantes import Constantes, Caminhos
 from src.modules.funcoes import Arquivo, Gemini
+from src.modules.tarefas import GerenciadorTarefas, ColetorEspacos
+from src.modules.armazenamento import ResultadosTarefa
+from src.modules.resultado import Resultado
+from src.modules.exportacao import Exportacao
+from src.modules.cache import CacheRespostas
+from src.modules.imagem import PoliticaImagem
+from src.modules.agendador import AgendadorGemini
+from src.modules.metricas import Metricas
+from src.modules.consumo import Consumo
+from src.modules.inicializacao import Aquecimento
 from src.utils.prompts import Prompts
 
 # Evita criação de __pycache__
 sys.dont_write_bytecode = True
 
-# === Configuração do Gemini ===
-print("\n🔌 Configurando conexão com Gemini...")
-try:
-    genai.configure(api_key=Constantes.CHAVE_API_GEMINI)
-    modelo = genai.GenerativeModel(
-        model_name=Constantes.MODELO_GEMINI,
-        generation_config=Constantes.CONFIG_GEMINI
-    )
-    print("✅ Conexão com Gemini configurada com sucesso")
-except Exception as e:
-    print(f"❌ Erro na configuração do Gemini: {str(e)}")
-    raise
+# === Configuração do Gemini (no primeiro uso ou no aquecimento, não na importação) ===
+def obter_modelo():
+    try:
+        return Gemini.modelo()
+    except Exception as e:
+        print(f"❌ Erro na configuração do Gemini: {str(e)}")
+        raise
 
 # === Configuração do Flask ===
 app = Flask(
@@ -36,15 +37,31 @@ app = Flask(
 )
 app.secret_key = Constantes.CHAVE_FLASK
 app.config["UPLOAD_FOLDER"] = Constantes.PASTA_UPLOAD
+# Envios maiores são recusados (413) antes de o corpo ser lido
+app.config["MAX_CONTENT_LENGTH"] = Constantes.TAMANHO_MAX_ENVIO_MB * 1024 * 1024
 
-# Garante que as pastas existem
+# Garante que as pastas existem e remove em segundo plano os espaços abandonados
 Arquivo.criar_pastas()
+ColetorEspacos.iniciar()
+
+# Estatísticas exportadas junto com os histogramas em /metrics
+Metricas.registrar_coletor("gemini", AgendadorGemini.estatisticas)
+Metricas.registrar_coletor("cache", CacheRespostas.estatisticas)
+Metricas.registrar_coletor("imagens", PoliticaImagem.estatisticas)
 
 # === Rota inicial ===
 @app.route("/", methods=["GET"])
 def index():
+    # A tarefa anterior fica marcada para o /limpar enviado pela página inicial
+    anterior = session.get("job_id")
+    # Os avisos pendentes são lidos antes da limpeza (o Flask os guarda até o template)
+    get_flashed_messages()
     session.clear()
-    return render_template("upload.html")
+    if anterior:
+        session["job_anterior"] = anterior
+    # Tarefa anterior interrompida ou com páginas com erro: oferece a retomada
+    retomar_id = anterior if anterior and GerenciadorTarefas.retomavel(anterior) else None
+    return render_template("upload.html", retomar_id=retomar_id)
 
 
 
@@ -71,6 +88,9 @@ def upload_arquivo():
     function_option = request.form.get("function_option", "text_analysis")  # Nome do radio group
     sub_option = request.form.get("analysis_type") if function_option == "text_analysis" else None
     target_lang = request.form.get("target_lang", "en") if function_option == "translation" else None
+    modo_leitura = request.form.get("modo_leitura", Constantes.MODO_LEITURA_PADRAO)
+    if modo_leitura not in ("auto", "texto", "imagem"):
+        modo_leitura = Constantes.MODO_LEITURA_PADRAO
     
     print(f"\n📌 Opções selecionadas pelo usuário:")
     print(f"   - Função principal: {function_option}")
@@ -78,6 +98,13 @@ def upload_arquivo():
 
     if function_option == "translation":
         print(f"   - Idioma de destino: {target_lang}")
+    print(f"   - Leitura das páginas: {modo_leitura}")
+    if "ignorar_cache" in request.form:
+        print("   - Cache de respostas: ignorado")
+    # Orçamento de tokens da tarefa (vazio ou inválido = padrão do servidor)
+    orcamento = request.form.get("orcamento_tokens", type=int) or Constantes.ORCAMENTO_TOKENS_TAREFA
+    if orcamento:
+        print(f"   - Orçamento de tokens: {orcamento:,}")
     
     # Debug avançado
     logger.debug(f"Valores do formulário: {request.form.to_dict()}")
@@ -93,331 +120,309 @@ def upload_arquivo():
         "function_option": function_option,
         "analysis_type": sub_option, 
         "target_lang": target_lang,
-        "sort_alpha": "sort_alpha" in request.form
+        "sort_alpha": "sort_alpha" in request.form,
+        "usar_cache": "ignorar_cache" not in request.form,
+        "modo_leitura": modo_leitura
     })
 
     # CORREÇÃO: Montagem do prompt com todas as opções
-    prompt_text = Prompts.get_prompt(function_option, sub_option)
-    
-    if function_option == "text_analysis":
-        if sub_option == "summary":
-            prompt_text += Prompts.PROMPT_ANALISE_TEXTO_RESUMO
+    prompt_text = Prompts.montar_prompt(function_option, sub_option, target_lang)
+    print(f"   - Prompt configurado: {prompt_text[:200]}...")  # Log parcial do prompt
+
+    # Espaço próprio da tarefa: o prompt fica no disco, não no cookie,
+    # e os arquivos e imagens não se misturam com os de outras sessões
+    metadados = {
+        "prompt": prompt_text,
+        "prompt_option": function_option,
+        "sub_prompt_option": sub_option,
+        "target_language": target_lang,
+        "modo_leitura": modo_leitura,
+        "usar_cache": session["usar_cache"],
+    }
+    armazenamento = ResultadosTarefa.criar(metadados)
+
+    # Salva os arquivos; a conversão em imagens acontece durante o processamento
+    print("\n🔄 Processando arquivos recebidos...")
+    rejeitados = []
+    resultados = Arquivo.processar_arquivos(arquivos, rejeitados, armazenamento.pasta_uploads)
+    for motivo in rejeitados:
+        print(f"⚠️ Arquivo recusado: {motivo}")
+        flash(f"Arquivo recusado: {motivo}")
+    total_paginas = sum(r["paginas"] for r in resultados)
+
+    if not total_paginas:
+        print("❌ Falha: Nenhuma página foi encontrada nos arquivos enviados")
+        flash("Nenhum arquivo foi processado corretamente.")
+        armazenamento.remover()
+        return render_template("upload.html")
 
-        elif sub_option == "full_extraction":
-            prompt_text += Prompts.PROMPT_ANALISE_TEXTO
+    print(f"✅ {total_paginas} página(s) encontrada(s), renderização sob demanda")
+
+    # Estimativa de tokens antes de renderizar e enviar as páginas
+    tamanho_lote = Constantes.LOTE_PAGINAS.get(function_option, 1)
+    estimativa = Consumo.estimar(total_paginas, prompt_text, tamanho_lote)
+    print(f"   - Estimativa: ~{estimativa['tokens_total']:,} tokens em {estimativa['chamadas']} chamada(s)")
+    if orcamento and estimativa["tokens_total"] > orcamento:
+        print(f"⚠️ Estimativa acima do orçamento; a tarefa será interrompida ao atingir {orcamento:,} tokens")
+
+    metadados.update({
+        "total_paginas": total_paginas,
+        "arquivos": [r["arquivo"] for r in resultados],
+        # Arquivos salvos e lote, para retomar a tarefa (GerenciadorTarefas.retomar)
+        "documentos": resultados,
+        "tamanho_lote": tamanho_lote,
+        "estimativa_tokens": estimativa,
+        "orcamento_tokens": orcamento,
+    })
+    armazenamento.salvar_metadados(metadados)
 
-        elif sub_option == "sanitize":
-            prompt_text += Prompts.PROMPT_ANALISE_TEXTO_HIGIENIZAR
+    # Envia todas as páginas para o pool em segundo plano
+    tarefa = GerenciadorTarefas.criar(
+        Arquivo.gerar_paginas(resultados, modo_leitura, armazenamento.pasta_imagens), total_paginas, obter_modelo(), prompt_text,
+        armazenamento, usar_cache=session["usar_cache"],
+        tamanho_lote=tamanho_lote
+    )
+    session["job_id"] = tarefa.id
 
-    elif function_option == "translation":
-        prompt_text += f"\n\nTraduzir para: {target_lang}\n"
+    print(f"\n⏳ Tarefa {tarefa.id} iniciada, redirecionando para acompanhamento...")
+    return redirect(url_for("process_page"))
 
-    elif function_option == "math_operation":
-        prompt_text += Prompts.PROMPT_OPERACAO_MATEMATICA
 
-    elif function_option == "ai_check":
-        prompt_text += Prompts.PROMPT_CHECAGEM_IA
 
-    session["prompt"] = prompt_text
-    print(f"   - Prompt configurado: {prompt_text[:200]}...")  # Log parcial do prompt
 
-    # Processamento de arquivos (mantido igual)
-    print("\n🔄 Processando arquivos recebidos...")
-    resultados = Arquivo.processar_arquivos(arquivos)
-    imagens = []
-    for r in resultados:
-        imagens += r.get("imagens", [])
+# === Envio acima de MAX_CONTENT_LENGTH ===
+@app.errorhandler(413)
+def envio_grande_demais(e):
+    print(f"❌ Erro: Envio acima de {Constantes.TAMANHO_MAX_ENVIO_MB} MB")
+    flash(f"O envio excede o limite de {Constantes.TAMANHO_MAX_ENVIO_MB} MB.")
+    return render_template("upload.html"), 413
 
-    if not imagens:
-        print("❌ Falha: Nenhuma imagem foi processada corretamente")
-        flash("Nenhum arquivo foi processado corretamente.")
-        return render_template("upload.html")
 
-    print(f"✅ {len(imagens)} imagem(s) processada(s) com sucesso")
+def tarefa_da_sessao(job_id) -> bool:
+    """
+    Indica se a tarefa é a desta sessão (a atual ou a anterior, oferecida
+    para retomada): conhecer o id não basta para acompanhar, exportar ou
+    retomar a tarefa de outro usuário.
+    """
+    return bool(job_id) and job_id in (session.get("job_id"), session.get("job_anterior"))
 
-    # Cria os pickles temporários (mantido igual)
-    session["images_file"] = Arquivo.salvar_dados_temp(imagens, "images.pkl")
-    session["results_file"] = Arquivo.salvar_dados_temp([], "results.pkl")
-    session["raw_file"] = Arquivo.salvar_dados_temp([], "raw_results.pkl")
-    session["current_page"] = 0
 
-    print("\n⏳ Redirecionando para processamento...")
-    return redirect(url_for("process_page"))
+def obter_tarefa(job_id):
+    """
+    Tarefa deste worker, de outro worker vivo (TarefaRemota) ou, após um
+    reinício do servidor, retomada do disco.
+    """
+    tarefa = GerenciadorTarefas.localizar(job_id)
+    if tarefa is None and job_id:
+        tarefa = GerenciadorTarefas.retomar(job_id, obter_modelo())
+        if tarefa is not None:
+            print(f"🔁 Tarefa {job_id} retomada do disco")
+    return tarefa
 
 
+# === Rota de retomada (páginas que faltam ou falharam) ===
+@app.route("/retomar/<job_id>", methods=["POST"])
+def retomar_tarefa(job_id):
+    tarefa = GerenciadorTarefas.retomar(job_id, obter_modelo()) if tarefa_da_sessao(job_id) else None
+    if tarefa is None:
+        flash("Não foi possível retomar a tarefa.")
+        return redirect(url_for("index"))
+    print(f"🔁 Tarefa {job_id} retomada a pedido do usuário")
+    session.pop("job_anterior", None)
+    session["job_id"] = tarefa.id
+    return redirect(url_for("process_page"))
 
 
-# === Rota de processamento iterativo ===
+# === Rota de acompanhamento do processamento ===
 @app.route("/process_page")
 def process_page():
-    print("\n=== PROCESSANDO PÁGINA ===")
-    
-    # Verificação completa da sessão
-    required_session_keys = ["images_file", "results_file", "raw_file", "prompt_option", "prompt"]
-    for key in required_session_keys:
-        if key not in session:
-            print(f"❌ Erro: Sessão inválida - chave '{key}' faltando")
-            flash("Sessão inválida. Por favor, tente novamente.")
-            return redirect(url_for("index"))
-    
-    try:
-        imagens = Arquivo.carregar_dados_temp(session["images_file"])
-        if not imagens:
-            print("❌ Erro: Nenhuma imagem disponível para processamento")
-            flash("Nenhuma imagem disponível para processamento.")
-            return redirect(url_for("index"))
+    print("\n=== ACOMPANHANDO PROCESSAMENTO ===")
 
-        page = session.get("current_page", 0)
-        
-        # Verificação crítica para evitar IndexError
-        if page >= len(imagens):
-            print("ℹ️ Todas as imagens foram processadas, finalizando...")
-            result = finalizar_processamento()
-            if result is None:
-                flash("Erro ao finalizar processamento.")
-                return redirect(url_for("index"))
-            return result
-            
-        print(f"📋 Configuração atual:")
-        print(f"   - Página: {page+1}/{len(imagens)}")
-        print(f"   - Opção: {session['prompt_option']}")
-        print(f"   - Sub-opção: {session.get('sub_prompt_option', 'Nenhuma')}")
-        print(f"   - Prompt: {session['prompt'][:100]}...")
-
-        # Processamento seguro da imagem
-        img_path = imagens[page]
-        print(f"🖼️ Processando imagem {page+1}: {img_path}")
-        
-        try:
-            print("   🔄 Enviando para Gemini...")
-            raw_text = Gemini.processar_imagem(img_path, modelo, session["prompt"])
-            print(f"   ✅ Resposta recebida ({len(raw_text)} caracteres)")
-            
-            # Salva o resultado conforme o tipo de operação
-            if session["prompt_option"] in ["summarize", "translate", "text_analysis"] and \
-               session.get("sub_prompt_option") in [None, "resumo", "higienizar"]:
-                print("   💾 Salvando em raw_file")
-
-                chunks = Arquivo.carregar_dados_temp(session["raw_file"])
-                chunks.append(raw_text)
-                Arquivo.salvar_dados_temp(chunks, session["raw_file"])
-            else:
-                print("   💾 Salvando em results_file")
-                lst = Arquivo.carregar_dados_temp(session["results_file"])
-                lst.append(raw_text)
-                Arquivo.salvar_dados_temp(lst, session["results_file"])
-                
-            # Atualiza a página ou finaliza
-            session["current_page"] = page + 1
-            if page + 1 < len(imagens):
-                return redirect(url_for("process_page"))
-            
-            result = finalizar_processamento()
-            if result is None:
-                flash("Erro ao finalizar processamento.")
-                return redirect(url_for("index"))
-            return result
-                
-        except Exception as e:
-            print(f"❌ Erro no processamento: {str(e)}")
-            logger.error(f"Erro ao processar imagem: {str(e)}", exc_info=True)
-            flash("Erro ao processar imagem. Por favor, tente novamente.")
-            return redirect(url_for("index"))
-            
-    except Exception as e:
-        print(f"❌ Erro geral: {str(e)}")
-        logger.error(f"Erro geral no processamento: {str(e)}", exc_info=True)
-        flash("Erro no processamento. Por favor, tente novamente.")
+    tarefa = obter_tarefa(session.get("job_id"))
+    if tarefa is None:
+        print("❌ Erro: Sessão inválida - tarefa não encontrada")
+        flash("Sessão inválida. Por favor, tente novamente.")
         return redirect(url_for("index"))
 
-def finalizar_processamento():
+    # Resumo, tradução e matemática são exibidos página a página durante o processamento
+    opcoes = tarefa.armazenamento.metadados()
+    incremental = opcoes["prompt_option"] in ("translation", "math_operation") or (
+        opcoes["prompt_option"] == "text_analysis"
+        and opcoes.get("sub_prompt_option") in ("summary", "sanitize")
+    )
+
+    # Página leve que acompanha a tarefa via SSE (/eventos) ou polling (/status)
+    return render_template(
+        "processando.html", job_id=tarefa.id, total=tarefa.total, incremental=incremental,
+        estimativa=opcoes.get("estimativa_tokens"), orcamento=opcoes.get("orcamento_tokens")
+    )
+
+
+# === Rota de eventos da tarefa (Server-Sent Events) ===
+@app.route("/eventos/<job_id>")
+def eventos_tarefa(job_id):
+    tarefa = obter_tarefa(job_id) if tarefa_da_sessao(job_id) else None
+    if tarefa is None:
+        return jsonify({"id": job_id, "estado": "desconhecida"}), 404
+
+    # Reconexões do EventSource continuam do último evento recebido
+    ultimo_id = request.headers.get("Last-Event-ID", type=int) or 0
+
+    def gerar(ultimo_id):
+        while True:
+            eventos = tarefa.eventos_desde(ultimo_id, timeout=15)
+            if not eventos:
+                if GerenciadorTarefas.drenando():
+                    # Worker em encerramento: o EventSource reconecta em outro worker
+                    return
+                yield ": keep-alive\n\n"
+                continue
+            for evento in eventos:
+                ultimo_id = evento["id"]
+                dados = {k: v for k, v in evento.items() if k not in ("id", "tipo")}
+                if evento["tipo"] == "pagina":
+                    dados["html"] = Resultado.html(dados.pop("texto"))
+                yield f"id: {ultimo_id}\nevent: {evento['tipo']}\ndata: {json.dumps(dados)}\n\n"
+                if evento["tipo"] == "fim":
+                    return
+
+    return Response(
+        stream_with_context(gerar(ultimo_id)),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# === Rota de status da tarefa (polling) ===
+@app.route("/status/<job_id>")
+def status_tarefa(job_id):
+    tarefa = obter_tarefa(job_id) if tarefa_da_sessao(job_id) else None
+    if tarefa is None:
+        return jsonify({"id": job_id, "estado": "desconhecida"}), 404
+
+    # ?aguardar=N segura a resposta até N segundos ou até a tarefa terminar
+    aguardar = request.args.get("aguardar", type=float)
+    if aguardar:
+        tarefa.aguardar(min(aguardar, 60))
+    return jsonify(tarefa.status())
+
+
+# === Rota de resultado final ===
+@app.route("/resultado")
+def resultado():
+    tarefa = obter_tarefa(session.get("job_id"))
+    if tarefa is None:
+        flash("Sessão inválida. Por favor, tente novamente.")
+        return redirect(url_for("index"))
+
+    if tarefa.status()["estado"] not in ("concluida", "erro"):
+        return redirect(url_for("process_page"))
+
+    if tarefa.estado == "erro":
+        # As páginas já concluídas continuam no disco: a página inicial oferece a retomada
+        print(f"❌ Erro no processamento: {tarefa.erro}")
+        flash("Erro no processamento. Retome a tarefa para refazer as páginas que faltam.")
+        return redirect(url_for("index"))
+
+    print("ℹ️ Todas as imagens foram processadas, finalizando...")
+    result = finalizar_processamento(tarefa.armazenamento)
+    if result is None:
+        flash("Erro ao finalizar processamento.")
+        return redirect(url_for("index"))
+    return result
+
+# === Rota dos blocos seguintes do resultado (carregados sob demanda) ===
+@app.route("/resultado/<job_id>/paginas")
+def resultado_paginas(job_id):
+    if not tarefa_da_sessao(job_id):
+        return jsonify({"erro": "resultado não encontrado"}), 404
+    bloco = Resultado.paginas(job_id, request.args.get("inicio", 0, type=int))
+    if bloco is None:
+        return jsonify({"erro": "resultado não encontrado"}), 404
+    return jsonify(bloco)
+
+# === Rota de exportação do resultado (gerada em fluxo no servidor) ===
+@app.route("/resultado/<job_id>/exportar/<formato>")
+def exportar_resultado(job_id, formato):
+    if not tarefa_da_sessao(job_id):
+        return jsonify({"erro": "resultado ou formato não encontrado"}), 404
+    exportacao = Exportacao.abrir(job_id, formato)
+    if exportacao is None:
+        return jsonify({"erro": "resultado ou formato não encontrado"}), 404
+    blocos, tipo, nome = exportacao
+    print(f"📤 Exportando tarefa {job_id} em {formato}")
+    return Response(blocos, content_type=tipo, headers={"Content-Disposition": f'attachment; filename="{nome}"'})
+
+def finalizar_processamento(armazenamento: ResultadosTarefa):
     """Função para processar resultados finais"""
     try:
-        prompt_opt = session["prompt_option"]
-        sub_opt = session.get("sub_prompt_option")
-        
-        print(f"\n🏁 Finalizando processamento - {prompt_opt}")
-        if sub_opt:
-            print(f"   - Sub-opção: {sub_opt}")
-        
-        # --- SUMMARIZE ---
-        if prompt_opt == "summarize":
-            print("📝 Gerando resumo do conteúdo...")
-            chunks = Arquivo.carregar_dados_temp(session["raw_file"])
-            md = "\n\n".join(chunks)
-            html = markdown(md, extensions=["fenced_code","tables","smarty"])
-            return render_template(
-                "result.html",
-                results={"summary_text": html},
-                prompt_option=prompt_opt
-            )
-
-        # --- VALIDATE ---
-        elif prompt_opt == "validate":
-            print("🔍 Validando conteúdo...")
-            raw_list = Arquivo.carregar_dados_temp(session["results_file"])
-            all_errors = []
-            
-            for raw in raw_list:
-                try:
-                    parsed = json.loads(raw)
-                    if isinstance(parsed, dict):
-                        errs = parsed.get("errors", [])
-                    elif isinstance(parsed, list):
-                        errs = parsed
-                    else:
-                        continue
-                        
-                    all_errors.extend(errs)
-                except json.JSONDecodeError:
-                    continue
-
-            return render_template(
-                "result.html",
-                results={"errors": all_errors, "total_errors": len(all_errors)},
-                prompt_option=prompt_opt
-            )
-
-        # --- EXTRACT ---
-        elif prompt_opt == "extract":
-            print("📊 Extraindo dados...")
-            raw_list = Arquivo.carregar_dados_temp(session["results_file"])
-            all_data = {"columns": [], "rows": [], "charts": []}
-            
-            for raw in raw_list:
-                try:
-                    obj = json.loads(raw)
-                    if not all_data["columns"]:
-                        all_data["columns"] = obj.get("table", {}).get("columns", [])
-                    all_data["rows"].extend(obj.get("table", {}).get("rows", []))
-                    all_data["charts"].extend([
-                        f"data:image/png;base64,{c['image']}" 
-                        if not c['image'].startswith("data:image") 
-                        else c['image']
-                        for c in obj.get("charts", [])
-                    ])
-                except:
-                    continue
-
-            return render_template(
-                "result.html",
-                results=all_data,
-                prompt_option=prompt_opt
-            )
-
-        # --- TRANSLATE ---
-        elif prompt_opt == "translate":
-            print(f"🌍 Traduzindo para {session.get('target_language', 'en')}...")
-            blocks = Arquivo.carregar_dados_temp(session["results_file"])
-            html = markdown("\n\n".join(blocks), extensions=["fenced_code", "tables", "smarty"])
-            return render_template(
-                "result.html",
-                results={"summary_text": html},
-                prompt_option=prompt_opt
-            )
-            
-    # --- TEXT ANALYSIS ---
-        elif prompt_opt == "text_analysis":
-            if sub_opt == "resumo":
-                print("📑 Gerando resumo...")
-                chunks = Arquivo.carregar_dados_temp(session["raw_file"])
-                html = markdown("\n\n".join(chunks), extensions=["fenced_code","tables","smarty"])
-                return render_template(
-                    "result.html",
-                    results={"summary_text": html},
-                    prompt_option=prompt_opt,
-                    sub_prompt_option=sub_opt
-                )
-            
-            elif sub_opt == "full_extraction":
-                print("🔎 Extraindo dados completos...")
-                try:
-                    # Carrega os dados brutos
-                    raw_responses = Arquivo.carregar_dados_temp(session["results_file"])
-                    
-                    # Debug - verifique o conteúdo real
-                    print(f"Conteúdo bruto recebido (primeiros 300 chars): {str(raw_responses)[:300]}")
-                    
-                    # Processa como texto puro
-                    extracted_text = "\n\n".join([str(r) for r in raw_responses])
-                    
-                    # Debug crítico - salva em arquivo
-                    debug_path = os.path.join(Constantes.PASTA_DADOS_TEMP, "FULL_DEBUG.txt")
-                    with open(debug_path, "w", encoding="utf-8") as f:
-                        f.write(f"=== DEBUG FULL EXTRACTION ===\n")
-                        f.write(f"Tipo do conteúdo: {type(raw_responses)}\n")
-                        f.write(f"Tamanho: {len(raw_responses)}\n")
-                        f.write(f"Conteúdo:\n{extracted_text}")
-                    
-                    return render_template(
-                        "result.html",
-                        results={
-                            "extracted_text": extracted_text,
-                            "raw_data": raw_responses  # Envia os dados brutos também
-                        },
-                        prompt_option=prompt_opt,
-                        sub_prompt_option="extracao_completa"  # Aqui é o pulo do gato - deve bater com o template
-                    )
-                except Exception as e:
-                    print(f"ERRO CRÍTICO NO PROCESSAMENTO: {str(e)}")
-                    logger.error(f"Erro fatal em full_extraction: {str(e)}", exc_info=True)
-                    flash("Falha ao processar extração completa")
-                    return redirect(url_for("index"))
-
-        # --- AI CHECK ---
-        elif prompt_opt == "ai_check":
-            print("🤖 Verificando IA...")
-            ai_results = []
-            for raw in Arquivo.carregar_dados_temp(session["results_file"]):
-                try:
-                    ai_results.append(json.loads(raw))
-                except:
-                    continue
-            
-            return render_template(
-                "result.html",
-                results={"ai_results": ai_results},
-                prompt_option=prompt_opt
-            )
-
-        # --- MATH OPERATION ---
-        elif prompt_opt == "math_operation":
-            print("🧮 Processando matemática...")
-            html = markdown("\n\n".join(Arquivo.carregar_dados_temp(session["raw_file"])), 
-                         extensions=["fenced_code","tables","smarty"])
-            return render_template(
-                "result.html",
-                results={"math_solutions": html},
-                prompt_option=prompt_opt
-            )
-        
-        else:
-            print(f"❌ Opção desconhecida: {prompt_opt}")
+        print(f"\n🏁 Finalizando processamento - tarefa {armazenamento.id}")
+        contexto = Resultado.montar(armazenamento)
+        if contexto is None:
+            print("❌ Opção de processamento desconhecida")
             flash("Opção de processamento não reconhecida")
             return redirect(url_for("index"))
-            
+        # Páginas com erro podem ser reprocessadas sem refazer as demais
+        contexto["paginas_com_erro"] = len(GerenciadorTarefas.pendentes(armazenamento)[0])
+        return render_template("result.html", **contexto)
+
     except Exception as e:
         print(f"❌ Erro ao finalizar: {str(e)}")
         logger.error(f"Erro finalizando processamento: {str(e)}", exc_info=True)
         flash("Erro ao gerar resultados finais.")
         return redirect(url_for("index"))
 
+# === Rota de estatísticas do cache de respostas ===
+@app.route("/cache/status")
+def status_cache():
+    return jsonify(CacheRespostas.estatisticas())
+
+# === Rota de estatísticas de codificação das páginas ===
+@app.route("/imagens/status")
+def status_imagens():
+    return jsonify(PoliticaImagem.estatisticas())
+
+# === Rota de cotas, erros e concorrência das chamadas ao Gemini ===
+@app.route("/gemini/status")
+def status_gemini():
+    return jsonify(AgendadorGemini.estatisticas())
+
+# === Rota de métricas (formato Prometheus) ===
+@app.route("/metrics")
+def metricas():
+    return Response(Metricas.exportar(), mimetype="text/plain; version=0.0.4")
+
+# === Rota de saúde: o servidor já responde (Leitor.py espera por ela) ===
+@app.route("/saude")
+def saude():
+    return jsonify({"estado": "ok"})
+
+# === Rota de prontidão: aquecimento concluído (inicia-o se preciso) e worker fora de encerramento ===
+@app.route("/pronto")
+def pronto():
+    Aquecimento.iniciar()
+    estado = {**Aquecimento.estado(), "drenando": GerenciadorTarefas.drenando()}
+    return jsonify(estado), 200 if Aquecimento.concluido() and not estado["drenando"] else 503
+
+# === Rota de aquecimento via beacon, depois que a página inicial é desenhada ===
+@app.route("/aquecer", methods=["POST"])
+def aquecer():
+    if Aquecimento.iniciar():
+        print("🔥 Aquecimento iniciado em segundo plano")
+    return "", 202
+
 # === Rota para limpar temp via beacon ===
 @app.route("/limpar", methods=["POST"])
 def limpar_dados():
-    for p in (
-        Constantes.PASTA_UPLOAD,
-        Constantes.PASTA_DADOS_TEMP,
-        Constantes.PASTA_IMAGENS_TEMP
-    ):
-        try:
-            Arquivo.limpar_conteudo_pasta(p)
-        except Exception as e:
-            logger.error(f"Erro limpando pasta {p}: {str(e)}")
+    # Apenas o espaço da tarefa desta sessão; os demais ficam para o ColetorEspacos.
+    # Tarefas com páginas a refazer são mantidas para a retomada.
+    tarefa_id = session.pop("job_anterior", None)
+    if tarefa_id and not GerenciadorTarefas.retomavel(tarefa_id) and GerenciadorTarefas.descartar(tarefa_id):
+        print(f"🧹 Espaço da tarefa {tarefa_id} removido")
     return "Dados limpos", 200
 
 def run_flask():
-    app.run(host="127.0.0.1", port=5000, debug=True, use_reloader=False)
+    app.run(host="127.0.0.1", port=5000, debug=Constantes.DEBUG, use_reloader=False)
 
 if __name__ == "__main__":
     run_flask()
\ No newline at end of file
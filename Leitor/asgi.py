@@ -0,0 +1,430 @@
+import sys
+import json
+import asyncio
+import logging
+import jinja2
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, UploadFile
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, RedirectResponse, StreamingResponse
+from fastapi.staticfiles import StaticFiles
+from fastapi.templating import Jinja2Templates
+from starlette.middleware.sessions import SessionMiddleware
+logger = logging.getLogger(__name__)
+
+from src.utils.constantes import Constantes, Caminhos
+from src.modules.funcoes import Arquivo, Gemini
+from src.modules.tarefas import GerenciadorTarefas, ColetorEspacos
+from src.modules.armazenamento import ResultadosTarefa
+from src.modules.resultado import Resultado
+from src.modules.exportacao import Exportacao
+from src.modules.agendador import AgendadorGemini
+from src.modules.metricas import Metricas
+from src.modules.consumo import Consumo
+from src.modules.cache import CacheRespostas
+from src.modules.imagem import PoliticaImagem
+from src.modules.inicializacao import Aquecimento
+from src.utils.prompts import Prompts
+
+# Evita criação de __pycache__
+sys.dont_write_bytecode = True
+
+#==========================================================
+# Entrada ASGI (uvicorn asgi:app)
+#==========================================================
+# Mesmas telas do app.py, mas as tarefas rodam como corrotinas no loop
+# do asyncio (GeminiAsync): um único processo mantém centenas de chamadas
+# ao Gemini em andamento sem uma thread do SO por página.
+
+# === Configuração do Gemini (no primeiro uso ou no aquecimento, não na importação) ===
+async def obter_modelo():
+    # Na primeira vez importa o SDK: fora do loop, para não bloqueá-lo
+    try:
+        return await asyncio.to_thread(Gemini.modelo)
+    except Exception as e:
+        print(f"❌ Erro na configuração do Gemini: {str(e)}")
+        raise
+
+# === Encerramento do worker: termina as páginas já enviadas e libera as demais ===
+@asynccontextmanager
+async def ciclo_de_vida(app: FastAPI):
+    yield
+    print("🛑 Encerrando: drenando as tarefas em andamento...")
+    restantes = await asyncio.to_thread(GerenciadorTarefas.drenar)
+    if restantes:
+        print(f"⚠️ {restantes} tarefa(s) não pararam a tempo; serão retomadas por outro worker")
+
+# === Configuração do FastAPI ===
+app = FastAPI(lifespan=ciclo_de_vida)
+# As sessões (e com elas a posse das tarefas) são assinadas com esta chave
+if Constantes.CHAVE_FLASK == Constantes.CHAVE_FLASK_PADRAO:
+    raise SystemExit("❌ Defina LEITOR_CHAVE_FLASK (a mesma em todos os workers) antes de iniciar o servidor")
+app.add_middleware(SessionMiddleware, secret_key=Constantes.CHAVE_FLASK)
+app.mount("/static", StaticFiles(directory=str(Caminhos.STATIC_DIR)), name="static")
+templates = Jinja2Templates(directory=str(Caminhos.TEMPLATES_DIR))
+
+def url_for(nome: str, **params) -> str:
+    """url_for no formato do Flask, para reaproveitar os mesmos templates."""
+    if nome == "static":
+        return app.url_path_for("static", path=params["filename"])
+    return app.url_path_for(nome, **params)
+
+templates.env.globals["url_for"] = url_for
+
+def flash(request: Request, mensagem: str):
+    """flash() do Flask: a mensagem fica na sessão até a próxima página renderizada."""
+    request.session.setdefault("_mensagens", []).append(mensagem)
+
+@jinja2.pass_context
+def get_flashed_messages(contexto) -> list[str]:
+    """get_flashed_messages() do Flask, para os mesmos templates."""
+    return contexto["request"].session.pop("_mensagens", [])
+
+templates.env.globals["get_flashed_messages"] = get_flashed_messages
+
+# Garante que as pastas existem e remove em segundo plano os espaços abandonados
+Arquivo.criar_pastas()
+ColetorEspacos.iniciar()
+
+# Estatísticas exportadas junto com os histogramas em /metrics
+Metricas.registrar_coletor("gemini", AgendadorGemini.estatisticas)
+Metricas.registrar_coletor("cache", CacheRespostas.estatisticas)
+Metricas.registrar_coletor("imagens", PoliticaImagem.estatisticas)
+
+
+class _ArquivoEnviado:
+    """Adapta UploadFile à interface do FileStorage usada por Arquivo.salvar_arquivo."""
+
+    def __init__(self, upload: UploadFile):
+        self.filename = upload.filename or ""
+        self.stream = upload.file
+        self.stream.seek(0)
+
+
+def _render(request: Request, template: str, **contexto) -> HTMLResponse:
+    return templates.TemplateResponse(request, template, contexto)
+
+
+# === Rota inicial ===
+@app.get("/", name="index")
+async def index(request: Request):
+    # A tarefa anterior fica marcada para o /limpar enviado pela página inicial
+    anterior = request.session.get("job_id")
+    mensagens = request.session.get("_mensagens")
+    request.session.clear()
+    if anterior:
+        request.session["job_anterior"] = anterior
+    if mensagens:
+        request.session["_mensagens"] = mensagens
+    # Tarefa anterior interrompida ou com páginas com erro: oferece a retomada
+    retomavel = bool(anterior) and await asyncio.to_thread(GerenciadorTarefas.retomavel, anterior)
+    return _render(request, "upload.html", retomar_id=anterior if retomavel else None)
+
+
+# === Rota de upload ===
+@app.post("/upload", name="upload_arquivo")
+async def upload_arquivo(request: Request):
+    print("\n=== NOVO PROCESSAMENTO INICIADO (ASGI) ===")
+    # Recusa pelo Content-Length antes de ler o corpo; o limite por
+    # arquivo é conferido de novo durante a gravação
+    if int(request.headers.get("content-length") or 0) > Constantes.TAMANHO_MAX_ENVIO_MB * 1024 * 1024:
+        print(f"❌ Erro: Envio acima de {Constantes.TAMANHO_MAX_ENVIO_MB} MB")
+        flash(request, f"O envio excede o limite de {Constantes.TAMANHO_MAX_ENVIO_MB} MB.")
+        resposta = _render(request, "upload.html")
+        resposta.status_code = 413
+        return resposta
+    form = await request.form()
+
+    arquivos = [_ArquivoEnviado(f) for f in form.getlist("file") if hasattr(f, "filename")]
+    if not arquivos or all(f.filename == '' for f in arquivos):
+        print("❌ Erro: Nenhum arquivo selecionado")
+        flash(request, "Nenhum arquivo selecionado.")
+        return _render(request, "upload.html")
+
+    function_option = form.get("function_option", "text_analysis")
+    sub_option = form.get("analysis_type") if function_option == "text_analysis" else None
+    target_lang = form.get("target_lang", "en") if function_option == "translation" else None
+    modo_leitura = form.get("modo_leitura", Constantes.MODO_LEITURA_PADRAO)
+    if modo_leitura not in ("auto", "texto", "imagem"):
+        modo_leitura = Constantes.MODO_LEITURA_PADRAO
+    usar_cache = "ignorar_cache" not in form
+    try:
+        orcamento = int(form.get("orcamento_tokens") or Constantes.ORCAMENTO_TOKENS_TAREFA)
+    except ValueError:
+        orcamento = Constantes.ORCAMENTO_TOKENS_TAREFA
+
+    print(f"\n📌 Opções selecionadas: {function_option} / {sub_option or 'Nenhuma'} / {modo_leitura}")
+
+    prompt_text = Prompts.montar_prompt(function_option, sub_option, target_lang)
+
+    # Espaço próprio da tarefa para os arquivos, imagens e resultados
+    metadados = {
+        "prompt": prompt_text,
+        "prompt_option": function_option,
+        "sub_prompt_option": sub_option,
+        "target_language": target_lang,
+        "modo_leitura": modo_leitura,
+        "usar_cache": usar_cache,
+    }
+    armazenamento = await asyncio.to_thread(ResultadosTarefa.criar, metadados)
+
+    # Gravar os arquivos e contar páginas é E/S de disco: fica fora do loop
+    rejeitados = []
+    resultados = await asyncio.to_thread(
+        Arquivo.processar_arquivos, arquivos, rejeitados, armazenamento.pasta_uploads
+    )
+    for motivo in rejeitados:
+        print(f"⚠️ Arquivo recusado: {motivo}")
+        flash(request, f"Arquivo recusado: {motivo}")
+    total_paginas = sum(r["paginas"] for r in resultados)
+    if not total_paginas:
+        print("❌ Falha: Nenhuma página foi encontrada nos arquivos enviados")
+        flash(request, "Nenhum arquivo foi processado corretamente.")
+        await asyncio.to_thread(armazenamento.remover)
+        return _render(request, "upload.html")
+
+    # Estimativa de tokens antes de renderizar (sem lotes nesta entrada)
+    estimativa = Consumo.estimar(total_paginas, prompt_text)
+    print(f"   - Estimativa: ~{estimativa['tokens_total']:,} tokens em {estimativa['chamadas']} chamada(s)")
+    if orcamento and estimativa["tokens_total"] > orcamento:
+        print(f"⚠️ Estimativa acima do orçamento; a tarefa será interrompida ao atingir {orcamento:,} tokens")
+
+    metadados.update({
+        "total_paginas": total_paginas,
+        "arquivos": [r["arquivo"] for r in resultados],
+        # Arquivos salvos, para retomar a tarefa (GerenciadorTarefas.retomar)
+        "documentos": resultados,
+        "estimativa_tokens": estimativa,
+        "orcamento_tokens": orcamento,
+    })
+    await asyncio.to_thread(armazenamento.salvar_metadados, metadados)
+
+    tarefa = GerenciadorTarefas.criar_async(
+        Arquivo.gerar_paginas(resultados, modo_leitura, armazenamento.pasta_imagens), total_paginas, await obter_modelo(), prompt_text,
+        armazenamento, usar_cache=usar_cache
+    )
+    request.session["job_id"] = tarefa.id
+
+    print(f"\n⏳ Tarefa {tarefa.id} iniciada, redirecionando para acompanhamento...")
+    return RedirectResponse(url_for("process_page"), status_code=303)
+
+
+def tarefa_da_sessao(request: Request, job_id: str | None) -> bool:
+    """
+    Indica se a tarefa é a desta sessão (a atual ou a anterior, oferecida
+    para retomada): conhecer o id não basta para acompanhar, exportar ou
+    retomar a tarefa de outro usuário.
+    """
+    return bool(job_id) and job_id in (request.session.get("job_id"), request.session.get("job_anterior"))
+
+
+async def obter_tarefa(job_id: str | None):
+    """
+    Tarefa deste worker, de outro worker vivo (TarefaRemota) ou, após um
+    reinício do servidor, retomada do disco (GerenciadorTarefas.retomar_async).
+    """
+    tarefa = await asyncio.to_thread(GerenciadorTarefas.localizar, job_id)
+    if tarefa is None and job_id:
+        tarefa = await GerenciadorTarefas.retomar_async(job_id, await obter_modelo())
+        if tarefa is not None:
+            print(f"🔁 Tarefa {job_id} retomada do disco")
+    return tarefa
+
+
+# === Rota de retomada (páginas que faltam ou falharam) ===
+@app.post("/retomar/{job_id}", name="retomar_tarefa")
+async def retomar_tarefa(job_id: str, request: Request):
+    tarefa = None
+    if tarefa_da_sessao(request, job_id):
+        tarefa = await GerenciadorTarefas.retomar_async(job_id, await obter_modelo())
+    if tarefa is None:
+        flash(request, "Não foi possível retomar a tarefa.")
+        return RedirectResponse(url_for("index"), status_code=303)
+    print(f"🔁 Tarefa {job_id} retomada a pedido do usuário")
+    request.session.pop("job_anterior", None)
+    request.session["job_id"] = tarefa.id
+    return RedirectResponse(url_for("process_page"), status_code=303)
+
+
+# === Rota de acompanhamento do processamento ===
+@app.get("/process_page", name="process_page")
+async def process_page(request: Request):
+    tarefa = await obter_tarefa(request.session.get("job_id"))
+    if tarefa is None:
+        print("❌ Erro: Sessão inválida - tarefa não encontrada")
+        flash(request, "Sessão inválida. Por favor, tente novamente.")
+        return RedirectResponse(url_for("index"), status_code=303)
+
+    opcoes = await asyncio.to_thread(tarefa.armazenamento.metadados)
+    incremental = opcoes["prompt_option"] in ("translation", "math_operation") or (
+        opcoes["prompt_option"] == "text_analysis"
+        and opcoes.get("sub_prompt_option") in ("summary", "sanitize")
+    )
+    return _render(request, "processando.html", job_id=tarefa.id, total=tarefa.total, incremental=incremental,
+                   estimativa=opcoes.get("estimativa_tokens"), orcamento=opcoes.get("orcamento_tokens"))
+
+
+# === Rota de eventos da tarefa (Server-Sent Events) ===
+def _formatar_eventos(eventos: list[dict]) -> list[str]:
+    """Mensagens SSE dos eventos; o HTML de cada página é gerado aqui, fora do loop."""
+    mensagens = []
+    for evento in eventos:
+        dados = {k: v for k, v in evento.items() if k not in ("id", "tipo")}
+        if evento["tipo"] == "pagina":
+            dados["html"] = Resultado.html(dados.pop("texto"))
+        mensagens.append(f"id: {evento['id']}\nevent: {evento['tipo']}\ndata: {json.dumps(dados)}\n\n")
+    return mensagens
+
+
+@app.get("/eventos/{job_id}", name="eventos_tarefa")
+async def eventos_tarefa(job_id: str, request: Request):
+    tarefa = await obter_tarefa(job_id) if tarefa_da_sessao(request, job_id) else None
+    if tarefa is None:
+        return JSONResponse({"id": job_id, "estado": "desconhecida"}, status_code=404)
+
+    try:
+        ultimo_id = int(request.headers.get("Last-Event-ID") or 0)
+    except ValueError:
+        ultimo_id = 0
+
+    async def gerar(ultimo_id):
+        while True:
+            eventos = await asyncio.to_thread(tarefa.eventos_desde, ultimo_id, 15)
+            if not eventos:
+                # Worker em encerramento: o EventSource reconecta em outro worker
+                if GerenciadorTarefas.drenando() or await request.is_disconnected():
+                    return
+                yield ": keep-alive\n\n"
+                continue
+            for evento, mensagem in zip(eventos, await asyncio.to_thread(_formatar_eventos, eventos)):
+                ultimo_id = evento["id"]
+                yield mensagem
+                if evento["tipo"] == "fim":
+                    return
+
+    return StreamingResponse(
+        gerar(ultimo_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# === Rota de status da tarefa (polling) ===
+@app.get("/status/{job_id}", name="status_tarefa")
+async def status_tarefa(job_id: str, request: Request, aguardar: float | None = None):
+    tarefa = await obter_tarefa(job_id) if tarefa_da_sessao(request, job_id) else None
+    if tarefa is None:
+        return JSONResponse({"id": job_id, "estado": "desconhecida"}, status_code=404)
+    if aguardar:
+        await asyncio.to_thread(tarefa.aguardar, min(aguardar, 60))
+    return await asyncio.to_thread(tarefa.status)
+
+
+# === Rota de resultado final ===
+@app.get("/resultado", name="resultado")
+async def resultado(request: Request):
+    tarefa = await obter_tarefa(request.session.get("job_id"))
+    if tarefa is None:
+        flash(request, "Sessão inválida. Por favor, tente novamente.")
+        return RedirectResponse(url_for("index"), status_code=303)
+    status = await asyncio.to_thread(tarefa.status)
+    if status["estado"] not in ("concluida", "erro"):
+        return RedirectResponse(url_for("process_page"), status_code=303)
+    if status["estado"] == "erro":
+        # As páginas já concluídas continuam no disco: a página inicial oferece a retomada
+        print(f"❌ Erro no processamento: {status['erro']}")
+        flash(request, "Erro no processamento. Retome a tarefa para refazer as páginas que faltam.")
+        return RedirectResponse(url_for("index"), status_code=303)
+
+    try:
+        contexto = await asyncio.to_thread(Resultado.montar, tarefa.armazenamento)
+    except Exception:
+        logger.exception("Erro finalizando processamento")
+        contexto = None
+    if contexto is None:
+        flash(request, "Erro ao gerar resultados finais.")
+        return RedirectResponse(url_for("index"), status_code=303)
+    faltam, _ = await asyncio.to_thread(GerenciadorTarefas.pendentes, tarefa.armazenamento)
+    return _render(request, "result.html", paginas_com_erro=len(faltam), **contexto)
+
+
+# === Rota dos blocos seguintes do resultado (carregados sob demanda) ===
+@app.get("/resultado/{job_id}/paginas", name="resultado_paginas")
+async def resultado_paginas(job_id: str, request: Request, inicio: int = 0):
+    if not tarefa_da_sessao(request, job_id):
+        return JSONResponse({"erro": "resultado não encontrado"}, status_code=404)
+    bloco = await asyncio.to_thread(Resultado.paginas, job_id, inicio)
+    if bloco is None:
+        return JSONResponse({"erro": "resultado não encontrado"}, status_code=404)
+    return bloco
+
+
+# === Rota de exportação do resultado (gerada em fluxo no servidor) ===
+@app.get("/resultado/{job_id}/exportar/{formato}", name="exportar_resultado")
+async def exportar_resultado(job_id: str, formato: str, request: Request):
+    if not tarefa_da_sessao(request, job_id):
+        return JSONResponse({"erro": "resultado ou formato não encontrado"}, status_code=404)
+    exportacao = await asyncio.to_thread(Exportacao.abrir, job_id, formato)
+    if exportacao is None:
+        return JSONResponse({"erro": "resultado ou formato não encontrado"}, status_code=404)
+    blocos, tipo, nome = exportacao
+    print(f"📤 Exportando tarefa {job_id} em {formato}")
+    # Gerador síncrono: o Starlette o percorre em uma thread, sem bloquear o loop
+    return StreamingResponse(blocos, media_type=tipo, headers={"Content-Disposition": f'attachment; filename="{nome}"'})
+
+
+# === Rota de estatísticas do cache de respostas ===
+@app.get("/cache/status", name="status_cache")
+async def status_cache():
+    return await asyncio.to_thread(CacheRespostas.estatisticas)
+
+
+# === Rota de estatísticas de codificação das páginas ===
+@app.get("/imagens/status", name="status_imagens")
+async def status_imagens():
+    return PoliticaImagem.estatisticas()
+
+
+# === Rota de cotas, erros e concorrência das chamadas ao Gemini ===
+@app.get("/gemini/status", name="status_gemini")
+async def status_gemini():
+    return AgendadorGemini.estatisticas()
+
+
+# === Rota de métricas (formato Prometheus) ===
+@app.get("/metrics", name="metricas", response_class=PlainTextResponse)
+async def metricas():
+    texto = await asyncio.to_thread(Metricas.exportar)
+    return PlainTextResponse(texto, media_type="text/plain; version=0.0.4")
+
+
+# === Rota de saúde: o servidor já responde ===
+@app.get("/saude", name="saude")
+async def saude():
+    return {"estado": "ok"}
+
+
+# === Rota de prontidão: aquecimento concluído (inicia-o se preciso) e worker fora de encerramento ===
+@app.get("/pronto", name="pronto")
+async def pronto():
+    Aquecimento.iniciar()
+    estado = {**Aquecimento.estado(), "drenando": GerenciadorTarefas.drenando()}
+    return JSONResponse(estado, status_code=200 if Aquecimento.concluido() and not estado["drenando"] else 503)
+
+
+# === Rota de aquecimento via beacon, depois que a página inicial é desenhada ===
+@app.post("/aquecer", name="aquecer")
+async def aquecer():
+    if Aquecimento.iniciar():
+        print("🔥 Aquecimento iniciado em segundo plano")
+    return PlainTextResponse("", status_code=202)
+
+
+# === Rota para limpar o espaço da tarefa via beacon ===
+@app.post("/limpar", name="limpar_dados")
+async def limpar_dados(request: Request):
+    tarefa_id = request.session.pop("job_anterior", None)
+    # Tarefas com páginas a refazer são mantidas para a retomada
+    if tarefa_id and not await asyncio.to_thread(GerenciadorTarefas.retomavel, tarefa_id) \
+            and await asyncio.to_thread(GerenciadorTarefas.descartar, tarefa_id):
+        print(f"🧹 Espaço da tarefa {tarefa_id} removido")
+    return PlainTextResponse("Dados limpos")
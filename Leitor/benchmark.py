@@ -0,0 +1,480 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import subprocess
+import platform
+import tempfile
+import threading
+from pathlib import Path
+from datetime import datetime
+from contextlib import contextmanager
+
+# Evita criação de __pycache__
+sys.dont_write_bytecode = True
+
+#==========================================================
+# Benchmark offline do pipeline (sem rede)
+#==========================================================
+# Executa recebimento (Arquivo.processar_arquivos), preparação das páginas,
+# chamadas ao Gemini (Gemini.processar_imagem/processar_texto/processar_lote)
+# e finalização (finalizar_processamento) contra um modelo falso local,
+# sobre um corpus sintético de PDFs e imagens.
+#
+#   python benchmark.py                         # compara com a baseline do cenário
+#   python benchmark.py --salvar-baseline       # grava/atualiza a baseline
+#   python benchmark.py --exigir-baseline       # na integração contínua: falha sem baseline
+#   python benchmark.py --cenario grande --latencia 1.0 --taxa-erro 0.05
+#
+# Sai com código 1 se alguma métrica piorar além de --limiar.
+
+PASTA_BASELINES = Path(__file__).resolve().parent / "src" / "benchmark" / "baselines"
+# Etapas com menos medições que isso não entram na comparação
+AMOSTRAS_MIN_ETAPA = 10
+
+try:
+    import psutil
+except ImportError:  # Opcional: sem psutil o RSS vem de /proc ou de resource
+    psutil = None
+
+
+#==========================================================
+# Medições
+#==========================================================
+class Medidor:
+    """Acumula as durações de cada etapa do pipeline."""
+
+    def __init__(self):
+        self.etapas: dict[str, list[float]] = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, etapa: str, duracao: float):
+        with self._lock:
+            self.etapas.setdefault(etapa, []).append(duracao)
+
+    @contextmanager
+    def medir(self, etapa: str):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.registrar(etapa, time.perf_counter() - inicio)
+
+    def envolver(self, classe, nome: str, etapa: str):
+        """Troca classe.nome (staticmethod) por uma versão cronometrada."""
+        original = getattr(classe, nome)
+
+        def cronometrado(*args, **kwargs):
+            with self.medir(etapa):
+                return original(*args, **kwargs)
+
+        setattr(classe, nome, staticmethod(cronometrado))
+
+    def gerador(self, paginas, etapa: str):
+        """Cronometra cada item produzido por um gerador."""
+        iterador = iter(paginas)
+        while True:
+            inicio = time.perf_counter()
+            try:
+                item = next(iterador)
+            except StopIteration:
+                return
+            self.registrar(etapa, time.perf_counter() - inicio)
+            yield item
+
+    @staticmethod
+    def percentis(valores: list[float]) -> dict:
+        ordenados = sorted(valores)
+
+        def p(q):
+            return ordenados[min(len(ordenados) - 1, int(round(q * (len(ordenados) - 1))))]
+
+        return {
+            "n": len(ordenados),
+            "media": round(sum(ordenados) / len(ordenados), 6),
+            "p50": round(p(0.50), 6),
+            "p90": round(p(0.90), 6),
+            "p99": round(p(0.99), 6),
+            "max": round(ordenados[-1], 6),
+        }
+
+    def resumo(self) -> dict:
+        with self._lock:
+            return {etapa: self.percentis(v) for etapa, v in sorted(self.etapas.items()) if v}
+
+
+class Amostrador(threading.Thread):
+    """Registra o pico de RSS (processo e filhos) e de uso da pasta temporária."""
+
+    def __init__(self, pasta_temp: str, intervalo: float = 0.05):
+        super().__init__(daemon=True)
+        self.pasta_temp = pasta_temp
+        self.intervalo = intervalo
+        self.rss_pico = 0
+        self.disco_pico = 0
+        self._parar = threading.Event()
+
+    @staticmethod
+    def rss() -> int:
+        if psutil is not None:
+            processo = psutil.Process()
+            total = processo.memory_info().rss
+            for filho in processo.children(recursive=True):
+                try:
+                    total += filho.memory_info().rss
+                except psutil.Error:
+                    pass
+            return total
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError, AttributeError):
+            return 0
+
+    @staticmethod
+    def tamanho_pasta(pasta: str) -> int:
+        total = 0
+        for raiz, _, arquivos in os.walk(pasta):
+            for nome in arquivos:
+                try:
+                    total += os.path.getsize(os.path.join(raiz, nome))
+                except OSError:
+                    pass
+        return total
+
+    def run(self):
+        while not self._parar.is_set():
+            self.rss_pico = max(self.rss_pico, self.rss())
+            self.disco_pico = max(self.disco_pico, self.tamanho_pasta(self.pasta_temp))
+            self._parar.wait(self.intervalo)
+
+    def parar(self):
+        self._parar.set()
+        self.join()
+        self._amostrar_final()
+
+    def _amostrar_final(self):
+        self.rss_pico = max(self.rss_pico, self.rss())
+        try:
+            import resource
+            # ru_maxrss em KB no Linux; cobre picos entre amostras
+            self.rss_pico = max(self.rss_pico, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024)
+        except ImportError:
+            pass
+
+
+class _ArquivoLocal:
+    """Imita o FileStorage do Flask para um arquivo do corpus."""
+
+    def __init__(self, caminho: str, stream):
+        self.filename = os.path.basename(caminho)
+        self.stream = stream
+
+
+#==========================================================
+# Partida a frio
+#==========================================================
+# Bibliotecas que a partida deve deixar para o primeiro uso (ModuloAdiado)
+MODULOS_PESADOS = ("fitz", "PIL.Image", "numpy", "google.generativeai", "google.api_core.exceptions", "markdown")
+
+_SCRIPT_PARTIDA = """
+import sys, json, time
+inicio = time.perf_counter()
+import {modulo}
+duracao = time.perf_counter() - inicio
+print(json.dumps({{"s": duracao, "pesados": [m for m in {pesados!r} if m in sys.modules]}}))
+"""
+
+
+def medir_partida(repeticoes: int = 3) -> dict:
+    """
+    Tempo de importação de app.py e asgi.py, cada vez em um processo novo
+    (o menor de `repeticoes`), e as bibliotecas pesadas já carregadas ao
+    fim da importação. Entradas indisponíveis (ex.: sem FastAPI) ficam None.
+    """
+    raiz = Path(__file__).resolve().parent
+    # O asgi.py recusa iniciar com a chave de sessão padrão
+    ambiente = {**os.environ, "LEITOR_CHAVE_FLASK": os.environ.get("LEITOR_CHAVE_FLASK") or "benchmark"}
+    resultado = {}
+    for modulo in ("app", "asgi"):
+        tempos, pesados = [], None
+        for _ in range(repeticoes):
+            processo = subprocess.run(
+                [sys.executable, "-c", _SCRIPT_PARTIDA.format(modulo=modulo, pesados=MODULOS_PESADOS)],
+                cwd=raiz, env=ambiente, capture_output=True, text=True, encoding="utf-8", errors="replace",
+            )
+            if processo.returncode != 0:
+                break
+            medida = json.loads(processo.stdout.strip().splitlines()[-1])
+            tempos.append(medida["s"])
+            pesados = medida["pesados"]
+        resultado[f"{modulo}_s"] = round(min(tempos), 3) if tempos else None
+        resultado[f"{modulo}_pesados"] = pesados
+    return resultado
+
+
+#==========================================================
+# Execução de um cenário
+#==========================================================
+def executar(args, pasta_trabalho: str) -> dict:
+    print("🚀 Medindo a importação a frio de app.py e asgi.py...")
+    partida = medir_partida()
+
+    # Os módulos do projeto leem LEITOR_PASTA_TEMP ao serem importados
+    # (inclusive nos processos de renderização), por isso são importados aqui.
+    from src.benchmark import corpus
+    from src.benchmark.gemini_falso import ModeloFalso, instalar
+    from src.utils.constantes import Constantes
+    from src.utils.prompts import Prompts
+    from src.modules.funcoes import Arquivo, Gemini
+    from src.modules.armazenamento import ResultadosTarefa
+    from src.modules.tarefas import GerenciadorTarefas
+    from src.modules.imagem import PoliticaImagem
+    from src.modules.agendador import AgendadorGemini
+    from src.modules.renderizacao import PoolRenderizacao
+    from src.utils.importacao import ModuloAdiado
+    import google.generativeai as genai
+    import app as aplicacao
+
+    instalar()
+    modelo = ModeloFalso(args.latencia, args.variacao, args.taxa_erro, args.caracteres, args.semente)
+    genai.GenerativeModel = lambda *a, **k: modelo
+    Constantes.CACHE_RESPOSTAS_ATIVO = False
+    Constantes.MAX_PAGINAS_SIMULTANEAS = args.paralelas
+    Constantes.COTA_GEMINI["concorrencia_inicial"] = args.paralelas
+    Arquivo.criar_pastas()
+
+    medidor = Medidor()
+    for nome, etapa in (
+        ("processar_imagem", "gemini_imagem"),
+        ("processar_texto", "gemini_texto"),
+        ("processar_lote", "gemini_lote"),
+    ):
+        medidor.envolver(Gemini, nome, etapa)
+
+    print(f"📄 Gerando corpus {args.cenario!r}...")
+    arquivos = corpus.gerar(args.cenario, os.path.join(pasta_trabalho, "corpus"), args.semente)
+
+    # Subir os processos de renderização e importar as bibliotecas adiadas
+    # (como o Aquecimento faz) é custo de inicialização, não do pipeline
+    with medidor.medir("inicio_pool"):
+        ModuloAdiado.carregar_todos()
+        # Uma chamada por processo (a fila de livres é circular) espera todos importarem PyMuPDF/PIL
+        for _ in range(PoolRenderizacao.processos()):
+            PoolRenderizacao.executar(ModuloAdiado.carregar_todos)
+
+    amostrador = Amostrador(Constantes.pasta_base_temp)
+    amostrador.start()
+    inicio = time.perf_counter()
+
+    prompt = Prompts.montar_prompt(args.funcao, args.sub_opcao, None)
+    metadados = {
+        "prompt": prompt,
+        "prompt_option": args.funcao,
+        "sub_prompt_option": args.sub_opcao,
+        "target_language": None,
+        "modo_leitura": args.modo_leitura,
+    }
+    armazenamento = ResultadosTarefa.criar(metadados)
+
+    # Recebimento: grava os arquivos no espaço da tarefa e conta as páginas
+    resultados = []
+    for caminho in arquivos:
+        with medidor.medir("recebimento"), open(caminho, "rb") as stream:
+            resultados += Arquivo.processar_arquivos(
+                [_ArquivoLocal(caminho, stream)], pasta=armazenamento.pasta_uploads
+            )
+    total = sum(r["paginas"] for r in resultados)
+    metadados.update(total_paginas=total, arquivos=[r["arquivo"] for r in resultados])
+    armazenamento.salvar_metadados(metadados)
+
+    tamanho_lote = args.lote if args.lote is not None else Constantes.LOTE_PAGINAS.get(args.funcao, 1)
+    paginas = medidor.gerador(
+        Arquivo.gerar_paginas(resultados, args.modo_leitura, armazenamento.pasta_imagens), "preparacao"
+    )
+
+    print(f"⏳ Processando {total} página(s) em {len(arquivos)} arquivo(s)...")
+    tarefa = GerenciadorTarefas.criar(
+        paginas, total, modelo, prompt, armazenamento, usar_cache=False, tamanho_lote=tamanho_lote
+    )
+    tarefa.aguardar()
+    duracao = time.perf_counter() - inicio
+
+    # Finalização (montagem do resultado + template), em um contexto de requisição do Flask
+    for _ in range(args.repeticoes_finalizacao):
+        with aplicacao.app.test_request_context(), medidor.medir("finalizacao"):
+            aplicacao.finalizar_processamento(armazenamento)
+
+    amostrador.parar()
+
+    return {
+        "cenario": args.cenario,
+        "data": datetime.now().isoformat(timespec="seconds"),
+        "ambiente": {
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "config": {
+            "funcao": args.funcao,
+            "sub_opcao": args.sub_opcao,
+            "modo_leitura": args.modo_leitura,
+            "latencia_s": args.latencia,
+            "variacao_s": args.variacao,
+            "taxa_erro": args.taxa_erro,
+            "caracteres": args.caracteres,
+            "paralelas": args.paralelas,
+            "tamanho_lote": tamanho_lote,
+            "processos_renderizacao": Constantes.PROCESSOS_RENDERIZACAO,
+            "politica_imagem": Constantes.POLITICA_IMAGEM,
+        },
+        "estado": tarefa.estado,
+        "arquivos": len(arquivos),
+        "paginas": total,
+        "chamadas_modelo": modelo.chamadas,
+        "duracao_s": round(duracao, 3),
+        "paginas_por_s": round(total / duracao, 3) if duracao else 0,
+        "etapas": medidor.resumo(),
+        "partida": partida,
+        "rss_pico_mb": round(amostrador.rss_pico / 2**20, 1),
+        "disco_temp_pico_mb": round(amostrador.disco_pico / 2**20, 2),
+        "imagens": PoliticaImagem.estatisticas(),
+        # Só as folhas em branco do corpus podem ser puladas (slides escuros e fotos, nunca)
+        "paginas_em_branco_esperadas": (
+            corpus.paginas_em_branco(args.cenario)
+            if Constantes.PREPROCESSAMENTO["ativo"] and Constantes.PREPROCESSAMENTO["pular_em_branco"] else 0
+        ),
+        "gemini": AgendadorGemini.estatisticas(),
+    }
+
+
+#==========================================================
+# Comparação com a baseline
+#==========================================================
+def conferir_paginas_puladas(resultado: dict) -> str | None:
+    """Erro se o Preprocessamento pulou páginas com conteúdo (ou deixou de pular as em branco)."""
+    puladas = resultado["imagens"]["paginas_em_branco"]
+    esperadas = resultado["paginas_em_branco_esperadas"]
+    if puladas != esperadas:
+        return f"{puladas} página(s) puladas como em branco; o corpus tem {esperadas}"
+    return None
+
+
+def comparar(atual: dict, base: dict, limiar: float) -> list[str]:
+    """Lista as métricas que pioraram mais que `limiar` (fração) em relação à baseline."""
+    regressoes = []
+
+    def pior(nome, valor, referencia, maior_melhor=False, minimo=0.0, tolerancia=None):
+        if referencia is None or referencia <= minimo:
+            return
+        variacao = (valor - referencia) / referencia
+        if maior_melhor:
+            variacao = -variacao
+        if variacao > (tolerancia or limiar):
+            regressoes.append(f"{nome}: {referencia} → {valor} ({variacao:+.0%})")
+
+    pior("paginas_por_s", atual["paginas_por_s"], base.get("paginas_por_s"), maior_melhor=True)
+    # Etapas muito curtas (< 5 ms) ou com poucas amostras (o p90 vira o máximo) oscilam demais para comparar
+    for etapa, dados in atual["etapas"].items():
+        if dados["n"] < AMOSTRAS_MIN_ETAPA:
+            continue
+        referencia = base.get("etapas", {}).get(etapa, {}).get("p90")
+        pior(f"{etapa}.p90", dados["p90"], referencia, minimo=0.005)
+    # A importação oscila bastante entre processos (e abaixo de 50 ms, demais): tolera até
+    # o dobro, mas nenhuma biblioteca pesada pode passar a ser carregada nela
+    for modulo in ("app", "asgi"):
+        valor = atual.get("partida", {}).get(f"{modulo}_s")
+        if valor is None:
+            continue
+        pior(f"partida.{modulo}_s", valor, base.get("partida", {}).get(f"{modulo}_s"),
+             minimo=0.05, tolerancia=max(limiar, 1.0))
+        novos = set(atual["partida"][f"{modulo}_pesados"] or []) - set(base.get("partida", {}).get(f"{modulo}_pesados") or [])
+        if novos:
+            regressoes.append(f"partida.{modulo}_pesados: {', '.join(sorted(novos))} carregada(s) na importação")
+    pior("rss_pico_mb", atual["rss_pico_mb"], base.get("rss_pico_mb"))
+    pior("disco_temp_pico_mb", atual["disco_temp_pico_mb"], base.get("disco_temp_pico_mb"), minimo=1.0)
+    return regressoes
+
+
+def imprimir(resultado: dict):
+    print(f"\n📊 Cenário {resultado['cenario']!r}: {resultado['paginas']} página(s), "
+          f"{resultado['chamadas_modelo']} chamada(s) ao modelo, estado {resultado['estado']}")
+    print(f"   - Páginas/s: {resultado['paginas_por_s']}  (total {resultado['duracao_s']} s)")
+    print(f"   - RSS pico: {resultado['rss_pico_mb']} MB | Disco temporário pico: {resultado['disco_temp_pico_mb']} MB")
+    partida = resultado.get("partida", {})
+    for modulo in ("app", "asgi"):
+        if partida.get(f"{modulo}_s") is not None:
+            pesados = ", ".join(partida[f"{modulo}_pesados"]) or "nenhuma"
+            print(f"   - Importação de {modulo}.py: {partida[f'{modulo}_s']} s (bibliotecas pesadas carregadas: {pesados})")
+    print(f"   {'etapa':<16}{'n':>6}{'p50':>10}{'p90':>10}{'p99':>10}{'max':>10}")
+    for etapa, d in resultado["etapas"].items():
+        print(f"   {etapa:<16}{d['n']:>6}{d['p50']:>10.4f}{d['p90']:>10.4f}{d['p99']:>10.4f}{d['max']:>10.4f}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark offline do pipeline do Leitor")
+    parser.add_argument("--cenario", default="padrao", choices=["pequeno", "padrao", "grande"])
+    parser.add_argument("--funcao", default="text_analysis")
+    parser.add_argument("--sub-opcao", default="summary")
+    parser.add_argument("--modo-leitura", default="auto", choices=["auto", "texto", "imagem"])
+    parser.add_argument("--latencia", type=float, default=0.5, help="Latência média do modelo falso (s)")
+    parser.add_argument("--variacao", type=float, default=0.2, help="Desvio padrão da latência (s)")
+    parser.add_argument("--taxa-erro", type=float, default=0.0, help="Fração de chamadas com erro 503")
+    parser.add_argument("--caracteres", type=int, default=1500, help="Tamanho da resposta por página")
+    parser.add_argument("--paralelas", type=int, default=4, help="Páginas simultâneas (MAX_PAGINAS_SIMULTANEAS)")
+    parser.add_argument("--lote", type=int, default=None, help="Páginas por chamada (padrão: LOTE_PAGINAS)")
+    parser.add_argument("--repeticoes-finalizacao", type=int, default=5)
+    parser.add_argument("--semente", type=int, default=0)
+    parser.add_argument("--limiar", type=float, default=0.2, help="Piora tolerada (fração) antes de falhar")
+    parser.add_argument("--baseline", type=Path, default=None, help="Arquivo de baseline (padrão: por cenário)")
+    parser.add_argument("--salvar-baseline", action="store_true", help="Grava o resultado como baseline")
+    parser.add_argument("--exigir-baseline", action="store_true", help="Falha sem baseline (integração contínua)")
+    parser.add_argument("--saida", type=Path, default=None, help="Grava o resultado em JSON")
+    args = parser.parse_args(argv)
+
+    pasta_trabalho = tempfile.mkdtemp(prefix="leitor_benchmark_")
+    os.environ["LEITOR_PASTA_TEMP"] = os.path.join(pasta_trabalho, "temp")
+    try:
+        resultado = executar(args, pasta_trabalho)
+    finally:
+        shutil.rmtree(pasta_trabalho, ignore_errors=True)
+
+    imprimir(resultado)
+    if args.saida:
+        args.saida.write_text(json.dumps(resultado, indent=2, ensure_ascii=False), encoding="utf-8")
+
+    if (erro := conferir_paginas_puladas(resultado)) is not None:
+        print(f"\n❌ Páginas em branco: {erro}")
+        return 1
+
+    caminho_baseline = args.baseline or PASTA_BASELINES / f"{args.cenario}.json"
+    if args.salvar_baseline:
+        caminho_baseline.parent.mkdir(parents=True, exist_ok=True)
+        caminho_baseline.write_text(json.dumps(resultado, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"\n💾 Baseline gravada em {caminho_baseline}")
+        return 0
+
+    if not caminho_baseline.is_file():
+        if args.exigir_baseline:
+            print(f"\n❌ Sem baseline em {caminho_baseline}")
+            return 1
+        print(f"\nℹ️ Sem baseline em {caminho_baseline}; use --salvar-baseline para criar")
+        return 0
+
+    base = json.loads(caminho_baseline.read_text(encoding="utf-8"))
+    if base.get("config") != resultado["config"]:
+        print("⚠️ Configuração diferente da baseline; a comparação pode não ser representativa")
+    regressoes = comparar(resultado, base, args.limiar)
+    if regressoes:
+        print(f"\n❌ Regressão acima de {args.limiar:.0%} em relação a {caminho_baseline.name}:")
+        for r in regressoes:
+            print(f"   - {r}")
+        return 1
+    print(f"\n✅ Sem regressões acima de {args.limiar:.0%} em relação a {caminho_baseline.name}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
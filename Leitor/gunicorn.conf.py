@@ -0,0 +1,51 @@
+import os
+import signal
+
+#==========================================================
+# Servidor de produção (gunicorn -c gunicorn.conf.py app:app)
+#==========================================================
+# Vários processos atendem a mesma aplicação Flask; o andamento das
+# tarefas fica no RegistroTarefas (SQLite na pasta temporária), que
+# todos os workers enxergam. As cotas do Gemini e os processos de
+# renderização são divididos entre os workers (LEITOR_PROCESSOS_SERVIDOR,
+# definido aqui antes de as constantes serem lidas).
+
+workers = int(os.environ.setdefault("LEITOR_PROCESSOS_SERVIDOR", str(min(4, os.cpu_count() or 1))))
+
+from src.utils.constantes import Constantes  # noqa: E402 (lê LEITOR_PROCESSOS_SERVIDOR)
+
+# As sessões (e com elas a posse das tarefas) são assinadas com esta chave
+if Constantes.CHAVE_FLASK == Constantes.CHAVE_FLASK_PADRAO:
+    raise SystemExit("❌ Defina LEITOR_CHAVE_FLASK (a mesma em todos os workers) antes de iniciar o servidor")
+
+bind = os.environ.get("LEITOR_ENDERECO", "0.0.0.0:5000")
+# Threads por worker: cada acompanhamento por SSE ocupa uma enquanto a tarefa roda
+worker_class = "gthread"
+threads = int(os.environ.get("LEITOR_THREADS_SERVIDOR", 32))
+timeout = 120
+# Tempo para terminar as páginas já enviadas ao Gemini antes do SIGKILL
+graceful_timeout = Constantes.DRENAGEM_MAX_S + 5
+# Cada worker importa a aplicação: nada de threads ou pools herdados por fork
+preload_app = False
+
+
+def post_worker_init(worker):
+    """No SIGTERM, o worker para de enviar páginas antes de deixar de aceitar conexões."""
+    from src.modules.tarefas import GerenciadorTarefas
+
+    anterior = signal.getsignal(signal.SIGTERM)
+
+    def ao_encerrar(sinal, quadro):
+        GerenciadorTarefas.iniciar_drenagem()
+        if callable(anterior):
+            anterior(sinal, quadro)
+
+    signal.signal(signal.SIGTERM, ao_encerrar)
+
+
+def worker_exit(server, worker):
+    """Espera as páginas em andamento e devolve as tarefas inacabadas ao registro."""
+    from src.modules.tarefas import GerenciadorTarefas
+
+    restantes = GerenciadorTarefas.drenar()
+    server.log.info(f"Worker {worker.pid} encerrado ({restantes} tarefa(s) ainda em andamento)")
@@ -0,0 +1,311 @@
+import os
+import sys
+import glob
+import json
+import time
+import hashlib
+import argparse
+import threading
+from pathlib import Path
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Evita criação de __pycache__
+sys.dont_write_bytecode = True
+
+#==========================================================
+# Processamento em lote pela linha de comando (sem Flask/Qt)
+#==========================================================
+# Processa diretórios ou padrões glob com o mesmo pipeline da interface
+# (Arquivo, Gemini e GerenciadorTarefas): vários arquivos ao mesmo tempo e,
+# em cada um, as páginas em paralelo pelo pool compartilhado.
+#
+#   python lote.py digitalizados/ --funcao text_analysis --sub-opcao summary
+#   python lote.py "entrada/**/*.pdf" --funcao translation --idioma en --saida traducoes/
+#
+# Em --saida ficam:
+#   <arquivo>.<hash>.<opções>.jsonl   um registro por página (arquivo, página,
+#                                     texto, tokens)
+#   manifesto.jsonl                   um resumo por arquivo concluído (estado, páginas,
+#                                     erros, tokens, duração, resumo do documento)
+#
+# O manifesto só recebe a linha de um arquivo depois que o JSONL das suas
+# páginas está gravado; ao repetir o comando, os arquivos já concluídos
+# com as mesmas opções (mesmo conteúdo, função, sub-opção e idioma) são
+# pulados. Use --refazer para processá-los de novo.
+
+ARQUIVO_MANIFESTO = "manifesto.jsonl"
+
+
+#==========================================================
+# Manifesto (retomada segura)
+#==========================================================
+class Manifesto:
+    """
+    Registro dos arquivos concluídos, acrescentado linha a linha com
+    fsync: uma interrupção perde no máximo a linha em gravação, que é
+    ignorada na leitura (e o arquivo correspondente é refeito).
+    """
+
+    def __init__(self, caminho: Path):
+        self.caminho = caminho
+        self._lock = threading.Lock()
+        self.estados: dict[str, str] = {}
+        if caminho.is_file():
+            with open(caminho, encoding="utf-8") as f:
+                for linha in f:
+                    try:
+                        registro = json.loads(linha)
+                    except json.JSONDecodeError:
+                        continue
+                    self.estados[registro["chave"]] = registro["estado"]
+
+    def concluido(self, chave: str) -> bool:
+        return self.estados.get(chave) in ("concluido", "rejeitado")
+
+    def registrar(self, registro: dict):
+        dados = json.dumps(registro, ensure_ascii=False) + "\n"
+        with self._lock:
+            with open(self.caminho, "a", encoding="utf-8") as f:
+                f.write(dados)
+                f.flush()
+                os.fsync(f.fileno())
+            self.estados[registro["chave"]] = registro["estado"]
+
+
+#==========================================================
+# Entradas
+#==========================================================
+def listar_entradas(padroes: list[str], extensoes: set[str]) -> list[Path]:
+    """Arquivos das pastas (recursivamente), padrões glob e caminhos informados."""
+    encontrados = set()
+    for padrao in padroes:
+        caminho = Path(padrao)
+        if caminho.is_dir():
+            candidatos = (p for p in caminho.rglob("*") if p.is_file())
+        elif caminho.is_file():
+            candidatos = [caminho]
+        else:
+            candidatos = (Path(p) for p in glob.glob(padrao, recursive=True))
+        encontrados.update(
+            p.resolve() for p in candidatos
+            if p.is_file() and p.suffix.lower().lstrip(".") in extensoes
+        )
+    return sorted(encontrados)
+
+
+def hash_arquivo(caminho: Path, bloco: int) -> str:
+    sha = hashlib.sha256()
+    with open(caminho, "rb") as f:
+        while dados := f.read(bloco):
+            sha.update(dados)
+    return sha.hexdigest()
+
+
+class _ArquivoLocal:
+    """Imita o FileStorage do Flask para um arquivo local."""
+
+    def __init__(self, caminho: Path, stream):
+        self.filename = caminho.name
+        self.stream = stream
+
+
+def gravar_atomico(caminho: Path, linhas):
+    """Grava o arquivo inteiro em um temporário e o move para o lugar."""
+    temporario = caminho.with_name(caminho.name + ".tmp")
+    with open(temporario, "w", encoding="utf-8") as f:
+        for linha in linhas:
+            f.write(json.dumps(linha, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporario, caminho)
+
+
+#==========================================================
+# Execução
+#==========================================================
+def executar(args) -> int:
+    # Importados aqui: LEITOR_PASTA_TEMP (--temp) precisa valer antes da
+    # importação, e os processos de renderização não precisam deles.
+    import google.generativeai as genai
+    from src.utils.constantes import Constantes
+    from src.utils.prompts import Prompts
+    from src.modules.funcoes import Arquivo
+    from src.modules.armazenamento import ResultadosTarefa
+    from src.modules.tarefas import GerenciadorTarefas
+    from src.modules.registro import RegistroTarefas
+    from src.modules.metricas import Log
+
+    Log.configurar()
+    if args.paralelas:
+        Constantes.MAX_PAGINAS_SIMULTANEAS = args.paralelas
+        Constantes.COTA_GEMINI["concorrencia_inicial"] = args.paralelas
+    Arquivo.criar_pastas()
+
+    entradas = listar_entradas(args.entradas, Constantes.PERMITE_EXTENCAO_UPLOAD)
+    if not entradas:
+        print("❌ Nenhum arquivo PDF/JPG/PNG encontrado nas entradas informadas")
+        return 2
+
+    genai.configure(api_key=args.chave_api or Constantes.CHAVE_API_GEMINI)
+    modelo = genai.GenerativeModel(
+        model_name=Constantes.MODELO_GEMINI,
+        generation_config=Constantes.CONFIG_GEMINI,
+    )
+    sub_opcao = args.sub_opcao if args.funcao == "text_analysis" else None
+    idioma = args.idioma if args.funcao == "translation" else None
+    prompt = Prompts.montar_prompt(args.funcao, sub_opcao, idioma)
+    tamanho_lote = Constantes.LOTE_PAGINAS.get(args.funcao, 1)
+    opcoes = f"{args.funcao}/{sub_opcao or '-'}/{idioma or '-'}"
+    sufixo = ".".join(p for p in (args.funcao, sub_opcao, idioma) if p)
+
+    args.saida.mkdir(parents=True, exist_ok=True)
+    manifesto = Manifesto(args.saida / ARQUIVO_MANIFESTO)
+
+    def processar(caminho: Path) -> dict | None:
+        hash_conteudo = hash_arquivo(caminho, Constantes.BLOCO_UPLOAD)
+        chave = f"{hash_conteudo}:{opcoes}"
+        if manifesto.concluido(chave) and not args.refazer:
+            return None
+
+        inicio = time.perf_counter()
+        base = {"chave": chave, "arquivo": str(caminho), "hash": hash_conteudo, "opcoes": opcoes}
+        metadados = {
+            "prompt": prompt,
+            "prompt_option": args.funcao,
+            "sub_prompt_option": sub_opcao,
+            "target_language": idioma,
+            "modo_leitura": args.modo_leitura,
+            "orcamento_tokens": args.orcamento or Constantes.ORCAMENTO_TOKENS_TAREFA,
+            "usar_cache": not args.ignorar_cache,
+        }
+        armazenamento = ResultadosTarefa.criar(metadados)
+        try:
+            rejeitados = []
+            with open(caminho, "rb") as stream:
+                resultados = Arquivo.processar_arquivos(
+                    [_ArquivoLocal(caminho, stream)], rejeitados, pasta=armazenamento.pasta_uploads
+                )
+            if not resultados:
+                registro = {**base, "estado": "rejeitado", "motivo": "; ".join(rejeitados)}
+                manifesto.registrar(registro)
+                return registro
+
+            total = resultados[0]["paginas"]
+            metadados.update(total_paginas=total, arquivos=[caminho.name])
+            armazenamento.salvar_metadados(metadados)
+            paginas = Arquivo.gerar_paginas(resultados, args.modo_leitura, armazenamento.pasta_imagens)
+            tarefa = GerenciadorTarefas.criar(
+                paginas, total, modelo, prompt, armazenamento,
+                usar_cache=not args.ignorar_cache, tamanho_lote=tamanho_lote,
+            )
+            tarefa.aguardar()
+            GerenciadorTarefas.remover(tarefa.id)
+
+            saida = args.saida / f"{caminho.stem}.{hash_conteudo[:12]}.{sufixo}.jsonl"
+            erros = 0
+
+            def registros():
+                nonlocal erros
+                for r in armazenamento.registros():
+                    erro = r["texto"].startswith("Erro ao processar")
+                    erros += erro
+                    yield {
+                        "arquivo": str(caminho), "hash": hash_conteudo, "pagina": r["pagina"] + 1,
+                        "texto": r["texto"], "erro": erro, "uso": r.get("uso"),
+                    }
+            gravar_atomico(saida, registros())
+
+            registro = {
+                **base,
+                "estado": "concluido" if tarefa.estado == "concluida" else "erro",
+                "erro": tarefa.erro,
+                "paginas": total,
+                "paginas_com_erro": erros,
+                "interrompido": tarefa.interrompida,
+                "consumo": tarefa.consumo,
+                "duracao_s": round(time.perf_counter() - inicio, 3),
+                "saida": saida.name,
+                "resumo": armazenamento.resumo(),
+                "data": datetime.now().isoformat(timespec="seconds"),
+            }
+            manifesto.registrar(registro)
+            return registro
+        finally:
+            RegistroTarefas.remover(armazenamento.id)
+            armazenamento.remover()
+
+    print(f"📂 {len(entradas)} arquivo(s) encontrado(s); saída em {args.saida}")
+    inicio = time.perf_counter()
+    contagem = {"concluido": 0, "erro": 0, "rejeitado": 0, "pulado": 0}
+    with ThreadPoolExecutor(max_workers=args.arquivos, thread_name_prefix="lote") as executor:
+        futuros = {executor.submit(processar, caminho): caminho for caminho in entradas}
+        try:
+            for futuro in as_completed(futuros):
+                caminho = futuros[futuro]
+                try:
+                    registro = futuro.result()
+                except Exception as e:
+                    contagem["erro"] += 1
+                    print(f"❌ {caminho.name}: {e}")
+                    continue
+                if registro is None:
+                    contagem["pulado"] += 1
+                    continue
+                contagem[registro["estado"]] += 1
+                if registro["estado"] == "rejeitado":
+                    print(f"⚠️ {caminho.name}: {registro['motivo']}")
+                else:
+                    print(
+                        f"{'✅' if registro['estado'] == 'concluido' else '❌'} {caminho.name}: "
+                        f"{registro['paginas']} página(s), {registro['paginas_com_erro']} com erro, "
+                        f"{registro['consumo']['tokens_total']} tokens, {registro['duracao_s']:.1f} s"
+                    )
+        except KeyboardInterrupt:
+            # Os arquivos em andamento terminam; os demais ficam para a próxima execução
+            print("\n⏹️ Interrompido: aguardando os arquivos em andamento...")
+            for futuro in futuros:
+                futuro.cancel()
+            raise
+
+    duracao = time.perf_counter() - inicio
+    print(
+        f"\n🏁 {contagem['concluido']} concluído(s), {contagem['erro']} com erro, "
+        f"{contagem['rejeitado']} rejeitado(s), {contagem['pulado']} já processado(s) "
+        f"em {duracao:.1f} s"
+    )
+    return 1 if contagem["erro"] else 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Processamento em lote do Leitor (sem interface)")
+    parser.add_argument("entradas", nargs="+", help="Pastas, arquivos ou padrões glob (ex.: 'pdfs/**/*.pdf')")
+    parser.add_argument("--funcao", default="text_analysis",
+                        choices=["text_analysis", "translation", "summarize", "math_operation",
+                                 "ai_check", "extract", "validate"])
+    parser.add_argument("--sub-opcao", default="summary", choices=["summary", "full_extraction", "sanitize"],
+                        help="Sub-opção de text_analysis")
+    parser.add_argument("--idioma", default="en", help="Idioma de destino da tradução")
+    parser.add_argument("--modo-leitura", default="auto", choices=["auto", "texto", "imagem"])
+    parser.add_argument("--saida", type=Path, default=Path("saida_lote"), help="Pasta dos JSONL e do manifesto")
+    parser.add_argument("--arquivos", type=int, default=4, help="Arquivos processados ao mesmo tempo")
+    parser.add_argument("--paralelas", type=int, default=None,
+                        help="Páginas simultâneas no Gemini (padrão: MAX_PAGINAS_SIMULTANEAS)")
+    parser.add_argument("--orcamento", type=int, default=None,
+                        help="Orçamento de tokens por arquivo (padrão: ORCAMENTO_TOKENS_TAREFA)")
+    parser.add_argument("--ignorar-cache", action="store_true", help="Não usa o cache de respostas")
+    parser.add_argument("--refazer", action="store_true", help="Processa também os arquivos já concluídos")
+    parser.add_argument("--chave-api", default=os.environ.get("GEMINI_API_KEY"), help="Chave da API do Gemini")
+    parser.add_argument("--temp", default=None, help="Pasta temporária (padrão: src/temp)")
+    args = parser.parse_args(argv)
+
+    if args.temp:
+        os.environ["LEITOR_PASTA_TEMP"] = os.path.abspath(args.temp)
+    try:
+        return executar(args)
+    except KeyboardInterrupt:
+        return 130
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+import os
+import random
+import fitz  # PyMuPDF
+from PIL import Image, ImageDraw
+
+#==========================================================
+# Corpus sintético para o benchmark
+#==========================================================
+# Cada cenário lista (tipo, páginas): PDFs digitais (camada de texto),
+# PDFs "escaneados" (uma imagem por página, sempre rasterizados),
+# imagens avulsas em PNG/JPG de tamanhos variados e PDFs "variados"
+# (slide escuro com texto claro, foto em degradê e folha em branco, nessa
+# ordem), que conferem quais páginas o Preprocessamento pula.
+CENARIOS = {
+    "pequeno": [("pdf_texto", 2), ("pdf_imagem", 2), ("png", 1), ("pdf_variado", 3)],
+    "padrao": [("pdf_texto", 10), ("pdf_imagem", 10), ("pdf_misto", 20), ("png", 1), ("jpg", 1),
+               ("pdf_variado", 3)],
+    "grande": [("pdf_texto", 50), ("pdf_imagem", 50), ("pdf_misto", 100), ("png", 1), ("jpg", 1),
+               ("pdf_variado", 6)],
+}
+
+_TEXTO = (
+    "O processamento de documentos envolve leitura, conversão e análise de páginas. "
+    "Cada parágrafo deste corpus é gerado de forma determinística para o benchmark. "
+)
+
+
+def _imagem_ruido(largura: int, altura: int, aleatorio: random.Random) -> Image.Image:
+    """Imagem com texto simulado e manchas, difícil de comprimir como um scan real."""
+    img = Image.new("RGB", (largura, altura), "white")
+    desenho = ImageDraw.Draw(img)
+    for y in range(40, altura - 40, 28):
+        x = 40
+        while x < largura - 80:
+            w = aleatorio.randint(20, 70)
+            desenho.rectangle([x, y, x + w, y + 12], fill=(aleatorio.randint(0, 60),) * 3)
+            x += w + aleatorio.randint(8, 16)
+    for _ in range(20):
+        x, y = aleatorio.randint(0, largura), aleatorio.randint(0, altura)
+        cor = tuple(aleatorio.randint(0, 255) for _ in range(3))
+        desenho.ellipse([x, y, x + 60, y + 40], fill=cor)
+    return img
+
+
+def _pagina_texto(documento: fitz.Document, n: int):
+    pagina = documento.new_page()
+    pagina.insert_textbox(fitz.Rect(56, 56, 540, 790), f"Página {n}\n\n" + _TEXTO * 12, fontsize=10)
+
+
+def _pagina_imagem(documento: fitz.Document, aleatorio: random.Random, pasta: str,
+                   img: Image.Image | None = None):
+    caminho = os.path.join(pasta, "_scan.jpg")
+    (img or _imagem_ruido(1240, 1754, aleatorio)).save(caminho, quality=80)
+    pagina = documento.new_page()
+    pagina.insert_image(pagina.rect, filename=caminho)
+    os.remove(caminho)
+
+
+def _imagem_variada(n: int) -> Image.Image:
+    """Página n de um PDF "variado": slide escuro, foto em degradê ou folha em branco (com ruído leve)."""
+    tipo = (n - 1) % 3
+    if tipo == 0:
+        img = Image.new("RGB", (1240, 1754), (25, 30, 40))
+        desenho = ImageDraw.Draw(img)
+        for y in range(300, 1300, 60):
+            desenho.text((200, y), "Slide com texto claro sobre fundo escuro " * 3, fill=(235, 235, 235))
+        return img
+    if tipo == 1:
+        gradiente = Image.linear_gradient("L").resize((1240, 1754))
+        return Image.merge("RGB", (gradiente, gradiente.rotate(90), gradiente.transpose(Image.FLIP_TOP_BOTTOM)))
+    img = Image.effect_noise((1240, 1754), 3).point(lambda v: min(255, v + 124))
+    return img.convert("RGB")
+
+
+def paginas_em_branco(cenario: str) -> int:
+    """Quantas páginas do cenário são folhas em branco (as únicas que podem ser puladas)."""
+    return sum(paginas // 3 for tipo, paginas in CENARIOS[cenario] if tipo == "pdf_variado")
+
+
+def gerar(cenario: str, pasta: str, semente: int = 0) -> list[str]:
+    """Gera os arquivos do cenário em `pasta` e retorna seus caminhos."""
+    aleatorio = random.Random(semente)
+    os.makedirs(pasta, exist_ok=True)
+    caminhos = []
+    for i, (tipo, paginas) in enumerate(CENARIOS[cenario]):
+        if tipo in ("png", "jpg"):
+            caminho = os.path.join(pasta, f"imagem_{i}.{tipo}")
+            largura = aleatorio.choice([800, 1600, 2400])
+            _imagem_ruido(largura, int(largura * 1.4), aleatorio).save(caminho)
+        else:
+            caminho = os.path.join(pasta, f"{tipo}_{i}_{paginas}p.pdf")
+            documento = fitz.open()
+            for n in range(1, paginas + 1):
+                if tipo == "pdf_texto" or (tipo == "pdf_misto" and n % 2):
+                    _pagina_texto(documento, n)
+                elif tipo == "pdf_variado":
+                    _pagina_imagem(documento, aleatorio, pasta, _imagem_variada(n))
+                else:
+                    _pagina_imagem(documento, aleatorio, pasta)
+            documento.save(caminho, deflate=True)
+            documento.close()
+        caminhos.append(caminho)
+    return caminhos
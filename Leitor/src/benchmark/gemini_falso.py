@@ -0,0 +1,111 @@
+import re
+import time
+import random
+import asyncio
+import threading
+from types import SimpleNamespace
+import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
+
+#==========================================================
+# Backend local que imita o Gemini (benchmark offline)
+#==========================================================
+class _Trecho:
+    def __init__(self, texto: str):
+        self.text = texto
+
+
+class RespostaFalsa:
+    """Resposta em streaming com a mesma interface usada pelo projeto."""
+
+    def __init__(self, trechos: list[str], tokens_entrada: int):
+        self._trechos = trechos
+        self.text = "".join(trechos)
+        self.candidates = [SimpleNamespace(finish_reason=SimpleNamespace(name="STOP"))]
+        self.usage_metadata = SimpleNamespace(
+            prompt_token_count=tokens_entrada,
+            candidates_token_count=len(self.text) // 4,
+            total_token_count=tokens_entrada + len(self.text) // 4,
+        )
+
+    def __iter__(self):
+        for trecho in self._trechos:
+            yield _Trecho(trecho)
+
+    async def __aiter__(self):
+        for trecho in self._trechos:
+            yield _Trecho(trecho)
+
+
+class ModeloFalso:
+    """
+    Substitui genai.GenerativeModel com latência, taxa de erro e tamanho
+    de resposta configuráveis. Pedidos em lote (delimitadores de página)
+    recebem uma resposta por página, no formato esperado por dividir_lote.
+    """
+    _DELIMITADOR = re.compile(r"^=== PÁGINA (\d+) ===$")
+
+    def __init__(self, latencia_s: float = 0.5, variacao_s: float = 0.2,
+                 taxa_erro: float = 0.0, caracteres: int = 1500, semente: int = 0):
+        self.model_name = "modelo-falso"
+        self.latencia_s = latencia_s
+        self.variacao_s = variacao_s
+        self.taxa_erro = taxa_erro
+        self.caracteres = caracteres
+        self._aleatorio = random.Random(semente)
+        self._lock = threading.Lock()
+        self.chamadas = 0
+
+    def _sortear(self) -> tuple[float, bool]:
+        with self._lock:
+            self.chamadas += 1
+            espera = max(0.0, self._aleatorio.gauss(self.latencia_s, self.variacao_s))
+            return espera, self._aleatorio.random() < self.taxa_erro
+
+    def _responder(self, partes: list) -> RespostaFalsa:
+        marcas = [p for p in partes if isinstance(p, str) and self._DELIMITADOR.match(p)]
+        corpo = ("Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 200)[:self.caracteres]
+        if marcas:
+            texto = "\n".join(f"{marca}\n## Página\n{corpo}" for marca in marcas)
+        else:
+            texto = f"## Página\n{corpo}"
+        trechos = [texto[i:i + 400] for i in range(0, len(texto), 400)] or [""]
+        tokens = sum(len(p) // 4 if isinstance(p, str) else 1548 for p in partes)
+        return RespostaFalsa(trechos, tokens)
+
+    def generate_content(self, partes: list, stream: bool = False, **kwargs) -> RespostaFalsa:
+        espera, falhar = self._sortear()
+        time.sleep(espera)
+        if falhar:
+            raise google_exceptions.ServiceUnavailable("Erro simulado pelo backend falso")
+        return self._responder(partes)
+
+    async def generate_content_async(self, partes: list, stream: bool = False, **kwargs) -> RespostaFalsa:
+        espera, falhar = self._sortear()
+        await asyncio.sleep(espera)
+        if falhar:
+            raise google_exceptions.ServiceUnavailable("Erro simulado pelo backend falso")
+        return self._responder(partes)
+
+
+class _ArquivoFalso:
+    def __init__(self, nome: str):
+        self.name = nome
+        self.state = SimpleNamespace(name="ACTIVE")
+        self.expiration_time = None
+
+
+def instalar(latencia_upload_s: float = 0.05):
+    """Troca as funções da File API por versões locais (sem rede)."""
+    contador = iter(range(1, 1 << 62))
+    lock = threading.Lock()
+
+    def upload_file(caminho, mime_type=None, **kwargs):
+        time.sleep(latencia_upload_s)
+        with lock:
+            return _ArquivoFalso(f"files/falso-{next(contador)}")
+
+    genai.configure = lambda *args, **kwargs: None
+    genai.upload_file = upload_file
+    genai.get_file = lambda nome: _ArquivoFalso(nome)
+    genai.delete_file = lambda nome: None
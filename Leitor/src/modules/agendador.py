@@ -0,0 +1,417 @@
+import re
+import time
+import random
+import asyncio
+import logging
+import threading
+from collections import deque
+from typing import Awaitable, Callable
+from src.utils.constantes import Constantes
+from src.utils.importacao import ModuloAdiado
+
+# Importado no primeiro erro a classificar
+google_exceptions = ModuloAdiado("google.api_core.exceptions")
+
+logger = logging.getLogger(__name__)
+
+#==========================================================
+# Erros classificados
+#==========================================================
+class ErroGemini(Exception):
+    """Falha de uma chamada ao Gemini que não deve (mais) ser repetida."""
+
+    def __init__(self, classe: str, original: Exception):
+        super().__init__(f"{classe}: {original}")
+        self.classe = classe
+        self.original = original
+
+
+#==========================================================
+# Balde de tokens (requisições ou tokens por minuto)
+#==========================================================
+class BaldeTokens:
+    """
+    Balde que se recarrega continuamente a `por_minuto / 60` unidades por
+    segundo, com capacidade de `rajada_s` segundos de cota. reservar()
+    debita na hora e devolve quanto o chamador deve esperar; o saldo
+    pode ficar negativo, o que enfileira os chamadores seguintes na
+    ordem de chegada sem precisar de uma thread de controle.
+    """
+
+    def __init__(self, por_minuto: float, rajada_s: float):
+        self.taxa = por_minuto / 60
+        self.capacidade = max(1.0, self.taxa * rajada_s)
+        self.saldo = self.capacidade
+        self._ultimo = time.monotonic()
+
+    def _recarregar(self):
+        agora = time.monotonic()
+        self.saldo = min(self.capacidade, self.saldo + (agora - self._ultimo) * self.taxa)
+        self._ultimo = agora
+
+    def reservar(self, quantidade: float) -> float:
+        """Debita a quantidade e retorna a espera (s) até ela estar coberta."""
+        if self.taxa <= 0:
+            return 0.0
+        self._recarregar()
+        self.saldo -= quantidade
+        return 0.0 if self.saldo >= 0 else -self.saldo / self.taxa
+
+    def ajustar(self, diferenca: float):
+        """Corrige o saldo quando o consumo real difere da estimativa."""
+        self._recarregar()
+        self.saldo = min(self.capacidade, self.saldo - diferenca)
+
+
+#==========================================================
+# Agendador das chamadas ao Gemini
+#==========================================================
+class AgendadorGemini:
+    """
+    Ponto único por onde passam as chamadas generate_content, de todas
+    as tarefas e usuários do processo:
+
+      - cotas de requisições e tokens por minuto (Constantes.COTA_GEMINI);
+      - classificação dos erros: limite (429), transitorio (5xx, timeout),
+        grande (payload/imagem acima do limite) e permanente;
+      - repetição com backoff exponencial com jitter, respeitando o
+        tempo de espera sugerido pela API;
+      - concorrência adaptativa (AIMD): +1/limite a cada sucesso, metade
+        a cada 429 e -10% quando a latência passa do alvo (até a primeira
+        redução o limite cresce +1 por sucesso).
+
+    Os contadores ficam disponíveis em estatisticas() (/gemini/status).
+    """
+    CLASSES = ("limite", "transitorio", "grande", "permanente")
+
+    # Intervalo mínimo entre duas reduções do limite (uma rajada de 429 conta uma vez)
+    INTERVALO_REDUCAO_S = 2.0
+
+    _PADRAO_GRANDE = re.compile(
+        r"payload size|too large|exceeds the maximum|request entity|input token count", re.IGNORECASE
+    )
+    _PADRAO_ESPERA = re.compile(
+        r"retry in ([\d.]+)\s*s|retry_delay\s*\{\s*seconds:\s*(\d+)", re.IGNORECASE
+    )
+
+    _lock = threading.Lock()
+    _vaga = threading.Condition(_lock)
+    # Corrotinas à espera de vaga: (loop, future) acordados por _avisar_vaga()
+    _esperas_async: list[tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+    _inicializado = False
+
+    @staticmethod
+    def config() -> dict:
+        return Constantes.COTA_GEMINI
+
+    @classmethod
+    def _iniciar(cls):
+        """Cria baldes e contadores na primeira chamada (chamar com _lock)."""
+        if cls._inicializado:
+            return
+        cfg = cls.config()
+        cls._requisicoes = BaldeTokens(cfg["rpm"], cfg["rajada_s"])
+        cls._tokens = BaldeTokens(cfg["tpm"], cfg["rajada_s"])
+        cls._limite = float(cfg["concorrencia_inicial"])
+        cls._em_andamento = 0
+        cls._pausa_ate = 0.0
+        cls._ultima_reducao = 0.0
+        cls._recentes: deque[tuple[float, int]] = deque()
+        cls._contadores = {
+            "chamadas": 0,
+            "sucessos": 0,
+            "repeticoes": 0,
+            "erros": dict.fromkeys(cls.CLASSES, 0),
+            "espera_cota_s": 0.0,
+            "espera_backoff_s": 0.0,
+            "tokens_estimados": 0,
+            "tokens_reais": 0,
+            "latencia_total_s": 0.0,
+            "latencia_max_s": 0.0,
+        }
+        cls._inicializado = True
+
+    #----------------------------------------------------------
+    # Estimativa de tokens
+    #----------------------------------------------------------
+    @staticmethod
+    def estimar_tokens(partes: list) -> int:
+        """Estimativa dos tokens de entrada: ~4 caracteres por token e um valor fixo por imagem."""
+        total = 0
+        for parte in partes:
+            if isinstance(parte, str):
+                total += len(parte) // 4 + 1
+            else:
+                total += Constantes.COTA_GEMINI["tokens_por_imagem"]
+        return total
+
+    #----------------------------------------------------------
+    # Classificação dos erros
+    #----------------------------------------------------------
+    @classmethod
+    def classificar(cls, erro: Exception) -> str:
+        """Classe do erro: limite, transitorio, grande ou permanente."""
+        if isinstance(erro, ErroGemini):
+            return erro.classe
+        codigo = getattr(erro, "code", None)
+        if isinstance(erro, (google_exceptions.ResourceExhausted, google_exceptions.TooManyRequests)) or codigo == 429:
+            return "limite"
+        if codigo == 413 or cls._PADRAO_GRANDE.search(str(erro)):
+            return "grande"
+        if isinstance(erro, (google_exceptions.ServerError, google_exceptions.DeadlineExceeded,
+                             google_exceptions.Aborted, google_exceptions.Unknown,
+                             ConnectionError, TimeoutError)):
+            return "transitorio"
+        return "permanente"
+
+    @classmethod
+    def espera_sugerida(cls, erro: Exception) -> float | None:
+        """Tempo de espera informado pela API (RetryInfo, Retry-After ou mensagem), se houver."""
+        for detalhe in getattr(erro, "details", None) or []:
+            atraso = getattr(detalhe, "retry_delay", None)
+            if atraso is not None and hasattr(atraso, "seconds"):
+                return atraso.seconds + getattr(atraso, "nanos", 0) / 1e9
+        resposta = getattr(erro, "response", None)
+        cabecalho = getattr(resposta, "headers", {}) or {}
+        try:
+            if cabecalho.get("Retry-After"):
+                return float(cabecalho["Retry-After"])
+        except (TypeError, ValueError):
+            pass
+        encontrado = cls._PADRAO_ESPERA.search(str(erro))
+        if encontrado:
+            return float(encontrado.group(1) or encontrado.group(2))
+        return None
+
+    #----------------------------------------------------------
+    # Cotas e concorrência
+    #----------------------------------------------------------
+    @classmethod
+    def _reservar(cls, tokens: int) -> float:
+        """Reserva 1 requisição e os tokens estimados; retorna a espera necessária."""
+        with cls._lock:
+            cls._iniciar()
+            espera = max(
+                cls._requisicoes.reservar(1),
+                cls._tokens.reservar(tokens),
+                cls._pausa_ate - time.monotonic(),
+                0.0,
+            )
+            cls._contadores["chamadas"] += 1
+            cls._contadores["tokens_estimados"] += tokens
+            cls._contadores["espera_cota_s"] += espera
+        if espera:
+            logger.debug(f"Aguardando cota do Gemini: {espera:.2f} s")
+        return espera
+
+    @classmethod
+    def _tentar_ocupar(cls) -> bool:
+        """Ocupa uma vaga de chamada simultânea se o limite atual permitir (chamar com _lock)."""
+        if cls._em_andamento < max(1, int(cls._limite)):
+            cls._em_andamento += 1
+            return True
+        return False
+
+    @classmethod
+    def _ocupar(cls):
+        with cls._vaga:
+            cls._iniciar()
+            cls._vaga.wait_for(cls._tentar_ocupar)
+
+    @classmethod
+    async def _ocupar_async(cls):
+        while True:
+            with cls._lock:
+                cls._iniciar()
+                if cls._tentar_ocupar():
+                    return
+                loop = asyncio.get_running_loop()
+                aviso = loop.create_future()
+                cls._esperas_async.append((loop, aviso))
+            try:
+                await aviso
+            except asyncio.CancelledError:
+                # Cancelada enquanto aguardava: o aviso não deve ficar na fila
+                with cls._lock:
+                    if (loop, aviso) in cls._esperas_async:
+                        cls._esperas_async.remove((loop, aviso))
+                raise
+
+    @staticmethod
+    def _acordar(aviso: asyncio.Future):
+        if not aviso.done():
+            aviso.set_result(None)
+
+    @classmethod
+    def _avisar_vaga(cls):
+        """Acorda threads e corrotinas que aguardam uma vaga (chamar com _lock)."""
+        cls._vaga.notify_all()
+        esperas, cls._esperas_async = cls._esperas_async, []
+        for loop, aviso in esperas:
+            try:
+                loop.call_soon_threadsafe(cls._acordar, aviso)
+            except RuntimeError:
+                # Loop já encerrado: ninguém mais aguarda esse aviso
+                pass
+
+    @classmethod
+    def _liberar(cls):
+        """Devolve a vaga de uma chamada interrompida, sem contá-la como sucesso ou erro."""
+        with cls._vaga:
+            cls._em_andamento -= 1
+            cls._avisar_vaga()
+
+    @classmethod
+    def _reduzir_limite(cls, fator: float, motivo: str):
+        """Redução multiplicativa, no máximo uma a cada INTERVALO_REDUCAO_S (chamar com _lock)."""
+        agora = time.monotonic()
+        if agora - cls._ultima_reducao < cls.INTERVALO_REDUCAO_S:
+            return
+        cls._ultima_reducao = agora
+        anterior = cls._limite
+        cls._limite = max(1.0, cls._limite * fator)
+        logger.info(f"Concorrência do Gemini {anterior:.1f} → {cls._limite:.1f} ({motivo})")
+
+    @classmethod
+    def _sucesso(cls, resp, tokens: int, latencia: float):
+        uso = getattr(resp, "usage_metadata", None)
+        reais = getattr(uso, "prompt_token_count", None) or tokens
+        with cls._vaga:
+            cls._em_andamento -= 1
+            cls._tokens.ajustar(reais - tokens)
+            c = cls._contadores
+            c["sucessos"] += 1
+            c["tokens_reais"] += reais
+            c["latencia_total_s"] += latencia
+            c["latencia_max_s"] = max(c["latencia_max_s"], latencia)
+            cls._registrar_recente(reais)
+            if latencia > cls.config()["latencia_alvo_s"]:
+                cls._reduzir_limite(0.9, f"latência {latencia:.1f} s")
+            else:
+                # Partida lenta (+1 por sucesso) até a primeira redução; depois, +1/limite
+                passo = 1 if not cls._ultima_reducao else 1 / cls._limite
+                cls._limite = min(cls.config()["concorrencia_max"], cls._limite + passo)
+            cls._avisar_vaga()
+
+    @classmethod
+    def _falha(cls, erro: Exception, tentativa: int) -> float | None:
+        """
+        Libera a vaga, contabiliza o erro e retorna a espera antes da
+        próxima tentativa, ou None se o erro não deve ser repetido.
+        """
+        classe = cls.classificar(erro)
+        cfg = cls.config()
+        sugerida = cls.espera_sugerida(erro)
+        with cls._vaga:
+            cls._em_andamento -= 1
+            cls._contadores["erros"][classe] += 1
+            cls._registrar_recente(0)
+            if classe == "limite":
+                cls._reduzir_limite(0.5, "429")
+                if sugerida:
+                    # A espera pedida pela API vale para todas as chamadas do processo
+                    cls._pausa_ate = max(cls._pausa_ate, time.monotonic() + sugerida)
+            cls._avisar_vaga()
+
+        if classe in ("grande", "permanente") or tentativa >= cfg["tentativas"]:
+            logger.warning(f"Chamada ao Gemini falhou ({classe}, tentativa {tentativa}): {erro}")
+            return None
+
+        # Backoff exponencial com jitter total; a sugestão da API é o piso
+        teto = min(cfg["espera_max_s"], cfg["espera_base_s"] * 2 ** (tentativa - 1))
+        espera = random.uniform(0, teto)
+        if sugerida:
+            espera = sugerida + random.uniform(0, cfg["espera_base_s"])
+        with cls._lock:
+            cls._contadores["repeticoes"] += 1
+            cls._contadores["espera_backoff_s"] += espera
+        logger.info(f"Gemini: erro {classe} na tentativa {tentativa}, repetindo em {espera:.1f} s")
+        return espera
+
+    @classmethod
+    def _registrar_recente(cls, tokens: int):
+        """Janela deslizante de 60 s para exibir o consumo por minuto (chamar com _lock)."""
+        agora = time.monotonic()
+        cls._recentes.append((agora, tokens))
+        while cls._recentes and agora - cls._recentes[0][0] > 60:
+            cls._recentes.popleft()
+
+    #----------------------------------------------------------
+    # Execução
+    #----------------------------------------------------------
+    @classmethod
+    def executar(cls, chamada: Callable[[], object], tokens: int = 0):
+        """
+        Executa chamada() respeitando cotas e concorrência, repetindo
+        erros de limite e transitórios. Erros que não serão repetidos
+        sobem como ErroGemini, com a classe e o erro original.
+        """
+        tentativa = 0
+        while True:
+            tentativa += 1
+            time.sleep(cls._reservar(tokens))
+            cls._ocupar()
+            inicio = time.monotonic()
+            try:
+                resp = chamada()
+            except Exception as erro:
+                espera = cls._falha(erro, tentativa)
+                if espera is None:
+                    raise ErroGemini(cls.classificar(erro), erro) from erro
+                time.sleep(espera)
+                continue
+            except BaseException:
+                cls._liberar()
+                raise
+            cls._sucesso(resp, tokens, time.monotonic() - inicio)
+            return resp
+
+    @classmethod
+    async def executar_async(cls, chamada: Callable[[], Awaitable], tokens: int = 0):
+        """Equivalente assíncrono de executar(), sem bloquear o loop."""
+        tentativa = 0
+        while True:
+            tentativa += 1
+            await asyncio.sleep(cls._reservar(tokens))
+            await cls._ocupar_async()
+            inicio = time.monotonic()
+            try:
+                resp = await chamada()
+            except Exception as erro:
+                espera = cls._falha(erro, tentativa)
+                if espera is None:
+                    raise ErroGemini(cls.classificar(erro), erro) from erro
+                await asyncio.sleep(espera)
+                continue
+            except BaseException:
+                # Cancelamento (CancelledError) ou encerramento do processo
+                cls._liberar()
+                raise
+            cls._sucesso(resp, tokens, time.monotonic() - inicio)
+            return resp
+
+    @classmethod
+    def estatisticas(cls) -> dict:
+        """Contadores para dimensionar as cotas (RPM/TPM) e a concorrência."""
+        with cls._lock:
+            cls._iniciar()
+            c = cls._contadores
+            cfg = cls.config()
+            return {
+                "rpm_configurado": cfg["rpm"],
+                "tpm_configurado": cfg["tpm"],
+                "requisicoes_ultimo_minuto": len(cls._recentes),
+                "tokens_ultimo_minuto": sum(t for _, t in cls._recentes),
+                "limite_concorrencia": round(cls._limite, 2),
+                "em_andamento": cls._em_andamento,
+                "chamadas": c["chamadas"],
+                "sucessos": c["sucessos"],
+                "repeticoes": c["repeticoes"],
+                "erros": dict(c["erros"]),
+                "espera_cota_s": round(c["espera_cota_s"], 3),
+                "espera_backoff_s": round(c["espera_backoff_s"], 3),
+                "tokens_estimados": c["tokens_estimados"],
+                "tokens_reais": c["tokens_reais"],
+                "latencia_media_s": round(c["latencia_total_s"] / c["sucessos"], 3) if c["sucessos"] else 0,
+                "latencia_max_s": round(c["latencia_max_s"], 3),
+            }
@@ -0,0 +1,202 @@
+import os
+import json
+import uuid
+import shutil
+import logging
+import threading
+from pathlib import Path
+from typing import Iterator
+from src.utils.constantes import Constantes
+
+logger = logging.getLogger(__name__)
+
+#==========================================================
+# Armazenamento dos resultados de uma tarefa
+#==========================================================
+class ResultadosTarefa:
+    """
+    Espaço de trabalho de uma tarefa, na pasta temp_data/<id>/:
+      - tarefa.json: prompt e opções escolhidas pelo usuário
+      - resultados.jsonl: um registro {"pagina", "texto", "uso"} por linha,
+        onde "uso" traz os tokens consumidos pela página (ver Consumo)
+      - resumo.md: resumo do documento inteiro (ResumoHierarquico)
+      - html/: trechos do resultado já renderizados (ver Resultado.bloco)
+      - uploads/: arquivos enviados
+      - imagens/: páginas renderizadas aguardando envio ao Gemini
+
+    Cada tarefa só escreve no próprio espaço, que é removido por inteiro
+    (limpeza da sessão ou ColetorEspacos) sem afetar as demais.
+
+    Cada página concluída é apenas acrescentada ao fim do JSONL (O(1)),
+    na ordem em que termina. A leitura devolve os textos na ordem das
+    páginas, posicionando o arquivo em cada registro sem carregá-lo
+    inteiro na memória.
+    """
+    ARQUIVO_METADADOS = "tarefa.json"
+    ARQUIVO_RESULTADOS = "resultados.jsonl"
+    ARQUIVO_RESUMO = "resumo.md"
+
+    # Índice página → posição de cada JSONL, com os bytes já lidos (ver _indice)
+    _indices: dict[str, tuple[int, dict[int, int]]] = {}
+    _lock_indices = threading.Lock()
+
+    def __init__(self, tarefa_id: str):
+        self.id = tarefa_id
+        self.pasta = os.path.join(Constantes.PASTA_DADOS_TEMP, tarefa_id)
+        self.caminho_metadados = os.path.join(self.pasta, self.ARQUIVO_METADADOS)
+        self.caminho_resultados = os.path.join(self.pasta, self.ARQUIVO_RESULTADOS)
+        self.caminho_resumo = os.path.join(self.pasta, self.ARQUIVO_RESUMO)
+        self.pasta_uploads = os.path.join(self.pasta, "uploads")
+        self.pasta_imagens = os.path.join(self.pasta, "imagens")
+        self.pasta_html = os.path.join(self.pasta, "html")
+        self._lock = threading.Lock()
+
+    @classmethod
+    def criar(cls, metadados: dict) -> "ResultadosTarefa":
+        """Cria a pasta da tarefa com um id curto e grava os metadados."""
+        armazenamento = cls(uuid.uuid4().hex[:12])
+        for pasta in (armazenamento.pasta_uploads, armazenamento.pasta_imagens):
+            Path(pasta).mkdir(parents=True, exist_ok=True)
+        armazenamento.salvar_metadados(metadados)
+        Path(armazenamento.caminho_resultados).touch()
+        logger.debug(f"Armazenamento da tarefa criado em {armazenamento.pasta!r}")
+        return armazenamento
+
+    @classmethod
+    def abrir(cls, tarefa_id: str | None) -> "ResultadosTarefa | None":
+        """Abre o armazenamento de uma tarefa existente (ou None)."""
+        if not tarefa_id or not tarefa_id.isalnum():
+            return None
+        armazenamento = cls(tarefa_id)
+        if not os.path.isfile(armazenamento.caminho_metadados):
+            return None
+        return armazenamento
+
+    @classmethod
+    def listar(cls) -> list[str]:
+        """Ids das tarefas com espaço em disco."""
+        try:
+            entradas = os.listdir(Constantes.PASTA_DADOS_TEMP)
+        except FileNotFoundError:
+            return []
+        return [
+            e for e in entradas
+            if e.isalnum() and os.path.isfile(os.path.join(Constantes.PASTA_DADOS_TEMP, e, cls.ARQUIVO_METADADOS))
+        ]
+
+    def uso_disco(self) -> tuple[float, int]:
+        """Retorna (última modificação, bytes ocupados) do espaço da tarefa."""
+        ultima, total = 0.0, 0
+        for raiz, _, arquivos in os.walk(self.pasta):
+            for nome in arquivos:
+                try:
+                    info = os.stat(os.path.join(raiz, nome))
+                except FileNotFoundError:
+                    continue
+                ultima = max(ultima, info.st_mtime)
+                total += info.st_size
+        return ultima, total
+
+    def remover(self):
+        """Apaga o espaço da tarefa (uploads, imagens e resultados)."""
+        shutil.rmtree(self.pasta, ignore_errors=True)
+        with self._lock_indices:
+            self._indices.pop(self.caminho_resultados, None)
+        logger.debug(f"Espaço da tarefa removido: {self.pasta!r}")
+
+    def salvar_metadados(self, metadados: dict):
+        temporario = self.caminho_metadados + ".tmp"
+        with open(temporario, "w", encoding="utf-8") as f:
+            json.dump(metadados, f, ensure_ascii=False)
+        os.replace(temporario, self.caminho_metadados)
+
+    def metadados(self) -> dict:
+        with open(self.caminho_metadados, encoding="utf-8") as f:
+            return json.load(f)
+
+    def salvar_resumo(self, texto: str):
+        temporario = self.caminho_resumo + ".tmp"
+        with open(temporario, "w", encoding="utf-8") as f:
+            f.write(texto)
+        os.replace(temporario, self.caminho_resumo)
+
+    def resumo(self) -> str | None:
+        """Resumo do documento inteiro, se a tarefa gerou um."""
+        try:
+            with open(self.caminho_resumo, encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def acrescentar(self, pagina: int, texto: str, uso: dict | None = None):
+        """Acrescenta o resultado de uma página (e seu consumo) ao fim do JSONL."""
+        registro = {"pagina": pagina, "texto": texto}
+        if uso is not None:
+            registro["uso"] = uso
+        linha = json.dumps(registro, ensure_ascii=False)
+        with self._lock, open(self.caminho_resultados, "a", encoding="utf-8") as f:
+            f.write(linha + "\n")
+
+    def _indice(self) -> dict[int, int]:
+        """
+        Mapeia página → posição (bytes) do registro no JSONL. O índice
+        fica em memória e cada consulta lê só as linhas acrescentadas
+        desde a anterior; quem já o recebeu não vê a atualização.
+        """
+        with self._lock_indices:
+            lido, indice = self._indices.get(self.caminho_resultados, (0, {}))
+            with open(self.caminho_resultados, "rb") as f:
+                if lido > os.fstat(f.fileno()).st_size:
+                    lido, indice = 0, {}
+                f.seek(lido)
+                novos = {}
+                for linha in iter(f.readline, b""):
+                    if not linha.endswith(b"\n"):
+                        break
+                    try:
+                        novos[json.loads(linha)["pagina"]] = lido
+                    except (ValueError, KeyError):
+                        logger.warning(f"Registro inválido em {self.caminho_resultados!r}")
+                    lido += len(linha)
+            if novos:
+                indice = {**indice, **novos}
+            self._indices[self.caminho_resultados] = (lido, indice)
+            return indice
+
+    def novos(self, posicao: int = 0) -> tuple[list[dict], int]:
+        """
+        Registros acrescentados a partir de posicao (bytes), na ordem em que
+        foram gravados, e a posição seguinte. Linhas ainda incompletas ficam
+        para a próxima leitura.
+        """
+        registros = []
+        with open(self.caminho_resultados, "rb") as f:
+            f.seek(posicao)
+            for linha in iter(f.readline, b""):
+                if not linha.endswith(b"\n"):
+                    break
+                posicao += len(linha)
+                try:
+                    registros.append(json.loads(linha))
+                except ValueError:
+                    logger.warning(f"Registro inválido em {self.caminho_resultados!r}")
+        return registros, posicao
+
+    def versao(self) -> int:
+        """Muda sempre que uma página é acrescentada (tamanho do JSONL)."""
+        return os.path.getsize(self.caminho_resultados)
+
+    def registros(self, inicio: int = 0, fim: int | None = None) -> Iterator[dict]:
+        """Gera os registros {"pagina", "texto"} em ordem de página, de inicio até fim (exclusivo)."""
+        indice = self._indice()
+        with open(self.caminho_resultados, "rb") as f:
+            for pagina in sorted(indice):
+                if pagina < inicio or (fim is not None and pagina >= fim):
+                    continue
+                f.seek(indice[pagina])
+                yield json.loads(f.readline())
+
+    def textos(self, inicio: int = 0, fim: int | None = None) -> Iterator[str]:
+        """Gera apenas os textos, em ordem de página."""
+        for registro in self.registros(inicio, fim):
+            yield registro["texto"]
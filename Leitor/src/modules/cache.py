@@ -0,0 +1,130 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from src.utils.constantes import Constantes
+
+logger = logging.getLogger(__name__)
+
+#==========================================================
+# Cache de respostas do Gemini (endereçado por conteúdo)
+#==========================================================
+class CacheRespostas:
+    """
+    Guarda em SQLite o texto gerado pelo Gemini, indexado pelo hash da
+    imagem, do prompt final, do modelo e da configuração de geração.
+    Entradas vencidas (TTL) e as menos usadas (limite de tamanho) são
+    descartadas automaticamente.
+    """
+    ARQUIVO = os.path.join(Constantes.PASTA_CACHE, "respostas.db")
+
+    _lock = threading.Lock()
+    _iniciado = False
+    _acertos = 0
+    _falhas = 0
+
+    @classmethod
+    def _conectar(cls) -> sqlite3.Connection:
+        if not cls._iniciado:
+            with cls._lock:
+                if not cls._iniciado:
+                    Path(Constantes.PASTA_CACHE).mkdir(parents=True, exist_ok=True)
+                    with sqlite3.connect(cls.ARQUIVO) as con:
+                        con.execute(
+                            "CREATE TABLE IF NOT EXISTS respostas ("
+                            " chave TEXT PRIMARY KEY,"
+                            " texto TEXT NOT NULL,"
+                            " tamanho INTEGER NOT NULL,"
+                            " criado_em REAL NOT NULL,"
+                            " acessado_em REAL NOT NULL)"
+                        )
+                    cls._iniciado = True
+        return sqlite3.connect(cls.ARQUIVO, timeout=10)
+
+    @staticmethod
+    def gerar_chave(hash_conteudo: str, prompt: str) -> str:
+        """Hash SHA-256 do conteúdo (já em hash) + prompt + modelo + configuração."""
+        h = hashlib.sha256(hash_conteudo.encode("utf-8"))
+        h.update(b"\0" + prompt.encode("utf-8"))
+        h.update(b"\0" + Constantes.MODELO_GEMINI.encode("utf-8"))
+        h.update(b"\0" + json.dumps(Constantes.CONFIG_GEMINI, sort_keys=True).encode("utf-8"))
+        return h.hexdigest()
+
+    @classmethod
+    def obter(cls, chave: str) -> str | None:
+        """Retorna o texto em cache ou None (ausente ou vencido)."""
+        agora = time.time()
+        with cls._conectar() as con:
+            linha = con.execute(
+                "SELECT texto, criado_em FROM respostas WHERE chave = ?", (chave,)
+            ).fetchone()
+            if linha and agora - linha[1] <= Constantes.CACHE_TTL_SEGUNDOS:
+                con.execute("UPDATE respostas SET acessado_em = ? WHERE chave = ?", (agora, chave))
+            else:
+                if linha:
+                    con.execute("DELETE FROM respostas WHERE chave = ?", (chave,))
+                linha = None
+
+        with cls._lock:
+            if linha:
+                cls._acertos += 1
+            else:
+                cls._falhas += 1
+        logger.debug(f"Cache {'HIT' if linha else 'MISS'}: {chave[:12]}")
+        return linha[0] if linha else None
+
+    @classmethod
+    def salvar(cls, chave: str, texto: str):
+        """Grava a resposta e aplica as regras de expiração e tamanho."""
+        agora = time.time()
+        tamanho = len(texto.encode("utf-8"))
+        with cls._conectar() as con:
+            con.execute(
+                "INSERT OR REPLACE INTO respostas (chave, texto, tamanho, criado_em, acessado_em)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (chave, texto, tamanho, agora, agora),
+            )
+            cls._despejar(con, agora)
+
+    @staticmethod
+    def _despejar(con: sqlite3.Connection, agora: float):
+        """Remove entradas vencidas e, se preciso, as menos acessadas."""
+        con.execute(
+            "DELETE FROM respostas WHERE criado_em < ?",
+            (agora - Constantes.CACHE_TTL_SEGUNDOS,),
+        )
+        limite = Constantes.CACHE_MAX_MB * 1024 * 1024
+        total = con.execute("SELECT COALESCE(SUM(tamanho), 0) FROM respostas").fetchone()[0]
+        if total <= limite:
+            return
+        removidas = 0
+        for chave, tamanho in con.execute(
+            "SELECT chave, tamanho FROM respostas ORDER BY acessado_em ASC"
+        ).fetchall():
+            if total <= limite:
+                break
+            con.execute("DELETE FROM respostas WHERE chave = ?", (chave,))
+            total -= tamanho
+            removidas += 1
+        logger.info(f"Cache: {removidas} resposta(s) removida(s) por limite de tamanho")
+
+    @classmethod
+    def estatisticas(cls) -> dict:
+        """Contadores de acertos/falhas do processo e ocupação do cache."""
+        with cls._conectar() as con:
+            itens, total = con.execute(
+                "SELECT COUNT(*), COALESCE(SUM(tamanho), 0) FROM respostas"
+            ).fetchone()
+        with cls._lock:
+            consultas = cls._acertos + cls._falhas
+            return {
+                "acertos": cls._acertos,
+                "falhas": cls._falhas,
+                "taxa_acerto": round(cls._acertos / consultas, 3) if consultas else 0.0,
+                "itens": itens,
+                "bytes": total,
+            }
@@ -0,0 +1,129 @@
+import math
+import logging
+import contextvars
+from contextlib import contextmanager
+from src.utils.constantes import Constantes
+
+logger = logging.getLogger(__name__)
+
+#==========================================================
+# Contabilidade de tokens das chamadas ao Gemini
+#==========================================================
+class Consumo:
+    """
+    Tokens gastos nas chamadas ao Gemini. Gemini.gerar registra o
+    usage_metadata de cada resposta no medidor ativo (ContextVar), e a
+    tarefa abre um medidor por página (ou lote) para gravar o consumo
+    junto do resultado e somá-lo ao total da tarefa.
+
+    Cada registro tem tokens de prompt (entrada, incluindo imagens), a
+    parte da entrada correspondente às imagens, tokens de saída, total,
+    número de chamadas e o motivo de término (finish_reason) da última.
+    """
+    CAMPOS = ("tokens_prompt", "tokens_imagem", "tokens_saida", "tokens_total", "chamadas")
+
+    _atual: contextvars.ContextVar[dict | None] = contextvars.ContextVar("consumo_atual", default=None)
+
+    @classmethod
+    def vazio(cls) -> dict:
+        registro = dict.fromkeys(cls.CAMPOS, 0)
+        registro["finalizacao"] = None
+        return registro
+
+    @classmethod
+    @contextmanager
+    def medir(cls):
+        """Acumula no dicionário devolvido o consumo das chamadas feitas no bloco."""
+        registro = cls.vazio()
+        token = cls._atual.set(registro)
+        try:
+            yield registro
+        finally:
+            cls._atual.reset(token)
+
+    @classmethod
+    def registrar(cls, resp, partes: list):
+        """Soma o consumo de uma resposta ao medidor ativo (se houver)."""
+        registro = cls._atual.get()
+        if registro is not None:
+            cls.somar(registro, cls.extrair(resp, partes))
+
+    @classmethod
+    def acrescentar(cls, uso: dict):
+        """Soma ao medidor ativo um consumo medido em outra thread."""
+        registro = cls._atual.get()
+        if registro is not None:
+            cls.somar(registro, uso)
+
+    @staticmethod
+    def extrair(resp, partes: list) -> dict:
+        """
+        Lê o usage_metadata da resposta. Quando a API não detalha os
+        tokens por modalidade, os de imagem são estimados pelo número de
+        imagens enviadas (Constantes.COTA_GEMINI["tokens_por_imagem"]).
+        """
+        uso = getattr(resp, "usage_metadata", None)
+        prompt = getattr(uso, "prompt_token_count", 0) or 0
+        saida = getattr(uso, "candidates_token_count", 0) or 0
+        total = getattr(uso, "total_token_count", 0) or prompt + saida
+
+        detalhes = getattr(uso, "prompt_tokens_details", None) or []
+        imagem = sum(
+            getattr(d, "token_count", 0) or 0 for d in detalhes
+            if "IMAGE" in str(getattr(getattr(d, "modality", None), "name", getattr(d, "modality", "")))
+        )
+        if not detalhes:
+            n_imagens = sum(1 for p in partes if not isinstance(p, str))
+            imagem = min(prompt, n_imagens * Constantes.COTA_GEMINI["tokens_por_imagem"])
+
+        candidatos = getattr(resp, "candidates", None) or []
+        motivo = getattr(candidatos[0], "finish_reason", None) if candidatos else None
+        return {
+            "tokens_prompt": prompt,
+            "tokens_imagem": imagem,
+            "tokens_saida": saida,
+            "tokens_total": total,
+            "chamadas": 1,
+            "finalizacao": getattr(motivo, "name", None) or (str(motivo) if motivo else None),
+        }
+
+    @classmethod
+    def somar(cls, total: dict, parcial: dict):
+        """Acrescenta parcial a total (in-place); o motivo de término é o mais recente."""
+        for campo in cls.CAMPOS:
+            total[campo] += parcial.get(campo, 0)
+        if parcial.get("finalizacao"):
+            total["finalizacao"] = parcial["finalizacao"]
+
+    @classmethod
+    def dividir(cls, registro: dict, partes: int) -> list[dict]:
+        """Reparte o consumo de uma chamada em lote igualmente entre as páginas."""
+        divididos = [cls.vazio() for _ in range(partes)]
+        for campo in cls.CAMPOS:
+            base, resto = divmod(registro[campo], partes)
+            for i, dividido in enumerate(divididos):
+                dividido[campo] = base + (1 if i < resto else 0)
+        for dividido in divididos:
+            dividido["finalizacao"] = registro["finalizacao"]
+        return divididos
+
+    @staticmethod
+    def estimar(paginas: int, prompt: str, tamanho_lote: int = 1) -> dict:
+        """
+        Estimativa prévia do consumo de uma tarefa, antes de renderizar as
+        páginas: todas são tratadas como imagem (limite superior para PDFs
+        digitais, cujas páginas de texto costumam custar menos) e o prompt
+        é enviado uma vez por chamada.
+        """
+        chamadas = math.ceil(paginas / max(1, tamanho_lote))
+        entrada = (
+            paginas * Constantes.COTA_GEMINI["tokens_por_imagem"]
+            + chamadas * (len(prompt) // 4)
+        )
+        saida = paginas * Constantes.TOKENS_SAIDA_POR_PAGINA
+        return {
+            "chamadas": chamadas,
+            "tokens_entrada": entrada,
+            "tokens_saida": saida,
+            "tokens_total": entrada + saida,
+        }
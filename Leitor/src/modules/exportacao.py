@@ -0,0 +1,450 @@
+from __future__ import annotations
+
+import io
+import re
+import csv
+import json
+import time
+import zlib
+import logging
+import zipfile
+from typing import Iterator
+from xml.sax.saxutils import escape
+from src.modules.armazenamento import ResultadosTarefa
+from src.modules.metricas import Metricas
+from src.utils.importacao import ModuloAdiado
+
+fitz = ModuloAdiado("fitz")  # PyMuPDF (métricas das fontes do PDF), importado no uso
+
+logger = logging.getLogger(__name__)
+
+#==========================================================
+# Exportação dos resultados em fluxo (CSV, JSONL, DOCX e PDF)
+#==========================================================
+class Exportacao:
+    """
+    Gera o arquivo exportado em blocos de bytes, lendo os resultados
+    página a página do espaço da tarefa (ResultadosTarefa.registros):
+    o documento nunca é montado inteiro na memória.
+
+    CSV e JSONL saem linha a linha da tabela da tarefa: as linhas das
+    tabelas no extract, os erros no validate e, nas demais opções, um
+    registro por página. DOCX e PDF trazem o texto do resultado (ou a
+    tabela, no extract).
+    """
+    FORMATOS = {
+        "csv": "text/csv; charset=utf-8",
+        "jsonl": "application/x-ndjson; charset=utf-8",
+        "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+        "pdf": "application/pdf",
+    }
+    TAMANHO_BLOCO = 64 * 1024       # Bytes acumulados antes de cada envio
+
+    @staticmethod
+    def _json(texto: str):
+        try:
+            return json.loads(texto)
+        except (json.JSONDecodeError, TypeError):
+            return None
+
+    #------------------------------------------------------
+    # Fontes: tabela (linhas) e texto (parágrafos)
+    #------------------------------------------------------
+    @staticmethod
+    def _tabela(armazenamento: ResultadosTarefa, opcoes: dict) -> tuple[list[str], Iterator[list]]:
+        """Colunas e gerador de linhas, no mesmo recorte mostrado na página de resultado."""
+        opcao = opcoes["prompt_option"]
+
+        if opcao == "extract":
+            # As colunas vêm da primeira página com tabela (como em Resultado._montar)
+            colunas = []
+            for texto in armazenamento.textos():
+                colunas = ((Exportacao._json(texto) or {}).get("table") or {}).get("columns") or []
+                if colunas:
+                    break
+
+            def linhas():
+                for texto in armazenamento.textos():
+                    obj = Exportacao._json(texto)
+                    if isinstance(obj, dict):
+                        yield from (obj.get("table") or {}).get("rows", [])
+            return colunas, linhas()
+
+        if opcao == "validate":
+            colunas = ["field", "value", "message"]
+
+            def linhas():
+                for texto in armazenamento.textos():
+                    obj = Exportacao._json(texto)
+                    erros = obj.get("errors", []) if isinstance(obj, dict) else obj if isinstance(obj, list) else []
+                    for erro in erros:
+                        if isinstance(erro, dict):
+                            yield [erro.get(c) for c in colunas]
+            return colunas, linhas()
+
+        return ["pagina", "texto"], ([r["pagina"] + 1, r["texto"]] for r in armazenamento.registros())
+
+    @staticmethod
+    def _paragrafos(armazenamento: ResultadosTarefa, opcoes: dict) -> Iterator[tuple[str, str]]:
+        """
+        Gera (estilo, texto) com estilo "titulo" ou "paragrafo", convertendo
+        o Markdown do Gemini de forma simples (títulos, listas e ênfases).
+        O resumo do documento, quando existe, substitui os resumos das páginas.
+        """
+        resumo = armazenamento.resumo()
+        textos = [resumo] if resumo is not None else armazenamento.textos()
+        for texto in textos:
+            for linha in str(texto).splitlines():
+                linha = linha.rstrip()
+                if not linha.strip() or linha.strip().startswith("```"):
+                    continue
+                titulo = re.match(r"^\s*#{1,6}\s+(.*)$", linha)
+                linha = titulo.group(1) if titulo else re.sub(r"^(\s*)[-*+]\s+", r"\1• ", linha)
+                linha = re.sub(r"(\*\*|__|`)", "", linha)
+                yield ("titulo" if titulo else "paragrafo"), linha
+
+    #------------------------------------------------------
+    # Formatos
+    #------------------------------------------------------
+    @staticmethod
+    def _csv(colunas: list[str], linhas: Iterator[list]) -> Iterator[bytes]:
+        buffer = io.StringIO()
+        escritor = csv.writer(buffer)
+        # BOM: o Excel reconhece o UTF-8 e os acentos
+        buffer.write("\ufeff")
+        if colunas:
+            escritor.writerow(colunas)
+        for linha in linhas:
+            escritor.writerow(linha if isinstance(linha, (list, tuple)) else [linha])
+            if buffer.tell() >= Exportacao.TAMANHO_BLOCO:
+                yield buffer.getvalue().encode("utf-8")
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue().encode("utf-8")
+
+    @staticmethod
+    def _jsonl(colunas: list[str], linhas: Iterator[list]) -> Iterator[bytes]:
+        partes, tamanho = [], 0
+        for linha in linhas:
+            if isinstance(linha, (list, tuple)) and colunas:
+                linha = dict(zip(colunas, linha))
+            dados = json.dumps(linha, ensure_ascii=False) + "\n"
+            partes.append(dados)
+            tamanho += len(dados)
+            if tamanho >= Exportacao.TAMANHO_BLOCO:
+                yield "".join(partes).encode("utf-8")
+                partes, tamanho = [], 0
+        yield "".join(partes).encode("utf-8")
+
+    @staticmethod
+    def _docx(armazenamento: ResultadosTarefa, opcoes: dict) -> Iterator[bytes]:
+        saida = _SaidaFluxo()
+        with zipfile.ZipFile(saida, "w", zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr("[Content_Types].xml", _Docx.TIPOS)
+            zf.writestr("_rels/.rels", _Docx.RELACOES)
+            with zf.open("word/document.xml", "w") as documento:
+                documento.write(_Docx.INICIO)
+                if opcoes["prompt_option"] in ("extract", "validate"):
+                    colunas, linhas = Exportacao._tabela(armazenamento, opcoes)
+                    documento.write(_Docx.inicio_tabela(colunas))
+                    for linha in linhas:
+                        documento.write(_Docx.linha_tabela(linha))
+                        if saida.tamanho >= Exportacao.TAMANHO_BLOCO:
+                            yield saida.drenar()
+                    documento.write(b"</w:tbl><w:p/>")
+                else:
+                    for estilo, texto in Exportacao._paragrafos(armazenamento, opcoes):
+                        documento.write(_Docx.paragrafo(texto, estilo == "titulo"))
+                        if saida.tamanho >= Exportacao.TAMANHO_BLOCO:
+                            yield saida.drenar()
+                documento.write(_Docx.FIM)
+        yield saida.drenar()
+
+    @staticmethod
+    def _pdf(armazenamento: ResultadosTarefa, opcoes: dict) -> Iterator[bytes]:
+        pdf = _EscritorPdf()
+        yield pdf.inicio()
+        if opcoes["prompt_option"] in ("extract", "validate"):
+            colunas, linhas = Exportacao._tabela(armazenamento, opcoes)
+            yield pdf.escrever(" | ".join(map(str, colunas)), negrito=True)
+            for linha in linhas:
+                celulas = linha if isinstance(linha, (list, tuple)) else [linha]
+                yield pdf.escrever(" | ".join("" if c is None else str(c) for c in celulas))
+        else:
+            for estilo, texto in Exportacao._paragrafos(armazenamento, opcoes):
+                yield pdf.escrever(texto, negrito=estilo == "titulo")
+        yield pdf.fim()
+
+    @staticmethod
+    def gerar(armazenamento: ResultadosTarefa, formato: str) -> Iterator[bytes]:
+        """Blocos de bytes do arquivo exportado no formato pedido (ver FORMATOS)."""
+        opcoes = armazenamento.metadados()
+        if formato in ("csv", "jsonl"):
+            colunas, linhas = Exportacao._tabela(armazenamento, opcoes)
+            exportar = Exportacao._csv if formato == "csv" else Exportacao._jsonl
+            blocos = exportar(colunas, linhas)
+        elif formato == "docx":
+            blocos = Exportacao._docx(armazenamento, opcoes)
+        else:
+            blocos = Exportacao._pdf(armazenamento, opcoes)
+
+        # Sem Metricas.contexto/etapa: o servidor ASGI avança o gerador em
+        # threads (e contextos) diferentes a cada bloco
+        inicio, total = time.perf_counter(), 0
+        for bloco in blocos:
+            if bloco:
+                total += len(bloco)
+                yield bloco
+        Metricas.observar("exportar", time.perf_counter() - inicio, opcoes["prompt_option"])
+        Metricas.contar("exportacoes", formato=formato)
+        logger.info(f"Tarefa {armazenamento.id} exportada em {formato} ({total} bytes)")
+
+    @staticmethod
+    def abrir(tarefa_id: str, formato: str) -> tuple[Iterator[bytes], str, str] | None:
+        """(blocos, tipo MIME, nome do arquivo), ou None se a tarefa ou o formato não existem."""
+        if formato not in Exportacao.FORMATOS:
+            return None
+        armazenamento = ResultadosTarefa.abrir(tarefa_id)
+        if armazenamento is None:
+            return None
+        return (
+            Exportacao.gerar(armazenamento, formato),
+            Exportacao.FORMATOS[formato],
+            f"resultado_{armazenamento.id}.{formato}",
+        )
+
+
+#==========================================================
+# Apoio: saída em fluxo para o zipfile
+#==========================================================
+class _SaidaFluxo:
+    """
+    Arquivo só de escrita e sem seek: o zipfile grava cada entrada com
+    descritor de dados ao final, e os bytes são retirados com drenar().
+    """
+
+    def __init__(self):
+        self._dados = bytearray()
+
+    @property
+    def tamanho(self) -> int:
+        return len(self._dados)
+
+    def write(self, dados) -> int:
+        self._dados += dados
+        return len(dados)
+
+    def flush(self):
+        pass
+
+    def drenar(self) -> bytes:
+        dados = bytes(self._dados)
+        self._dados.clear()
+        return dados
+
+
+#==========================================================
+# Apoio: partes mínimas de um DOCX (WordprocessingML)
+#==========================================================
+class _Docx:
+    TIPOS = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/word/document.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+        '</Types>'
+    )
+    RELACOES = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="word/document.xml"/>'
+        '</Relationships>'
+    )
+    INICIO = (
+        b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        b'<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"><w:body>'
+    )
+    FIM = b'<w:sectPr><w:pgSz w:w="11906" w:h="16838"/></w:sectPr></w:body></w:document>'
+
+    # Caracteres de controle não são aceitos em XML
+    _INVALIDOS = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+    @classmethod
+    def _texto(cls, valor) -> str:
+        return escape(cls._INVALIDOS.sub("", "" if valor is None else str(valor)))
+
+    @classmethod
+    def paragrafo(cls, texto: str, titulo: bool = False) -> bytes:
+        estilo = '<w:rPr><w:b/><w:sz w:val="28"/></w:rPr>' if titulo else ""
+        return (
+            f'<w:p><w:r>{estilo}<w:t xml:space="preserve">{cls._texto(texto)}</w:t></w:r></w:p>'
+        ).encode("utf-8")
+
+    @classmethod
+    def _linha(cls, celulas, negrito: bool = False) -> bytes:
+        estilo = "<w:rPr><w:b/></w:rPr>" if negrito else ""
+        celulas = celulas if isinstance(celulas, (list, tuple)) else [celulas]
+        return ("<w:tr>" + "".join(
+            f'<w:tc><w:p><w:r>{estilo}<w:t xml:space="preserve">{cls._texto(c)}</w:t></w:r></w:p></w:tc>'
+            for c in celulas
+        ) + "</w:tr>").encode("utf-8")
+
+    @classmethod
+    def inicio_tabela(cls, colunas: list[str]) -> bytes:
+        bordas = "".join(
+            f'<w:{lado} w:val="single" w:sz="4" w:space="0" w:color="999999"/>'
+            for lado in ("top", "left", "bottom", "right", "insideH", "insideV")
+        )
+        inicio = f'<w:tbl><w:tblPr><w:tblW w:w="0" w:type="auto"/><w:tblBorders>{bordas}</w:tblBorders></w:tblPr>'
+        return inicio.encode("utf-8") + (cls._linha(colunas, negrito=True) if colunas else b"")
+
+    @classmethod
+    def linha_tabela(cls, celulas) -> bytes:
+        return cls._linha(celulas)
+
+
+#==========================================================
+# Apoio: PDF gravado em sequência
+#==========================================================
+class _EscritorPdf:
+    """
+    PDF mínimo (fontes Helvetica padrão, codificação WinAnsi) escrito à
+    medida que as páginas ficam prontas: cada página vai para a saída ao
+    ser fechada e só as posições dos objetos ficam na memória para a
+    tabela xref final. As larguras dos caracteres vêm do PyMuPDF.
+    """
+    LARGURA, ALTURA = 595, 842      # A4 em pontos
+    MARGEM = 56
+    TAMANHO_FONTE = {False: 10, True: 13}
+    # Objetos fixos: 1 catálogo, 2 árvore de páginas, 3 e 4 fontes
+    _CATALOGO, _PAGINAS, _FONTE, _FONTE_NEGRITO = 1, 2, 3, 4
+
+    _fontes: dict[str, fitz.Font] = {}
+    _larguras: dict[tuple[str, str], float] = {}
+
+    def __init__(self):
+        self._posicao = 0
+        self._posicoes: dict[int, int] = {}
+        self._proximo = 5
+        self._paginas: list[int] = []
+        self._comandos: list[str] = []
+        self._y = self.ALTURA - self.MARGEM
+
+    def _objeto(self, numero: int, corpo: bytes) -> bytes:
+        dados = f"{numero} 0 obj\n".encode() + corpo + b"\nendobj\n"
+        self._posicoes[numero] = self._posicao
+        self._posicao += len(dados)
+        return dados
+
+    def _novo_numero(self) -> int:
+        numero = self._proximo
+        self._proximo += 1
+        return numero
+
+    def inicio(self) -> bytes:
+        cabecalho = b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n"
+        self._posicao = len(cabecalho)
+        fonte = "<< /Type /Font /Subtype /Type1 /BaseFont /{} /Encoding /WinAnsiEncoding >>"
+        return (
+            cabecalho
+            + self._objeto(self._FONTE, fonte.format("Helvetica").encode())
+            + self._objeto(self._FONTE_NEGRITO, fonte.format("Helvetica-Bold").encode())
+        )
+
+    def _fechar_pagina(self) -> bytes:
+        conteudo = zlib.compress("\n".join(self._comandos).encode("latin-1"))
+        n_conteudo, n_pagina = self._novo_numero(), self._novo_numero()
+        dados = self._objeto(
+            n_conteudo,
+            f"<< /Length {len(conteudo)} /Filter /FlateDecode >>\nstream\n".encode() + conteudo + b"\nendstream",
+        )
+        dados += self._objeto(n_pagina, (
+            f"<< /Type /Page /Parent {self._PAGINAS} 0 R /MediaBox [0 0 {self.LARGURA} {self.ALTURA}] "
+            f"/Resources << /Font << /F1 {self._FONTE} 0 R /F2 {self._FONTE_NEGRITO} 0 R >> >> "
+            f"/Contents {n_conteudo} 0 R >>"
+        ).encode())
+        self._paginas.append(n_pagina)
+        self._comandos = []
+        self._y = self.ALTURA - self.MARGEM
+        return dados
+
+    @staticmethod
+    def _codificar(texto: str) -> str:
+        # WinAnsi (cp1252) cobre o português; o resto vira "?"
+        bruto = texto.encode("cp1252", "replace").decode("latin-1")
+        return bruto.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+    @classmethod
+    def _largura(cls, texto: str, fonte: str) -> float:
+        """Largura do texto com fonte de 1 pt (larguras por caractere em cache)."""
+        total = 0.0
+        for caractere in texto:
+            largura = cls._larguras.get((fonte, caractere))
+            if largura is None:
+                if fonte not in cls._fontes:
+                    cls._fontes[fonte] = fitz.Font(fonte)
+                largura = cls._larguras[(fonte, caractere)] = cls._fontes[fonte].text_length(caractere, fontsize=1)
+            total += largura
+        return total
+
+    def _quebrar(self, texto: str, fonte: str, tamanho: int) -> Iterator[str]:
+        limite = (self.LARGURA - 2 * self.MARGEM) / tamanho
+        espaco = self._largura(" ", fonte)
+        atual, largura_atual = "", 0.0
+        for palavra in texto.split(" "):
+            largura = self._largura(palavra, fonte)
+            if atual and largura_atual + espaco + largura <= limite:
+                atual, largura_atual = f"{atual} {palavra}", largura_atual + espaco + largura
+                continue
+            if atual:
+                yield atual
+            # Palavras mais largas que a linha são cortadas por caractere
+            while largura > limite:
+                corte, acumulado = 0, 0.0
+                for caractere in palavra:
+                    acumulado += self._largura(caractere, fonte)
+                    if acumulado > limite and corte:
+                        break
+                    corte += 1
+                yield palavra[:corte]
+                palavra = palavra[corte:]
+                largura = self._largura(palavra, fonte)
+            atual, largura_atual = palavra, largura
+        yield atual
+
+    def escrever(self, texto: str, negrito: bool = False) -> bytes:
+        """Acrescenta um parágrafo; devolve as páginas que ficaram completas."""
+        tamanho = self.TAMANHO_FONTE[negrito]
+        entrelinha = tamanho * 1.4
+        dados = b""
+        for linha in self._quebrar(texto, "hebo" if negrito else "helv", tamanho):
+            if self._y - entrelinha < self.MARGEM:
+                dados += self._fechar_pagina()
+            self._y -= entrelinha
+            self._comandos.append(
+                f"BT /{'F2' if negrito else 'F1'} {tamanho} Tf {self.MARGEM} {self._y:.1f} Td "
+                f"({self._codificar(linha)}) Tj ET"
+            )
+        self._y -= tamanho * 0.4
+        return dados
+
+    def fim(self) -> bytes:
+        dados = b""
+        if self._comandos or not self._paginas:
+            dados += self._fechar_pagina()
+        filhos = " ".join(f"{n} 0 R" for n in self._paginas)
+        dados += self._objeto(
+            self._PAGINAS, f"<< /Type /Pages /Kids [{filhos}] /Count {len(self._paginas)} >>".encode()
+        )
+        dados += self._objeto(self._CATALOGO, f"<< /Type /Catalog /Pages {self._PAGINAS} 0 R >>".encode())
+
+        inicio_xref = self._posicao
+        total = self._proximo
+        xref = [f"xref\n0 {total}\n", "0000000000 65535 f \n"]
+        xref += [f"{self._posicoes[n]:010d} 00000 n \n" for n in range(1, total)]
+        xref.append(f"trailer\n<< /Size {total} /Root {self._CATALOGO} 0 R >>\nstartxref\n{inicio_xref}\n%%EOF\n")
+        return dados + "".join(xref).encode()
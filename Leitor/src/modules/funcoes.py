@@ -1,37 +1,50 @@
+from __future__ import annotations
+
 import os
 import time
-import pickle
 import shutil
+import hashlib
 import logging
-import fitz  # PyMuPDF
-import google.generativeai as genai
+import threading
+import contextvars
+import uuid
 from pathlib import Path
-from PIL import Image
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from src.utils.constantes import Constantes
-from werkzeug.utils import secure_filename
+from src.utils.importacao import ModuloAdiado
+from src.utils.prompts import Prompts
+from src.modules.cache import CacheRespostas
+from src.modules.uploads import RegistroUploads
+from src.modules.imagem import PoliticaImagem
+from src.modules.preprocessamento import Preprocessamento
+from src.modules.renderizacao import PoolRenderizacao
+from src.modules.metricas import Metricas, Log
+from src.modules.agendador import AgendadorGemini
+from src.modules.consumo import Consumo
+import re
 import json
-from typing import Any, Dict, List
+from typing import Any, Callable, Dict, Iterable, Iterator
 
-# Fallback para versões antigas do Pillow
-try:
-    from PIL import Resampling
-    LANCZOS_FILTER = Resampling.LANCZOS
-except ImportError:
-    LANCZOS_FILTER = Image.LANCZOS
+# Bibliotecas pesadas, importadas no primeiro uso (ou no aquecimento)
+fitz = ModuloAdiado("fitz")  # PyMuPDF
+genai = ModuloAdiado("google.generativeai")
+Image = ModuloAdiado("PIL.Image")
 
 #==========================================================
 # Configurações de log
 #==========================================================
 logger = logging.getLogger(__name__)
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
-    datefmt="%Y-%m-%d %H:%M:%S"
-)
+# Registros enfileirados e escritos por uma thread própria (QueueHandler)
+Log.configurar(logging.INFO)
 
 #==========================================================
 # Classe de manipulação de arquivos
 #==========================================================
+class UploadRejeitado(ValueError):
+    """Arquivo recusado na recepção (formato, tamanho ou número de páginas)."""
+
+
 class Arquivo:
 
     @staticmethod
@@ -71,75 +84,201 @@ class Arquivo:
         return permitido
 
     @staticmethod
-    def salvar_arquivo(arquivo) -> str:
+    def salvar_arquivo(arquivo, pasta: str = Constantes.PASTA_UPLOAD) -> tuple[str, str]:
         """
-        Salva o arquivo na pasta de upload usando nome seguro
-        e retorna o caminho completo.
+        Grava o upload em blocos, calculando o SHA-256 durante a escrita,
+        e o guarda em pasta como <hash>.<ext>: envios com o mesmo nome não se
+        sobrescrevem e conteúdos repetidos ocupam um único arquivo.
+        Acima de TAMANHO_MAX_ARQUIVO_MB a gravação é interrompida e o
+        arquivo é recusado com UploadRejeitado. Retorna (caminho, hash).
         """
-        filename = secure_filename(arquivo.filename)
-        caminho = os.path.join(Constantes.PASTA_UPLOAD, filename)
-        logger.info(f"Salvando arquivo recebido: {filename!r}")
-        arquivo.save(caminho)
-        logger.debug(f"Arquivo salvo em {caminho!r}")
-        return caminho
+        ext = Path(arquivo.filename).suffix.lower()
+        limite = Constantes.TAMANHO_MAX_ARQUIVO_MB * 1024 * 1024
+        temporario = os.path.join(pasta, f".{uuid.uuid4().hex}.parcial")
+        h = hashlib.sha256()
+        tamanho = 0
+        logger.info(f"Recebendo arquivo {arquivo.filename!r}")
+        try:
+            with Metricas.etapa("salvar"), open(temporario, "wb") as destino:
+                for bloco in iter(lambda: arquivo.stream.read(Constantes.BLOCO_UPLOAD), b""):
+                    tamanho += len(bloco)
+                    if tamanho > limite:
+                        raise UploadRejeitado(
+                            f"{arquivo.filename}: maior que {Constantes.TAMANHO_MAX_ARQUIVO_MB} MB"
+                        )
+                    h.update(bloco)
+                    destino.write(bloco)
+            if not tamanho:
+                raise UploadRejeitado(f"{arquivo.filename}: arquivo vazio")
+
+            hash_conteudo = h.hexdigest()
+            caminho = os.path.join(pasta, hash_conteudo + ext)
+            if os.path.exists(caminho):
+                # Mesmo conteúdo já recebido: o arquivo existente é reaproveitado
+                logger.info(f"Conteúdo de {arquivo.filename!r} já recebido ({hash_conteudo[:12]})")
+            else:
+                os.replace(temporario, caminho)
+                logger.debug(f"Arquivo salvo em {caminho!r} ({tamanho} bytes)")
+            return caminho, hash_conteudo
+        finally:
+            Path(temporario).unlink(missing_ok=True)
 
     @staticmethod
-    def processar_pdf(caminho_arquivo: str) -> list[str]:
+    def contar_paginas_pdf(caminho_arquivo: str) -> int:
+        """Retorna o número de páginas do PDF sem renderizá-las."""
+        with fitz.open(caminho_arquivo) as documento:
+            return documento.page_count
+
+    @staticmethod
+    def extrair_texto_pagina(pagina: fitz.Page, modo: str) -> str | None:
         """
-        Converte um PDF em várias imagens PNG, uma por página.
-        Retorna lista de caminhos das imagens.
+        Retorna o texto embutido da página quando ele pode substituir a
+        imagem, conforme o modo de leitura (auto | texto | imagem).
         """
-        imagens = []
-        documento = fitz.open(caminho_arquivo)
-        base = Path(caminho_arquivo).stem
-        for i in range(documento.page_count):
-            pix = documento.load_page(i).get_pixmap(dpi=300)
-            out = os.path.join(Constantes.PASTA_IMAGENS_TEMP, f"{base}_pagina_{i+1}.png")
-            pix.save(out)
-            imagens.append(out)
-            logger.debug(f"Página {i+1} salva em {out!r}")
-        documento.close()
-        logger.info(f"PDF convertido em {len(imagens)} imagem(ns)")
-        return imagens
+        if modo == "imagem":
+            return None
+        texto = pagina.get_text("text").strip()
+        if not texto or texto.count("\ufffd") > len(texto) * 0.05:
+            return None
+        if modo == "texto":
+            return texto
+        # auto: só páginas com texto suficiente e sem figuras/gráficos
+        if len(texto) < Constantes.TEXTO_MIN_CARACTERES:
+            return None
+        if pagina.get_images(full=False):
+            return None
+        if len(pagina.get_drawings()) > Constantes.TEXTO_MAX_DESENHOS:
+            return None
+        return texto
 
     @staticmethod
-    def converter_imagem(caminho_arquivo: str) -> str | None:
+    def renderizar_pagina_pdf(caminho_arquivo: str, indice: int, modo: str,
+                              pasta: str = Constantes.PASTA_IMAGENS_TEMP, nome: str | None = None) -> dict:
         """
-        Converte JPG/JPEG/PNG em PNG otimizado.
-        Retorna caminho da PNG ou None em caso de erro.
+        Prepara uma página do PDF como {'imagem', 'texto'}: a camada de
+        texto quando utilizável (ver extrair_texto_pagina), senão a página
+        renderizada com DPI, cor e formato definidos por PoliticaImagem,
+        pré-processada (Preprocessamento) e salva em pasta como
+        <nome>_pagina_N (nome padrão: o do arquivo). Páginas em branco
+        voltam como {'imagem': None, 'texto': None, 'em_branco': True}.
+        Executada nos processos do PoolRenderizacao.
         """
-        try:
-            img = Image.open(caminho_arquivo).convert("RGB")
-            out_path = os.path.join(Constantes.PASTA_IMAGENS_TEMP, f"{Path(caminho_arquivo).stem}.png")
-            img.save(out_path, "PNG", optimize=True)
-            logger.info(f"Imagem convertida: {out_path!r}")
-            return out_path
-        except Exception as e:
-            logger.error(f"Erro ao converter imagem {caminho_arquivo!r}", exc_info=e)
-            return None
+        with PoolRenderizacao.documento(caminho_arquivo) as documento:
+            pagina = documento.load_page(indice)
+            texto = Arquivo.extrair_texto_pagina(pagina, modo)
+            if texto is not None:
+                logger.debug(f"Página {indice+1} enviada como texto ({len(texto)} caracteres)")
+                return {"imagem": None, "texto": texto}
+            renderizada = PoliticaImagem.renderizar_pagina(pagina)
+            # Página com camada de texto nunca é tratada como em branco
+            pode_pular = not pagina.get_text("text").strip()
+        img = Preprocessamento.aplicar(renderizada, pode_pular)
+        PoliticaImagem.registrar_preprocessamento(renderizada, img)
+        if img is None:
+            logger.info(f"Página {indice+1} em branco: não será enviada")
+            return {"imagem": None, "texto": None, "em_branco": True}
+        base = nome or Path(caminho_arquivo).stem
+        out = PoliticaImagem.salvar(
+            img, os.path.join(pasta, f"{base}_pagina_{indice+1}")
+        )
+        logger.debug(f"Página {indice+1} salva em {out!r}")
+        return {"imagem": out, "texto": None}
 
     @staticmethod
-    def salvar_dados_temp(data, filename: str) -> str:
+    def processar_pdf(caminho_arquivo: str, modo: str = Constantes.MODO_LEITURA_PADRAO,
+                      paginas: int | None = None,
+                      pasta_imagens: str = Constantes.PASTA_IMAGENS_TEMP,
+                      selecionadas: Iterable[int] | None = None,
+                      nome: str | None = None) -> Iterator[dict | None]:
         """
-        Salva qualquer objeto em pickle na pasta temp_data.
-        Retorna caminho completo do arquivo.
+        Gera as páginas do PDF em ordem, como {'imagem', 'texto'}, ou só
+        as selecionadas (índices a partir de 0), ao retomar uma tarefa.
+        As imagens recebem nome como prefixo (ver renderizar_pagina_pdf).
+        As páginas são distribuídas entre os processos do PoolRenderizacao,
+        algumas à frente do consumidor, para que o envio ao Gemini comece
+        antes do fim da conversão. Páginas que falham ou passam do tempo
+        limite (por página ou do documento inteiro) geram None.
         """
-        filepath = os.path.join(Constantes.PASTA_DADOS_TEMP, filename)
-        with open(filepath, "wb") as f:
-            pickle.dump(data, f)
-        logger.debug(f"Dados temporários salvos em {filepath!r}")
-        return filepath
+        base = Path(caminho_arquivo).stem
+        if paginas is None:
+            paginas = PoolRenderizacao.executar(
+                Arquivo.contar_paginas_pdf, caminho_arquivo, timeout=Constantes.TEMPO_MAX_PAGINA_S
+            )
+        ordem = list(range(paginas)) if selecionadas is None else sorted(i for i in selecionadas if i < paginas)
+        prazo = time.monotonic() + Constantes.TEMPO_MAX_DOCUMENTO_S
+        janela = max(1, PoolRenderizacao.processos())
+
+        def _renderizar(indice: int) -> dict:
+            restante = prazo - time.monotonic()
+            if restante <= 0:
+                raise TimeoutError(f"Tempo limite do documento ({Constantes.TEMPO_MAX_DOCUMENTO_S} s) excedido")
+            with Metricas.contexto(pagina=indice + 1), Metricas.etapa("renderizar"):
+                return PoolRenderizacao.executar(
+                    Arquivo.renderizar_pagina_pdf, caminho_arquivo, indice, modo, pasta_imagens, nome,
+                    timeout=min(Constantes.TEMPO_MAX_PAGINA_S, restante)
+                )
+
+        def _descartar(futuro):
+            if not futuro.cancelled() and futuro.exception() is None and futuro.result()["imagem"]:
+                Path(futuro.result()["imagem"]).unlink(missing_ok=True)
+
+        paginas_texto = 0
+        with ThreadPoolExecutor(max_workers=janela, thread_name_prefix="renderizacao") as executor:
+            pendentes = deque()
+            proxima = 0
+            try:
+                while pendentes or proxima < len(ordem):
+                    while proxima < len(ordem) and len(pendentes) < janela:
+                        # Cada página leva uma cópia do contexto (tarefa/função) para as métricas
+                        pendentes.append(
+                            executor.submit(contextvars.copy_context().run, _renderizar, ordem[proxima])
+                        )
+                        proxima += 1
+                    indice = ordem[proxima - len(pendentes)]
+                    try:
+                        pagina = pendentes.popleft().result()
+                    except Exception as e:
+                        logger.error(f"Falha ao preparar a página {indice+1} de {base!r}: {e}")
+                        pagina = None
+                    if pagina is not None and pagina["texto"] is not None:
+                        paginas_texto += 1
+                    yield pagina
+            finally:
+                # Consumidor interrompido: descarta as páginas preparadas e não entregues
+                for futuro in pendentes:
+                    futuro.cancel()
+                    futuro.add_done_callback(_descartar)
+        logger.info(
+            f"PDF {base!r} convertido página a página "
+            f"({paginas_texto}/{len(ordem)} como texto)"
+        )
 
     @staticmethod
-    def carregar_dados_temp(filepath: str):
+    def converter_imagem(caminho_arquivo: str, pasta: str = Constantes.PASTA_IMAGENS_TEMP,
+                         nome: str | None = None) -> dict | None:
         """
-        Carrega dados de um pickle da pasta temp_data.
-        Retorna o objeto desserializado.
+        Converte JPG/JPEG/PNG conforme PoliticaImagem (cor, limite de
+        pixels e formato), com o Preprocessamento, e salva em pasta como
+        nome (padrão: o nome do arquivo). Retorna a página como
+        {'imagem', 'texto'} (em branco: 'em_branco' True, sem imagem) ou
+        None em caso de erro.
         """
-        with open(filepath, "rb") as f:
-            data = pickle.load(f)
-        logger.debug(f"Dados temporários carregados de {filepath!r}")
-        return data
+        try:
+            with Image.open(caminho_arquivo) as original:
+                preparada = PoliticaImagem.preparar_imagem(original)
+            img = Preprocessamento.aplicar(preparada)
+            PoliticaImagem.registrar_preprocessamento(preparada, img)
+            if img is None:
+                logger.info(f"Imagem em branco: {caminho_arquivo!r} não será enviada")
+                return {"imagem": None, "texto": None, "em_branco": True}
+            out_path = PoliticaImagem.salvar(
+                img, os.path.join(pasta, nome or Path(caminho_arquivo).stem)
+            )
+            logger.info(f"Imagem convertida: {out_path!r}")
+            return {"imagem": out_path, "texto": None}
+        except Exception as e:
+            logger.error(f"Erro ao converter imagem {caminho_arquivo!r}", exc_info=e)
+            return None
 
     @staticmethod
     def analisar_resultado(texto: str) -> list[dict]:
@@ -170,30 +309,100 @@ class Arquivo:
         return itens
 
     @staticmethod
-    def processar_arquivos(arquivos) -> list[dict]:
+    def processar_arquivos(arquivos, rejeitados: list[str] | None = None,
+                           pasta: str = Constantes.PASTA_UPLOAD) -> list[dict]:
         """
-        Processa lista de arquivos: valida extensão, salva, converte PDF/imagem.
-        Retorna lista de {'arquivo': nome, 'imagens': [caminhos]}.
+        Processa lista de arquivos: valida extensão, grava em pasta e
+        confere os limites de tamanho e de páginas (por arquivo e no total).
+        A conversão das páginas fica para gerar_paginas().
+        Retorna lista de {'arquivo': nome, 'caminho': salvo, 'hash': sha256,
+        'tipo': ext, 'paginas': n}; os motivos das recusas vão para rejeitados.
         """
         logger.info(f"Processando {len(arquivos)} arquivo(s) recebidos")
         resultados = []
+        total_paginas = 0
+
+        def descartar(caminho: str):
+            # Conteúdo repetido é salvo no mesmo <hash>: só remove se nenhum aceito o usa
+            if all(r["caminho"] != caminho for r in resultados):
+                Path(caminho).unlink(missing_ok=True)
+
         for arq in arquivos:
             if not arq or not arq.filename:
                 continue
             ext = Path(arq.filename).suffix.lower().lstrip(".")
             logger.info(f"Arquivo {arq.filename!r} → extensão {ext!r}")
-            if ext not in Constantes.PERMITE_EXTENCAO_UPLOAD:
-                logger.warning(f"Extensão não permitida: {arq.filename!r}")
+            try:
+                if ext not in Constantes.PERMITE_EXTENCAO_UPLOAD:
+                    raise UploadRejeitado(f"{arq.filename}: formato não permitido")
+                caminho, hash_conteudo = Arquivo.salvar_arquivo(arq, pasta)
+                # Abrir o PDF fica fora do processo do servidor: um arquivo malformado não o trava
+                paginas = PoolRenderizacao.executar(
+                    Arquivo.contar_paginas_pdf, caminho, timeout=Constantes.TEMPO_MAX_PAGINA_S
+                ) if ext == "pdf" else 1
+                if paginas > Constantes.MAX_PAGINAS_ARQUIVO:
+                    descartar(caminho)
+                    raise UploadRejeitado(
+                        f"{arq.filename}: {paginas} páginas (máximo {Constantes.MAX_PAGINAS_ARQUIVO})"
+                    )
+                if total_paginas + paginas > Constantes.MAX_PAGINAS_TAREFA:
+                    descartar(caminho)
+                    raise UploadRejeitado(
+                        f"{arq.filename}: o envio passaria de {Constantes.MAX_PAGINAS_TAREFA} páginas"
+                    )
+            except UploadRejeitado as e:
+                logger.warning(f"Upload recusado: {e}")
+                if rejeitados is not None:
+                    rejeitados.append(str(e))
                 continue
-            caminho = Arquivo.salvar_arquivo(arq)
-            if ext == "pdf":
-                imgs = Arquivo.processar_pdf(caminho)
-            else:
-                conv = Arquivo.converter_imagem(caminho)
-                imgs = [conv] if conv else []
-            resultados.append({"arquivo": arq.filename, "imagens": imgs})
+            except Exception as e:
+                logger.error(f"Arquivo inválido {arq.filename!r}", exc_info=e)
+                if rejeitados is not None:
+                    rejeitados.append(f"{arq.filename}: arquivo inválido")
+                continue
+            total_paginas += paginas
+            resultados.append({
+                "arquivo": arq.filename, "caminho": caminho, "hash": hash_conteudo,
+                "tipo": ext, "paginas": paginas,
+            })
         return resultados
 
+    @staticmethod
+    def gerar_paginas(resultados: list[dict], modo: str = Constantes.MODO_LEITURA_PADRAO,
+                      pasta_imagens: str = Constantes.PASTA_IMAGENS_TEMP,
+                      indices: Iterable[int] | None = None) -> Iterator[dict | None]:
+        """
+        Gera, em ordem, as páginas de todos os arquivos retornados por
+        processar_arquivos() como {'imagem': caminho, 'texto': str},
+        convertendo sob demanda para pasta_imagens. Com indices (numeração
+        contínua entre os arquivos), gera apenas essas páginas. Páginas e
+        imagens que falham na conversão (ou passam do tempo limite) geram None.
+        As imagens levam a posição do arquivo no nome: o mesmo conteúdo
+        enviado duas vezes (mesmo <hash> salvo) não divide as imagens.
+        """
+        selecionadas = None if indices is None else set(indices)
+        inicio = 0
+        for posicao, r in enumerate(resultados, start=1):
+            fim = inicio + r["paginas"]
+            locais = None if selecionadas is None else [i - inicio for i in selecionadas if inicio <= i < fim]
+            inicio = fim
+            if locais == []:
+                continue
+            nome = f"{posicao}_{Path(r['caminho']).stem}"
+            if r["tipo"] == "pdf":
+                yield from Arquivo.processar_pdf(r["caminho"], modo, r["paginas"], pasta_imagens, locais, nome)
+                continue
+            try:
+                with Metricas.etapa("converter"):
+                    conv = PoolRenderizacao.executar(
+                        Arquivo.converter_imagem, r["caminho"], pasta_imagens, nome,
+                        timeout=Constantes.TEMPO_MAX_PAGINA_S
+                    )
+            except Exception as e:
+                logger.error(f"Falha ao converter {r['caminho']!r}: {e}")
+                conv = None
+            yield conv
+
     @staticmethod
     def parse_validation(json_text: str) -> Dict[str, Any]:
         """
@@ -268,34 +477,262 @@ class Arquivo:
 # Classe responsável pelo Gemini
 #==========================================================
 class Gemini:
-    # Configura o SDK
-    genai.configure(api_key=Constantes.CHAVE_API_GEMINI)
+    _lock = threading.Lock()
+    _modelo = None
+    # Linha que abre cada página na resposta de um lote (Prompts.DELIMITADOR_PAGINA)
+    _DELIMITADOR_LOTE = re.compile(r"^\s*=== PÁGINA (\d+) ===\s*$", re.MULTILINE)
+
+    @classmethod
+    def modelo(cls):
+        """
+        Configura o SDK e cria o GenerativeModel na primeira chamada, e não
+        na importação: a partida do aplicativo não espera pelo SDK.
+        """
+        if cls._modelo is None:
+            with cls._lock:
+                if cls._modelo is None:
+                    inicio = time.perf_counter()
+                    genai.configure(api_key=Constantes.CHAVE_API_GEMINI)
+                    cls._modelo = genai.GenerativeModel(
+                        model_name=Constantes.MODELO_GEMINI,
+                        generation_config=Constantes.CONFIG_GEMINI
+                    )
+                    logger.info(f"Modelo {Constantes.MODELO_GEMINI} configurado em {time.perf_counter() - inicio:.2f} s")
+        return cls._modelo
 
     @staticmethod
-    def processar_imagem(img_path: str, model, prompt: str) -> str:
+    def gerar(model, partes: list, ao_receber: Callable[[str | None], None] | None = None):
+        """
+        Chama generate_content em modo streaming, repassando cada trecho
+        de texto a ao_receber assim que chega. Retorna a resposta completa.
+        A chamada passa pelo AgendadorGemini (cotas, repetição e
+        concorrência); falhas definitivas sobem como ErroGemini. Se uma
+        repetição começa depois de trechos já repassados, ao_receber(None)
+        avisa que o texto parcial recomeça. Os tokens da resposta vão para
+        o medidor de Consumo ativo.
+        """
+        repassou = False
+
+        def _chamar():
+            nonlocal repassou
+            if repassou:
+                ao_receber(None)
+                repassou = False
+            with Metricas.etapa("gerar"):
+                resp = model.generate_content(partes, stream=True)
+                for trecho in resp:
+                    try:
+                        texto = trecho.text
+                    except ValueError:
+                        # Trecho sem partes de texto (ex.: apenas metadados)
+                        continue
+                    if ao_receber and texto:
+                        ao_receber(texto)
+                        repassou = True
+                return resp
+
+        resp = AgendadorGemini.executar(_chamar, AgendadorGemini.estimar_tokens(partes))
+        Consumo.registrar(resp, partes)
+        return resp
+
+    @staticmethod
+    def processar_imagem(img_path: str, model, prompt: str, usar_cache: bool = True,
+                         tarefa_id: str | None = None,
+                         ao_receber: Callable[[str | None], None] | None = None) -> str:
         """
         Envia a imagem ao modelo, faz polling até ACTIVE e retorna o texto gerado.
-        Em caso de erro, reduz a imagem e tenta de novo.
+        Limites de cota e falhas transitórias são repetidos pelo AgendadorGemini;
+        apenas quando a imagem excede o limite da API ela é reduzida e reenviada.
+        Com usar_cache, respostas já conhecidas (mesma imagem, prompt,
+        modelo e configuração) são devolvidas sem chamar o Gemini.
+        Uploads idênticos são reaproveitados via RegistroUploads e ficam
+        vinculados a tarefa_id até a tarefa liberá-los.
+        O texto gerado é repassado a ao_receber à medida que chega.
         """
+        hash_imagem = RegistroUploads.hash_arquivo(img_path)
+        usar_cache = usar_cache and Constantes.CACHE_RESPOSTAS_ATIVO
+        chave = CacheRespostas.gerar_chave(hash_imagem, prompt) if usar_cache else None
+        if chave:
+            em_cache = CacheRespostas.obter(chave)
+            if em_cache is not None:
+                logger.info(f"Resposta em cache para {img_path!r}")
+                return em_cache
+
         logger.info(f"Gerando conteúdo para {img_path!r}")
-        def _upload_e_gerar(caminho):
-            upload = genai.upload_file(caminho, mime_type="image/png")
-            while genai.get_file(upload.name).state.name != "ACTIVE":
-                time.sleep(2)
-            resp = model.generate_content([upload, prompt])
-            return resp.text or "Nenhuma informação extraída."
+        def _upload_e_gerar(caminho, hash_conteudo=None):
+            upload = RegistroUploads.obter(
+                caminho, PoliticaImagem.mime_type(caminho), hash_conteudo, dono=tarefa_id
+            )
+            resp = Gemini.gerar(model, [upload, prompt], ao_receber)
+            texto = resp.text
+            if texto and chave:
+                CacheRespostas.salvar(chave, texto)
+            return texto or "Nenhuma informação extraída."
 
         try:
-            return _upload_e_gerar(img_path)
-        except Exception:
-            logger.exception("Falha na primeira tentativa")
-            reduzido = os.path.join(Constantes.PASTA_IMAGENS_TEMP, "temp_reduzida.png")
+            return _upload_e_gerar(img_path, hash_imagem)
+        except Exception as e:
+            if AgendadorGemini.classificar(e) != "grande":
+                logger.exception("Falha ao processar imagem")
+                return "Erro ao processar imagem."
+            logger.warning(f"Imagem acima do limite da API: {img_path!r}")
+            caminho = Path(img_path)
+            reduzido = str(caminho.with_name(f"{caminho.stem}_reduzida{caminho.suffix}"))
             with Image.open(img_path) as img:
                 w, h = img.size
-                img.resize((int(w*0.9), int(h*0.9)), LANCZOS_FILTER).save(reduzido, optimize=True, quality=85)
+                img.resize((int(w*0.9), int(h*0.9)), PoliticaImagem.filtro_reducao()).save(reduzido, optimize=True, quality=85)
             logger.info("Tentando novamente com imagem reduzida")
             try:
                 return _upload_e_gerar(reduzido)
             except Exception:
                 logger.exception("Falha na segunda tentativa")
                 return "Erro ao processar imagem."
+            finally:
+                Path(reduzido).unlink(missing_ok=True)
+
+    @staticmethod
+    def processar_texto(texto: str, model, prompt: str, usar_cache: bool = True,
+                        ao_receber: Callable[[str | None], None] | None = None) -> str:
+        """
+        Envia ao modelo o texto extraído da camada nativa do PDF, sem
+        upload de imagem. Usa o mesmo cache de respostas das imagens.
+        """
+        hash_texto = hashlib.sha256(texto.encode("utf-8")).hexdigest()
+        usar_cache = usar_cache and Constantes.CACHE_RESPOSTAS_ATIVO
+        chave = CacheRespostas.gerar_chave(hash_texto, prompt) if usar_cache else None
+        if chave:
+            em_cache = CacheRespostas.obter(chave)
+            if em_cache is not None:
+                logger.info("Resposta em cache para página de texto")
+                return em_cache
+
+        logger.info(f"Gerando conteúdo para página de texto ({len(texto)} caracteres)")
+        try:
+            resp = Gemini.gerar(model, [f"Conteúdo da página:\n\n{texto}", prompt], ao_receber)
+            resultado = resp.text
+            if resultado and chave:
+                CacheRespostas.salvar(chave, resultado)
+            return resultado or "Nenhuma informação extraída."
+        except Exception:
+            logger.exception("Falha ao processar página de texto")
+            return "Erro ao processar página."
+
+    @staticmethod
+    def dividir_lote(texto: str, total: int) -> list[str] | None:
+        """
+        Separa a resposta de um lote pelos delimitadores de página.
+        Retorna None se as páginas não vierem completas e em ordem.
+        """
+        with Metricas.etapa("parse"):
+            marcas = list(Gemini._DELIMITADOR_LOTE.finditer(texto))
+            if [int(m.group(1)) for m in marcas] != list(range(1, total + 1)):
+                return None
+            partes = []
+            for i, marca in enumerate(marcas):
+                fim = marcas[i + 1].start() if i + 1 < len(marcas) else len(texto)
+                partes.append(texto[marca.end():fim].strip() or "Nenhuma informação extraída.")
+            return partes
+
+    @staticmethod
+    def repartir_parciais(ao_receber: Callable[[int, str | None], None],
+                          indices: list[int]) -> Callable[[str | None], None]:
+        """
+        Callback de streaming de um lote: segue as linhas '=== PÁGINA N ==='
+        e repassa o texto de cada página como ao_receber(indices[N-1],
+        trecho). Só linhas completas são repassadas, já que o delimitador
+        pode chegar partido entre dois trechos. None (texto recomeçado) é
+        repassado às páginas que já tinham recebido texto.
+        """
+        resto, atual, com_texto = "", None, set()
+
+        def receber(trecho: str | None):
+            nonlocal resto, atual, com_texto
+            if trecho is None:
+                for indice in sorted(com_texto):
+                    ao_receber(indice, None)
+                resto, atual, com_texto = "", None, set()
+                return
+            linhas = (resto + trecho).split("\n")
+            resto = linhas.pop()
+            novos: dict[int, str] = {}
+            for linha in linhas:
+                if marca := Gemini._DELIMITADOR_LOTE.match(linha):
+                    n = int(marca.group(1))
+                    atual = indices[n - 1] if 1 <= n <= len(indices) else None
+                elif atual is not None:
+                    novos[atual] = novos.get(atual, "") + linha + "\n"
+            for indice, texto in novos.items():
+                com_texto.add(indice)
+                ao_receber(indice, texto)
+
+        return receber
+
+    @staticmethod
+    def processar_lote(paginas: list[dict], model, prompt: str, usar_cache: bool = True,
+                       tarefa_id: str | None = None,
+                       ao_receber: Callable[[int, str | None], None] | None = None) -> list[str] | None:
+        """
+        Envia várias páginas ({'imagem', 'texto'}) em uma única chamada,
+        separadas por delimitadores, e devolve um resultado por página.
+        Páginas já em cache não entram no lote. Retorna None quando a
+        resposta não pode ser dividida ou foi cortada por max_output_tokens;
+        nesse caso o chamador deve processar as páginas individualmente.
+        O texto gerado é repassado a ao_receber(posição em paginas, trecho)
+        à medida que chega; None avisa que o texto parcial da página foi
+        descartado.
+        """
+        usar_cache = usar_cache and Constantes.CACHE_RESPOSTAS_ATIVO
+        resultados: list[str | None] = [None] * len(paginas)
+        chaves: list[str | None] = [None] * len(paginas)
+        for i, pagina in enumerate(paginas):
+            if not usar_cache:
+                continue
+            if pagina["texto"] is not None:
+                hash_conteudo = hashlib.sha256(pagina["texto"].encode("utf-8")).hexdigest()
+            else:
+                hash_conteudo = RegistroUploads.hash_arquivo(pagina["imagem"])
+            chaves[i] = CacheRespostas.gerar_chave(hash_conteudo, prompt)
+            resultados[i] = CacheRespostas.obter(chaves[i])
+
+        faltantes = [i for i, r in enumerate(resultados) if r is None]
+        if not faltantes:
+            logger.info(f"Lote de {len(paginas)} página(s) inteiramente em cache")
+            return resultados
+
+        logger.info(f"Gerando conteúdo para lote de {len(faltantes)} página(s)")
+        parciais = Gemini.repartir_parciais(ao_receber, faltantes) if ao_receber else None
+        try:
+            partes = [Prompts.PROMPT_LOTE_PAGINAS.format(total=len(faltantes)) + prompt]
+            for n, i in enumerate(faltantes, start=1):
+                partes.append(Prompts.DELIMITADOR_PAGINA.format(n=n))
+                pagina = paginas[i]
+                if pagina["texto"] is not None:
+                    partes.append(pagina["texto"])
+                else:
+                    partes.append(RegistroUploads.obter(
+                        pagina["imagem"], PoliticaImagem.mime_type(pagina["imagem"]), dono=tarefa_id
+                    ))
+            resp = Gemini.gerar(model, partes, parciais)
+
+            motivo = resp.candidates[0].finish_reason.name if resp.candidates else ""
+            if motivo == "MAX_TOKENS":
+                logger.warning("Lote cortado por max_output_tokens; processando páginas individualmente")
+                divididos = None
+            else:
+                divididos = Gemini.dividir_lote(resp.text or "", len(faltantes))
+                if divididos is None:
+                    logger.warning("Resposta do lote sem delimitadores válidos; processando páginas individualmente")
+        except Exception:
+            logger.exception("Falha ao processar lote")
+            divididos = None
+        if divididos is None:
+            # As páginas serão refeitas uma a uma: o texto parcial do lote é descartado
+            if parciais:
+                parciais(None)
+            return None
+
+        for i, texto in zip(faltantes, divididos):
+            resultados[i] = texto
+            if chaves[i]:
+                CacheRespostas.salvar(chaves[i], texto)
+        return resultados
@@ -0,0 +1,169 @@
+import time
+import asyncio
+import hashlib
+import logging
+from pathlib import Path
+from typing import Callable
+from src.utils.constantes import Constantes
+from src.utils.importacao import ModuloAdiado
+from src.modules.cache import CacheRespostas
+from src.modules.uploads import RegistroUploads
+from src.modules.imagem import PoliticaImagem
+from src.modules.agendador import AgendadorGemini
+from src.modules.metricas import Metricas
+from src.modules.consumo import Consumo
+
+# Importados no primeiro uso (ou no aquecimento)
+genai = ModuloAdiado("google.generativeai")
+Image = ModuloAdiado("PIL.Image")
+
+logger = logging.getLogger(__name__)
+
+#==========================================================
+# Cliente assíncrono do Gemini
+#==========================================================
+class GeminiAsync:
+    """
+    Variante asyncio de Gemini: geração com generate_content_async,
+    polling do upload com asyncio.sleep e E/S de arquivo em threads
+    auxiliares, para que um único processo mantenha centenas de
+    chamadas em andamento sem uma thread do SO por chamada.
+    """
+    _locks_upload: dict[str, asyncio.Lock] = {}
+
+    @staticmethod
+    async def gerar(model, partes: list, ao_receber: Callable[[str | None], None] | None = None):
+        """
+        generate_content_async em streaming, repassando cada trecho a
+        ao_receber, sob as cotas e a concorrência do AgendadorGemini
+        (ao_receber(None) quando uma repetição recomeça o texto parcial).
+        Os tokens da resposta vão para o medidor de Consumo ativo.
+        """
+        repassou = False
+
+        async def _chamar():
+            nonlocal repassou
+            if repassou:
+                ao_receber(None)
+                repassou = False
+            with Metricas.etapa("gerar"):
+                resp = await model.generate_content_async(partes, stream=True)
+                async for trecho in resp:
+                    try:
+                        texto = trecho.text
+                    except ValueError:
+                        continue
+                    if ao_receber and texto:
+                        ao_receber(texto)
+                        repassou = True
+                return resp
+
+        resp = await AgendadorGemini.executar_async(_chamar, AgendadorGemini.estimar_tokens(partes))
+        Consumo.registrar(resp, partes)
+        return resp
+
+    @classmethod
+    async def obter_upload(cls, caminho: str, hash_conteudo: str, dono: str | None = None):
+        """
+        Versão assíncrona de RegistroUploads.obter: reaproveita o handle
+        registrado ou envia o arquivo e aguarda ACTIVE sem bloquear o loop.
+        """
+        lock = cls._locks_upload.setdefault(hash_conteudo, asyncio.Lock())
+        async with lock:
+            upload = RegistroUploads.consultar(hash_conteudo, dono)
+            if upload is not None:
+                return upload
+            with Metricas.etapa("upload"):
+                upload = await asyncio.to_thread(
+                    genai.upload_file, caminho, mime_type=PoliticaImagem.mime_type(caminho)
+                )
+            limite = time.monotonic() + Constantes.TEMPO_MAX_UPLOAD_ATIVO_S
+            with Metricas.etapa("polling"):
+                while True:
+                    estado = (await asyncio.to_thread(genai.get_file, upload.name)).state.name
+                    if estado == "ACTIVE":
+                        break
+                    if estado == "FAILED":
+                        raise RuntimeError(f"Falha no processamento do upload {upload.name!r}")
+                    if time.monotonic() > limite:
+                        await asyncio.to_thread(RegistroUploads.excluir_remoto, upload)
+                        raise TimeoutError(
+                            f"Upload {upload.name!r} não ficou ACTIVE em {Constantes.TEMPO_MAX_UPLOAD_ATIVO_S} s"
+                        )
+                    await asyncio.sleep(2)
+            # Fora do loop: substituir um handle expirado o exclui da File API
+            await asyncio.to_thread(RegistroUploads.registrar, hash_conteudo, upload, dono)
+            return upload
+
+    @staticmethod
+    async def _consultar_cache(hash_conteudo: str, prompt: str, usar_cache: bool):
+        if not (usar_cache and Constantes.CACHE_RESPOSTAS_ATIVO):
+            return None, None
+        chave = CacheRespostas.gerar_chave(hash_conteudo, prompt)
+        return chave, await asyncio.to_thread(CacheRespostas.obter, chave)
+
+    @classmethod
+    async def processar_imagem(cls, img_path: str, model, prompt: str, usar_cache: bool = True,
+                               tarefa_id: str | None = None,
+                               ao_receber: Callable[[str | None], None] | None = None) -> str:
+        """Equivalente assíncrono de Gemini.processar_imagem."""
+        hash_imagem = await asyncio.to_thread(RegistroUploads.hash_arquivo, img_path)
+        chave, em_cache = await cls._consultar_cache(hash_imagem, prompt, usar_cache)
+        if em_cache is not None:
+            logger.info(f"Resposta em cache para {img_path!r}")
+            return em_cache
+
+        async def _upload_e_gerar(caminho, hash_conteudo):
+            upload = await cls.obter_upload(caminho, hash_conteudo, tarefa_id)
+            resp = await cls.gerar(model, [upload, prompt], ao_receber)
+            texto = resp.text
+            if texto and chave:
+                await asyncio.to_thread(CacheRespostas.salvar, chave, texto)
+            return texto or "Nenhuma informação extraída."
+
+        logger.info(f"Gerando conteúdo (async) para {img_path!r}")
+        try:
+            return await _upload_e_gerar(img_path, hash_imagem)
+        except Exception as e:
+            if AgendadorGemini.classificar(e) != "grande":
+                logger.exception("Falha ao processar imagem")
+                return "Erro ao processar imagem."
+            logger.warning(f"Imagem acima do limite da API: {img_path!r}")
+            caminho = Path(img_path)
+            reduzido = str(caminho.with_name(f"{caminho.stem}_reduzida{caminho.suffix}"))
+
+            def _reduzir():
+                with Image.open(img_path) as img:
+                    w, h = img.size
+                    img.resize((int(w*0.9), int(h*0.9)), PoliticaImagem.filtro_reducao()).save(reduzido, optimize=True, quality=85)
+                return RegistroUploads.hash_arquivo(reduzido)
+
+            logger.info("Tentando novamente com imagem reduzida")
+            try:
+                return await _upload_e_gerar(reduzido, await asyncio.to_thread(_reduzir))
+            except Exception:
+                logger.exception("Falha na segunda tentativa")
+                return "Erro ao processar imagem."
+            finally:
+                Path(reduzido).unlink(missing_ok=True)
+
+    @classmethod
+    async def processar_texto(cls, texto: str, model, prompt: str, usar_cache: bool = True,
+                              ao_receber: Callable[[str | None], None] | None = None) -> str:
+        """Equivalente assíncrono de Gemini.processar_texto."""
+        hash_texto = hashlib.sha256(texto.encode("utf-8")).hexdigest()
+        chave, em_cache = await cls._consultar_cache(hash_texto, prompt, usar_cache)
+        if em_cache is not None:
+            logger.info("Resposta em cache para página de texto")
+            return em_cache
+
+        logger.info(f"Gerando conteúdo (async) para página de texto ({len(texto)} caracteres)")
+        try:
+            resp = await cls.gerar(model, [f"Conteúdo da página:\n\n{texto}", prompt], ao_receber)
+            resultado = resp.text
+            if resultado and chave:
+                await asyncio.to_thread(CacheRespostas.salvar, chave, resultado)
+            return resultado or "Nenhuma informação extraída."
+        except Exception:
+            logger.exception("Falha ao processar página de texto")
+            return "Erro ao processar página."
@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+import os
+import time
+import math
+import logging
+import threading
+from src.utils.constantes import Constantes
+from src.utils.importacao import ModuloAdiado
+
+# Importados na primeira página (ou no aquecimento), não na partida
+fitz = ModuloAdiado("fitz")  # PyMuPDF
+Image = ModuloAdiado("PIL.Image")
+ImageStat = ModuloAdiado("PIL.ImageStat")
+
+logger = logging.getLogger(__name__)
+
+#==========================================================
+# Política de resolução e codificação das páginas
+#==========================================================
+class PoliticaImagem:
+    """
+    Decide DPI, espaço de cor, formato e limite de pixels de cada página
+    conforme Constantes.POLITICA_IMAGEM, e registra o tamanho e o tempo
+    de codificação de cada imagem gerada, além do efeito do
+    Preprocessamento (pixels recortados e páginas em branco puladas).
+    """
+    FORMATOS = {
+        "PNG":  (".png",  "image/png"),
+        "JPEG": (".jpg",  "image/jpeg"),
+        "WEBP": (".webp", "image/webp"),
+    }
+
+    _lock = threading.Lock()
+    _paginas = 0
+    _bytes = 0
+    _tempo = 0.0
+    _em_branco = 0
+    _pixels_antes = 0
+    _pixels_depois = 0
+
+    @staticmethod
+    def config() -> dict:
+        return Constantes.POLITICA_IMAGEM
+
+    @staticmethod
+    def mime_type(caminho: str) -> str:
+        """Mime type da imagem a partir da extensão."""
+        ext = os.path.splitext(caminho)[1].lower()
+        for sufixo, mime in PoliticaImagem.FORMATOS.values():
+            if ext == sufixo or (ext == ".jpeg" and sufixo == ".jpg"):
+                return mime
+        return "image/png"
+
+    @staticmethod
+    def dpi_para_pagina(pagina: fitz.Page) -> int:
+        """DPI configurado, reduzido se a página ultrapassar o limite de pixels."""
+        cfg = PoliticaImagem.config()
+        dpi = cfg["dpi"]
+        largura_pol = pagina.rect.width / 72
+        altura_pol = pagina.rect.height / 72
+        pixels = largura_pol * altura_pol * dpi * dpi
+        if pixels > cfg["max_pixels"]:
+            dpi = int(math.sqrt(cfg["max_pixels"] / (largura_pol * altura_pol)))
+        return max(dpi, 72)
+
+    @staticmethod
+    def pagina_somente_texto(pagina: fitz.Page) -> bool:
+        """Páginas de PDF sem imagens embutidas podem ir em tons de cinza."""
+        return not pagina.get_images(full=False)
+
+    @staticmethod
+    def imagem_sem_cor(img: Image.Image, limite: int = 12) -> bool:
+        """Estima se uma imagem é praticamente monocromática pela saturação média."""
+        amostra = img.convert("RGB")
+        amostra.thumbnail((64, 64))
+        saturacao = amostra.convert("HSV").getchannel("S")
+        return ImageStat.Stat(saturacao).mean[0] < limite
+
+    @staticmethod
+    def usar_cinza(somente_texto: bool) -> bool:
+        modo = PoliticaImagem.config()["tons_de_cinza"]
+        return modo == "sempre" or (modo == "auto" and somente_texto)
+
+    @staticmethod
+    def filtro_reducao():
+        """Filtro LANCZOS (fallback para versões antigas do Pillow)."""
+        return getattr(Image, "Resampling", Image).LANCZOS
+
+    @staticmethod
+    def limitar_pixels(img: Image.Image) -> Image.Image:
+        """Reduz a imagem proporcionalmente até caber no limite de pixels."""
+        max_pixels = PoliticaImagem.config()["max_pixels"]
+        w, h = img.size
+        if w * h <= max_pixels:
+            return img
+        escala = math.sqrt(max_pixels / (w * h))
+        return img.resize((max(1, int(w * escala)), max(1, int(h * escala))), PoliticaImagem.filtro_reducao())
+
+    @staticmethod
+    def renderizar_pagina(pagina: fitz.Page) -> Image.Image:
+        """Renderiza a página do PDF conforme a política (DPI e espaço de cor)."""
+        cinza = PoliticaImagem.usar_cinza(PoliticaImagem.pagina_somente_texto(pagina))
+        pix = pagina.get_pixmap(
+            dpi=PoliticaImagem.dpi_para_pagina(pagina),
+            colorspace=fitz.csGRAY if cinza else fitz.csRGB,
+            alpha=False,
+        )
+        modo = "L" if cinza else "RGB"
+        return Image.frombytes(modo, (pix.width, pix.height), pix.samples)
+
+    @staticmethod
+    def preparar_imagem(img: Image.Image) -> Image.Image:
+        """Aplica espaço de cor e limite de pixels a uma imagem enviada pelo usuário."""
+        cinza = PoliticaImagem.usar_cinza(PoliticaImagem.imagem_sem_cor(img))
+        img = img.convert("L" if cinza else "RGB")
+        return PoliticaImagem.limitar_pixels(img)
+
+    @classmethod
+    def salvar(cls, img: Image.Image, caminho_base: str) -> str:
+        """
+        Codifica a imagem no formato configurado (extensão adicionada a
+        caminho_base), registra bytes e tempo de codificação e retorna o caminho.
+        """
+        cfg = cls.config()
+        formato = cfg["formato"].upper()
+        sufixo, _ = cls.FORMATOS[formato]
+        caminho = caminho_base + sufixo
+
+        opcoes = {"optimize": True} if formato == "PNG" else {"quality": cfg["qualidade"]}
+        inicio = time.perf_counter()
+        img.save(caminho, formato, **opcoes)
+        tempo = time.perf_counter() - inicio
+        tamanho = os.path.getsize(caminho)
+
+        with cls._lock:
+            cls._paginas += 1
+            cls._bytes += tamanho
+            cls._tempo += tempo
+        logger.info(
+            f"Imagem codificada: {os.path.basename(caminho)!r} "
+            f"{img.width}x{img.height} {img.mode} {formato} "
+            f"{tamanho/1024:.1f} KB em {tempo*1000:.0f} ms"
+        )
+        return caminho
+
+    @classmethod
+    def registrar_preprocessamento(cls, antes: Image.Image, depois: Image.Image | None):
+        """Registra os pixels antes/depois do Preprocessamento (depois=None: página em branco)."""
+        with cls._lock:
+            if depois is None:
+                cls._em_branco += 1
+            else:
+                cls._pixels_antes += antes.width * antes.height
+                cls._pixels_depois += depois.width * depois.height
+
+    @classmethod
+    def coletar(cls) -> tuple[int, int, float, int, int, int]:
+        """Retorna e zera os totais locais (usado pelos processos de renderização)."""
+        with cls._lock:
+            totais = (cls._paginas, cls._bytes, cls._tempo, cls._em_branco, cls._pixels_antes, cls._pixels_depois)
+            cls._paginas, cls._bytes, cls._tempo = 0, 0, 0.0
+            cls._em_branco, cls._pixels_antes, cls._pixels_depois = 0, 0, 0
+        return totais
+
+    @classmethod
+    def acumular(cls, totais: tuple[int, int, float, int, int, int]):
+        """Soma aos totais do processo principal os coletados em outro processo."""
+        paginas, tamanho, tempo, em_branco, pixels_antes, pixels_depois = totais
+        with cls._lock:
+            cls._paginas += paginas
+            cls._bytes += tamanho
+            cls._tempo += tempo
+            cls._em_branco += em_branco
+            cls._pixels_antes += pixels_antes
+            cls._pixels_depois += pixels_depois
+
+    @classmethod
+    def estatisticas(cls) -> dict:
+        """Totais de páginas codificadas, bytes gerados, tempo de codificação e pré-processamento."""
+        with cls._lock:
+            return {
+                "paginas": cls._paginas,
+                "bytes": cls._bytes,
+                "bytes_por_pagina": cls._bytes // cls._paginas if cls._paginas else 0,
+                "tempo_codificacao_s": round(cls._tempo, 3),
+                "paginas_em_branco": cls._em_branco,
+                # Fração dos pixels das páginas enviadas removida pelo recorte das margens
+                "pixels_recortados": round(1 - cls._pixels_depois / cls._pixels_antes, 4)
+                                     if cls._pixels_depois else 0.0,
+            }
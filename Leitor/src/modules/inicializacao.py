@@ -0,0 +1,85 @@
+import time
+import logging
+import threading
+from src.utils.importacao import ModuloAdiado
+from src.modules.funcoes import Gemini
+from src.modules.cache import CacheRespostas
+from src.modules.renderizacao import PoolRenderizacao
+from src.modules.metricas import Metricas
+
+logger = logging.getLogger(__name__)
+
+#==========================================================
+# Aquecimento em segundo plano
+#==========================================================
+class Aquecimento:
+    """
+    Faz em segundo plano o que a partida deixou para depois: importa as
+    bibliotecas pesadas (ModuloAdiado), cria o cliente do Gemini, abre o
+    banco do cache e sobe os processos de renderização, já com PyMuPDF e
+    PIL importados.
+
+    A página inicial dispara o aquecimento depois de desenhada (beacon
+    para /aquecer), e /pronto também o inicia, para servidores sem
+    navegador. Sem aquecimento, cada item é carregado no primeiro uso.
+    """
+    _thread: threading.Thread | None = None
+    _lock = threading.Lock()
+    _concluido = threading.Event()
+    # Etapa → segundos (ou a mensagem de erro)
+    _etapas: dict[str, float | str] = {}
+
+    @classmethod
+    def iniciar(cls) -> bool:
+        """Inicia a thread de aquecimento (uma vez por processo); True se iniciou agora."""
+        with cls._lock:
+            if cls._thread is not None:
+                return False
+            cls._thread = threading.Thread(target=cls._executar, name="aquecimento", daemon=True)
+            cls._thread.start()
+            return True
+
+    @classmethod
+    def _executar(cls):
+        inicio = time.perf_counter()
+        for nome, etapa in (
+            ("modulos", ModuloAdiado.carregar_todos),
+            ("modelo", Gemini.modelo),
+            ("cache", CacheRespostas.estatisticas),
+            ("renderizacao", cls._aquecer_renderizacao),
+        ):
+            inicio_etapa = time.perf_counter()
+            try:
+                etapa()
+            except Exception as e:
+                # Não impede o uso: o item é carregado de novo no primeiro uso
+                logger.warning(f"Falha no aquecimento ({nome}): {e!r}")
+                cls._etapas[nome] = f"{type(e).__name__}: {e}"
+                continue
+            duracao = time.perf_counter() - inicio_etapa
+            cls._etapas[nome] = round(duracao, 3)
+            Metricas.observar(f"aquecimento_{nome}", duracao)
+        cls._concluido.set()
+        logger.info(f"Aquecimento concluído em {time.perf_counter() - inicio:.2f} s: {cls._etapas}")
+
+    @staticmethod
+    def _aquecer_renderizacao():
+        """Sobe o pool e importa PyMuPDF/PIL em cada processo (uma chamada por processo)."""
+        if PoolRenderizacao.processos() <= 0:
+            return
+        PoolRenderizacao.iniciar()
+        for _ in range(PoolRenderizacao.processos()):
+            PoolRenderizacao.executar(ModuloAdiado.carregar_todos)
+
+    @classmethod
+    def concluido(cls) -> bool:
+        return cls._concluido.is_set()
+
+    @classmethod
+    def estado(cls) -> dict:
+        return {
+            "iniciado": cls._thread is not None,
+            "concluido": cls.concluido(),
+            "etapas": dict(cls._etapas),
+            "importacao_s": ModuloAdiado.tempos(),
+        }
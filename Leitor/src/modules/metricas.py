@@ -0,0 +1,172 @@
+import sys
+import time
+import queue
+import atexit
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+#==========================================================
+# Log sem bloqueio
+#==========================================================
+class Log:
+    """
+    Configura o log raiz com um QueueHandler: as threads que processam
+    páginas apenas enfileiram o registro, e uma thread do QueueListener
+    formata e escreve no console.
+    """
+    FORMATO = "%(asctime)s [%(levelname)s] %(name)s: %(message)s"
+    FORMATO_DATA = "%Y-%m-%d %H:%M:%S"
+
+    _ouvinte: QueueListener | None = None
+
+    @classmethod
+    def configurar(cls, nivel: int = logging.INFO):
+        """Equivalente a logging.basicConfig, mas com a escrita em segundo plano."""
+        raiz = logging.getLogger()
+        if raiz.handlers:
+            return
+        saida = logging.StreamHandler(sys.stderr)
+        saida.setFormatter(logging.Formatter(cls.FORMATO, cls.FORMATO_DATA))
+        fila = queue.SimpleQueue()
+        raiz.addHandler(QueueHandler(fila))
+        raiz.setLevel(nivel)
+        cls._ouvinte = QueueListener(fila, saida, respect_handler_level=True)
+        cls._ouvinte.start()
+        # Descarrega os registros pendentes ao encerrar
+        atexit.register(cls._ouvinte.stop)
+
+
+#==========================================================
+# Métricas no formato Prometheus
+#==========================================================
+class Metricas:
+    """
+    Histogramas de duração por etapa do pipeline (salvar, renderizar,
+    converter, upload, polling, gerar, parse, markdown, resultado, exportar) e
+    contadores, exportados em /metrics no formato texto do Prometheus.
+
+    As etapas herdam o contexto da página em andamento (tarefa, página
+    e função): a função vira rótulo das métricas; tarefa e página vão
+    apenas para o log de DEBUG, para não multiplicar as séries.
+    """
+    PREFIXO = "leitor"
+    BALDES = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+    _lock = threading.Lock()
+    # (etapa, funcao) → [contagem por balde..., contagem total, soma]
+    _histogramas: dict[tuple[str, str], list] = {}
+    # (nome, rótulos ordenados) → valor
+    _contadores: dict[tuple[str, tuple], float] = {}
+    _coletores: dict[str, Callable[[], dict]] = {}
+    _contexto: contextvars.ContextVar[dict] = contextvars.ContextVar("metricas_contexto", default={})
+
+    @classmethod
+    @contextmanager
+    def contexto(cls, **rotulos):
+        """Define tarefa, página e/ou função para as etapas executadas no bloco."""
+        token = cls._contexto.set({**cls._contexto.get(), **rotulos})
+        try:
+            yield
+        finally:
+            cls._contexto.reset(token)
+
+    @classmethod
+    @contextmanager
+    def etapa(cls, nome: str):
+        """Mede a duração do bloco e a registra no histograma da etapa."""
+        contexto = cls._contexto.get()
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            duracao = time.perf_counter() - inicio
+            cls.observar(nome, duracao, contexto.get("funcao"))
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    f"[{contexto.get('tarefa', '-')}] página {contexto.get('pagina', '-')} "
+                    f"{nome}: {duracao*1000:.1f} ms"
+                )
+
+    @classmethod
+    def observar(cls, etapa: str, duracao: float, funcao: str | None = None):
+        chave = (etapa, funcao or "")
+        with cls._lock:
+            serie = cls._histogramas.get(chave)
+            if serie is None:
+                serie = cls._histogramas[chave] = [0] * len(cls.BALDES) + [0, 0.0]
+            for i, limite in enumerate(cls.BALDES):
+                if duracao <= limite:
+                    serie[i] += 1
+            serie[-2] += 1
+            serie[-1] += duracao
+
+    @classmethod
+    def contar(cls, nome: str, valor: float = 1, **rotulos):
+        """Incrementa o contador leitor_<nome>_total com os rótulos dados."""
+        chave = (nome, tuple(sorted((k, str(v)) for k, v in rotulos.items())))
+        with cls._lock:
+            cls._contadores[chave] = cls._contadores.get(chave, 0) + valor
+
+    @classmethod
+    def registrar_coletor(cls, nome: str, coletor: Callable[[], dict]):
+        """
+        Exporta como gauges leitor_<nome>_<chave> os valores numéricos do
+        dicionário retornado por coletor() (ex.: AgendadorGemini.estatisticas).
+        Dicionários aninhados viram um rótulo "tipo".
+        """
+        cls._coletores[nome] = coletor
+
+    @staticmethod
+    def _rotulos(pares) -> str:
+        if not pares:
+            return ""
+        escapar = lambda v: str(v).replace("\\", r"\\").replace('"', r'\"').replace("\n", r"\n")
+        return "{" + ",".join(f'{k}="{escapar(v)}"' for k, v in pares) + "}"
+
+    @classmethod
+    def exportar(cls) -> str:
+        """Texto no formato de exposição do Prometheus (text/plain; version=0.0.4)."""
+        linhas = []
+        nome = f"{cls.PREFIXO}_etapa_segundos"
+        with cls._lock:
+            histogramas = {k: list(v) for k, v in cls._histogramas.items()}
+            contadores = dict(cls._contadores)
+
+        linhas += [f"# HELP {nome} Duração de cada etapa do pipeline.", f"# TYPE {nome} histogram"]
+        for (etapa, funcao), serie in sorted(histogramas.items()):
+            base = [("etapa", etapa), ("funcao", funcao)]
+            for limite, contagem in zip(cls.BALDES, serie):
+                linhas.append(f"{nome}_bucket{cls._rotulos(base + [('le', limite)])} {contagem}")
+            linhas.append(f"{nome}_bucket{cls._rotulos(base + [('le', '+Inf')])} {serie[-2]}")
+            linhas.append(f"{nome}_count{cls._rotulos(base)} {serie[-2]}")
+            linhas.append(f"{nome}_sum{cls._rotulos(base)} {serie[-1]:.6f}")
+
+        for contador in sorted({n for n, _ in contadores}):
+            completo = f"{cls.PREFIXO}_{contador}_total"
+            linhas.append(f"# TYPE {completo} counter")
+            for (n, rotulos), valor in sorted(contadores.items()):
+                if n == contador:
+                    linhas.append(f"{completo}{cls._rotulos(rotulos)} {valor}")
+
+        for prefixo, coletor in sorted(cls._coletores.items()):
+            try:
+                valores = coletor()
+            except Exception:
+                logger.warning(f"Falha no coletor de métricas {prefixo!r}", exc_info=True)
+                continue
+            for chave, valor in valores.items():
+                completo = f"{cls.PREFIXO}_{prefixo}_{chave}"
+                if isinstance(valor, dict):
+                    numericos = {k: v for k, v in valor.items() if isinstance(v, (int, float))}
+                    if numericos:
+                        linhas.append(f"# TYPE {completo} gauge")
+                        linhas += [f"{completo}{cls._rotulos([('tipo', k)])} {v}" for k, v in numericos.items()]
+                elif isinstance(valor, (int, float)) and not isinstance(valor, bool):
+                    linhas += [f"# TYPE {completo} gauge", f"{completo} {valor}"]
+        return "\n".join(linhas) + "\n"
@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import logging
+from src.utils.constantes import Constantes
+from src.utils.importacao import ModuloAdiado
+
+# Importados na primeira página (ou no aquecimento), não na partida
+np = ModuloAdiado("numpy")
+Image = ModuloAdiado("PIL.Image")
+
+logger = logging.getLogger(__name__)
+
+#==========================================================
+# Pré-processamento vetorizado das páginas
+#==========================================================
+class Preprocessamento:
+    """
+    Limpa a página renderizada (ou a imagem enviada) antes da codificação,
+    conforme Constantes.PREPROCESSAMENTO, com operações NumPy sobre a
+    imagem inteira em tons de cinza:
+      - páginas em branco (folhas separadoras, versos) são detectadas pela
+        fração de pixels com tinta e não vão ao Gemini;
+      - endireitar (opcional): corrige a inclinação de digitalizações pelo
+        perfil de projeção das linhas de texto;
+      - margens uniformes (da cor da borda, clara ou escura) são recortadas;
+      - binarizar (opcional): limiar de Otsu em páginas em tons de cinza.
+    Executado nos processos do PoolRenderizacao.
+    """
+
+    @staticmethod
+    def config() -> dict:
+        return Constantes.PREPROCESSAMENTO
+
+    @staticmethod
+    def _fundo(cinza: np.ndarray) -> int:
+        """Cor de fundo estimada pela mediana da borda de 1 px da imagem."""
+        borda = np.concatenate((cinza[0], cinza[-1], cinza[:, 0], cinza[:, -1]))
+        return int(np.median(borda))
+
+    @staticmethod
+    def _papel(cinza: np.ndarray) -> int:
+        """Cor do papel: nível mediano da página (amostrada), mesmo com bordas escuras do scanner."""
+        return int(np.median(cinza[::4, ::4]))
+
+    @staticmethod
+    def _tinta(cinza: np.ndarray, fundo: int) -> np.ndarray:
+        """Máscara dos pixels que diferem do fundo além da tolerância."""
+        tolerancia = Preprocessamento.config()["tolerancia"]
+        return np.abs(cinza.astype(np.int16) - fundo) > tolerancia
+
+    @staticmethod
+    def em_branco(cinza: np.ndarray, papel: int) -> bool:
+        """
+        Página sem conteúdo: papel claro (páginas escuras, como slides com
+        texto claro, nunca são puladas), pouca variação de tons (fotos e
+        degradês não são puladas) e tinta (pixels que diferem do papel em
+        mais que branco_contraste, para os dois lados, o que ignora o
+        vazamento claro do verso) abaixo de branco_tinta_max da área.
+        """
+        cfg = Preprocessamento.config()
+        if papel < cfg["branco_papel_min"]:
+            return False
+        if float(cinza[::4, ::4].std()) > cfg["branco_desvio_max"]:
+            return False
+        tinta = np.count_nonzero(np.abs(cinza.astype(np.int16) - papel) > cfg["branco_contraste"])
+        return tinta < cinza.size * cfg["branco_tinta_max"]
+
+    @staticmethod
+    def caixa_conteudo(tinta: np.ndarray) -> tuple[int, int, int, int] | None:
+        """
+        (esquerda, topo, direita, base) do conteúdo: linhas e colunas com
+        tinta acima de um mínimo (poeira e ruído isolados não contam).
+        """
+        minimo_linha = max(2, int(tinta.shape[1] * 0.002))
+        minimo_coluna = max(2, int(tinta.shape[0] * 0.002))
+        linhas = np.flatnonzero(tinta.sum(axis=1) >= minimo_linha)
+        colunas = np.flatnonzero(tinta.sum(axis=0) >= minimo_coluna)
+        if not linhas.size or not colunas.size:
+            return None
+        return int(colunas[0]), int(linhas[0]), int(colunas[-1]) + 1, int(linhas[-1]) + 1
+
+    @staticmethod
+    def recortar(img: Image.Image, cinza: np.ndarray) -> Image.Image:
+        """
+        Recorta as margens uniformes, mantendo margem_px de folga. Uma
+        segunda passada, com a nova borda, remove a margem branca que
+        fica por dentro de uma tarja escura do scanner.
+        """
+        esquerda, topo, direita, base = 0, 0, img.width, img.height
+        for _ in range(2):
+            recorte = cinza[topo:base, esquerda:direita]
+            caixa = Preprocessamento.caixa_conteudo(
+                Preprocessamento._tinta(recorte, Preprocessamento._fundo(recorte))
+            )
+            if caixa is None or caixa == (0, 0, recorte.shape[1], recorte.shape[0]):
+                break
+            x0, y0, x1, y1 = caixa
+            esquerda, topo, direita, base = esquerda + x0, topo + y0, esquerda + x1, topo + y1
+        folga = Preprocessamento.config()["margem_px"]
+        esquerda, topo = max(0, esquerda - folga), max(0, topo - folga)
+        direita, base = min(img.width, direita + folga), min(img.height, base + folga)
+        # Ganho pequeno não compensa mudar a geometria da página
+        if (direita - esquerda) * (base - topo) > img.width * img.height * 0.98:
+            return img
+        return img.crop((esquerda, topo, direita, base))
+
+    @staticmethod
+    def angulo_inclinacao(cinza: np.ndarray, papel: int) -> float:
+        """
+        Rotação (graus, anti-horária como em Image.rotate) que alinha as
+        linhas de texto: para cada candidato, projeta as coordenadas da
+        tinta (amostradas) no eixo vertical girado e escolhe o histograma
+        mais "pontudo" (maior soma dos quadrados). Os candidatos de cada
+        passo (grosso, de 0,5°, e fino, de 0,1°) são avaliados de uma vez,
+        numa matriz ângulos × pontos.
+        """
+        cfg = Preprocessamento.config()
+        # Reduz para ~1000 px de altura: o perfil das linhas continua nítido
+        passo = max(1, cinza.shape[0] // 1000)
+        ys, xs = np.nonzero(cinza[::passo, ::passo] < papel - cfg["branco_contraste"])
+        if ys.size < 100:
+            return 0.0
+        if ys.size > 20_000:
+            amostra = np.random.default_rng(0).choice(ys.size, 20_000, replace=False)
+            ys, xs = ys[amostra], xs[amostra]
+        limite = cfg["inclinacao_max_graus"]
+        melhor = Preprocessamento._melhor_angulo(ys, xs, np.arange(-limite, limite + 1e-9, 0.5))
+        melhor = Preprocessamento._melhor_angulo(ys, xs, melhor + np.arange(-0.4, 0.41, 0.1))
+        return round(melhor, 1)
+
+    @staticmethod
+    def _melhor_angulo(ys: np.ndarray, xs: np.ndarray, angulos: np.ndarray) -> float:
+        radianos = np.deg2rad(angulos)[:, None]
+        projecoes = np.rint(ys * np.cos(radianos) - xs * np.sin(radianos)).astype(np.int64)
+        projecoes -= projecoes.min(axis=1, keepdims=True)
+        largura = int(projecoes.max()) + 1
+        # bincount de todas as linhas de uma vez, deslocando cada ângulo para a sua faixa
+        deslocadas = projecoes + np.arange(len(angulos))[:, None] * largura
+        histogramas = np.bincount(deslocadas.ravel(), minlength=len(angulos) * largura)
+        pontuacao = (histogramas.reshape(len(angulos), largura).astype(np.float64) ** 2).sum(axis=1)
+        return float(angulos[int(np.argmax(pontuacao))])
+
+    @staticmethod
+    def endireitar(img: Image.Image, cinza: np.ndarray, papel: int, fundo: int) -> Image.Image:
+        angulo = Preprocessamento.angulo_inclinacao(cinza, papel)
+        if abs(angulo) < 0.2:
+            return img
+        logger.debug(f"Página endireitada em {angulo:.1f}°")
+        cor = fundo if img.mode == "L" else (fundo,) * 3
+        # Bilinear: metade do tempo do bicúbico, sem diferença visível em poucos graus.
+        # Os cantos expostos pela rotação recebem a cor da borda e saem no recorte
+        filtro = getattr(Image, "Resampling", Image).BILINEAR
+        return img.rotate(angulo, resample=filtro, expand=True, fillcolor=cor)
+
+    @staticmethod
+    def binarizar(img: Image.Image) -> Image.Image:
+        """Limiar de Otsu (histograma de 256 níveis) aplicado a uma imagem em tons de cinza."""
+        cinza = np.asarray(img)
+        histograma = np.bincount(cinza.ravel(), minlength=256).astype(np.float64)
+        niveis = np.arange(256)
+        peso_fundo = np.cumsum(histograma)
+        peso_frente = peso_fundo[-1] - peso_fundo
+        soma = np.cumsum(histograma * niveis)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            media_fundo = soma / peso_fundo
+            media_frente = (soma[-1] - soma) / peso_frente
+            variancia = peso_fundo * peso_frente * (media_fundo - media_frente) ** 2
+        limiar = int(np.nanargmax(variancia))
+        return Image.fromarray(np.where(cinza > limiar, 255, 0).astype(np.uint8))
+
+    @staticmethod
+    def aplicar(img: Image.Image, pode_pular: bool = True) -> Image.Image | None:
+        """
+        Aplica o pré-processamento configurado. Retorna None quando a página
+        está em branco (e pode_pular), para que não seja enviada.
+        """
+        cfg = Preprocessamento.config()
+        if not cfg["ativo"]:
+            return img
+        cinza = np.asarray(img.convert("L"))
+        papel = Preprocessamento._papel(cinza)
+
+        if pode_pular and cfg["pular_em_branco"] and Preprocessamento.em_branco(cinza, papel):
+            return None
+        if cfg["endireitar"]:
+            img = Preprocessamento.endireitar(img, cinza, papel, Preprocessamento._fundo(cinza))
+            cinza = np.asarray(img.convert("L"))
+        if cfg["recortar_margens"]:
+            img = Preprocessamento.recortar(img, cinza)
+        if cfg["binarizar"] and img.mode == "L":
+            img = Preprocessamento.binarizar(img)
+        return img
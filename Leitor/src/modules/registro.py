@@ -0,0 +1,196 @@
+import os
+import json
+import time
+import socket
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+from src.utils.constantes import Constantes
+
+logger = logging.getLogger(__name__)
+
+#==========================================================
+# Registro das tarefas compartilhado entre processos
+#==========================================================
+class RegistroTarefas:
+    """
+    Estado das tarefas em um banco SQLite que todos os processos do
+    servidor enxergam (gunicorn/uvicorn com vários workers, ou vários
+    servidores sobre o mesmo espaço temporário). Os resultados continuam
+    no espaço de cada tarefa; aqui ficam o andamento (estado, páginas
+    concluídas, consumo, erro) e o processo dono.
+
+    O dono renova o batimento das suas tarefas a cada BATIMENTO_S. Uma
+    tarefa ativa cujo batimento venceu, ou cujo dono é um processo desta
+    máquina que não existe mais (reinício do servidor), pode ser
+    reivindicada por outro processo, que a retoma
+    (GerenciadorTarefas.retomar); a reivindicação é atômica, de modo que
+    só um processo retoma cada tarefa.
+    """
+    ATIVOS = ("pendente", "processando")
+
+    _lock = threading.Lock()
+    _iniciado = False
+    _batimento: threading.Thread | None = None
+
+    @staticmethod
+    def processo() -> str:
+        """Identificador deste processo (calculado a cada chamada: muda após um fork)."""
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    @classmethod
+    def _dono_vivo(cls, dono: str | None, batimento: float) -> bool:
+        """Dono com batimento recente e, se for desta máquina, processo ainda existente."""
+        if dono is None or time.time() - batimento > Constantes.BATIMENTO_EXPIRA_S:
+            return False
+        maquina, _, pid = dono.rpartition(":")
+        # No Windows, os.kill encerraria o processo: vale só o batimento
+        if os.name == "nt" or maquina != socket.gethostname() or not pid.isdigit():
+            return True
+        try:
+            os.kill(int(pid), 0)
+        except ProcessLookupError:
+            return False
+        except OSError:
+            pass
+        return True
+
+    @classmethod
+    def _conectar(cls) -> sqlite3.Connection:
+        if not cls._iniciado:
+            with cls._lock:
+                if not cls._iniciado:
+                    Path(Constantes.ARQUIVO_REGISTRO_TAREFAS).parent.mkdir(parents=True, exist_ok=True)
+                    with sqlite3.connect(Constantes.ARQUIVO_REGISTRO_TAREFAS, timeout=10) as con:
+                        # WAL: leituras dos outros processos não bloqueiam as gravações do dono
+                        con.execute("PRAGMA journal_mode=WAL")
+                        con.execute(
+                            "CREATE TABLE IF NOT EXISTS tarefas ("
+                            " id TEXT PRIMARY KEY,"
+                            " estado TEXT NOT NULL,"
+                            " concluidas INTEGER NOT NULL,"
+                            " total INTEGER NOT NULL,"
+                            " erro TEXT,"
+                            " consumo TEXT,"
+                            " orcamento INTEGER NOT NULL DEFAULT 0,"
+                            " interrompida INTEGER NOT NULL DEFAULT 0,"
+                            " dono TEXT,"
+                            " batimento REAL NOT NULL)"
+                        )
+                    cls._iniciado = True
+        return sqlite3.connect(Constantes.ARQUIVO_REGISTRO_TAREFAS, timeout=10)
+
+    @classmethod
+    def reivindicar(cls, tarefa_id: str, total: int) -> bool:
+        """
+        Torna este processo dono da tarefa, se ela não tiver registro, não
+        estiver ativa ou o batimento do dono tiver vencido. Retorna False
+        se outro processo vivo a estiver processando.
+        """
+        dono = cls.processo()
+        with cls._conectar() as con:
+            # BEGIN IMMEDIATE: dois processos não reivindicam a mesma tarefa ao mesmo tempo
+            con.execute("BEGIN IMMEDIATE")
+            linha = con.execute(
+                "SELECT estado, dono, batimento FROM tarefas WHERE id = ?", (tarefa_id,)
+            ).fetchone()
+            if linha is not None:
+                estado, dono_atual, batimento = linha
+                if estado in cls.ATIVOS and dono_atual != dono and cls._dono_vivo(dono_atual, batimento):
+                    return False
+            con.execute(
+                "INSERT INTO tarefas (id, estado, concluidas, total, dono, batimento)"
+                " VALUES (?, 'pendente', 0, ?, ?, ?)"
+                " ON CONFLICT(id) DO UPDATE SET estado = 'pendente', erro = NULL,"
+                " total = excluded.total, dono = excluded.dono, batimento = excluded.batimento",
+                (tarefa_id, total, dono, time.time()),
+            )
+        cls._iniciar_batimento()
+        return True
+
+    @classmethod
+    def atualizar(cls, status: dict):
+        """Grava o andamento (Tarefa.status()) de uma tarefa deste processo."""
+        ativa = status["estado"] in cls.ATIVOS
+        with cls._conectar() as con:
+            con.execute(
+                "UPDATE tarefas SET estado = ?, concluidas = ?, total = ?, erro = ?, consumo = ?,"
+                " orcamento = ?, interrompida = ?, dono = ?, batimento = ? WHERE id = ?",
+                (
+                    status["estado"], status["concluidas"], status["total"], status["erro"],
+                    json.dumps(status["consumo"]), status["orcamento"] or 0, int(status["interrompida"]),
+                    cls.processo() if ativa else None, time.time(), status["id"],
+                ),
+            )
+
+    @classmethod
+    def liberar(cls, status: dict):
+        """
+        Devolve uma tarefa interrompida pelo encerramento do processo: ela
+        continua ativa, sem dono, e o próximo processo a consultá-la a retoma.
+        """
+        with cls._conectar() as con:
+            con.execute(
+                "UPDATE tarefas SET estado = 'pendente', concluidas = ?, consumo = ?, dono = NULL"
+                " WHERE id = ? AND dono = ?",
+                (status["concluidas"], json.dumps(status["consumo"]), status["id"], cls.processo()),
+            )
+
+    @classmethod
+    def obter(cls, tarefa_id: str | None) -> dict | None:
+        """Andamento registrado da tarefa, com "vivo" indicando se o dono ainda a processa."""
+        if not tarefa_id:
+            return None
+        with cls._conectar() as con:
+            linha = con.execute(
+                "SELECT id, estado, concluidas, total, erro, consumo, orcamento, interrompida, dono, batimento"
+                " FROM tarefas WHERE id = ?", (tarefa_id,)
+            ).fetchone()
+        if linha is None:
+            return None
+        (id_, estado, concluidas, total, erro, consumo, orcamento, interrompida, dono, batimento) = linha
+        return {
+            "id": id_,
+            "estado": estado,
+            "concluidas": concluidas,
+            "total": total,
+            "erro": erro,
+            "consumo": json.loads(consumo) if consumo else None,
+            "orcamento": orcamento,
+            "interrompida": bool(interrompida),
+            "dono": dono,
+            "vivo": estado in cls.ATIVOS and cls._dono_vivo(dono, batimento),
+        }
+
+    @classmethod
+    def ativa(cls, tarefa_id: str | None) -> bool:
+        """Indica se algum processo vivo está processando a tarefa."""
+        registro = cls.obter(tarefa_id)
+        return registro is not None and registro["vivo"]
+
+    @classmethod
+    def remover(cls, tarefa_id: str):
+        with cls._conectar() as con:
+            con.execute("DELETE FROM tarefas WHERE id = ?", (tarefa_id,))
+
+    @classmethod
+    def _iniciar_batimento(cls):
+        """Inicia a thread que renova as tarefas deste processo (uma vez por processo)."""
+        with cls._lock:
+            if cls._batimento is None or not cls._batimento.is_alive():
+                cls._batimento = threading.Thread(target=cls._bater, name="registro-batimento", daemon=True)
+                cls._batimento.start()
+
+    @classmethod
+    def _bater(cls):
+        while True:
+            time.sleep(Constantes.BATIMENTO_S)
+            try:
+                with cls._conectar() as con:
+                    con.execute(
+                        f"UPDATE tarefas SET batimento = ? WHERE dono = ? AND estado IN {cls.ATIVOS}",
+                        (time.time(), cls.processo()),
+                    )
+            except sqlite3.Error:
+                logger.warning("Falha ao renovar as tarefas no registro", exc_info=True)
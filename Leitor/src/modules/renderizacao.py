@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import os
+import queue
+import logging
+import threading
+import multiprocessing
+from contextlib import contextmanager
+from typing import Callable
+from src.utils.constantes import Constantes
+from src.utils.importacao import ModuloAdiado
+from src.modules.imagem import PoliticaImagem
+
+fitz = ModuloAdiado("fitz")  # PyMuPDF, importado no primeiro documento
+
+logger = logging.getLogger(__name__)
+
+#==========================================================
+# Processo de renderização
+#==========================================================
+def _trabalhador(conexao):
+    """
+    Laço de um processo de renderização: recebe (função, args), executa
+    e devolve (ok, resultado, estatísticas de codificação). Encerra ao
+    receber None ou quando o processo principal fecha a conexão.
+    """
+    PoolRenderizacao._em_trabalhador = True
+    while True:
+        try:
+            pedido = conexao.recv()
+        except (EOFError, OSError):
+            return
+        if pedido is None:
+            return
+        funcao, args = pedido
+        try:
+            resposta = (True, funcao(*args))
+        except Exception as e:
+            resposta = (False, f"{type(e).__name__}: {e}")
+        conexao.send(resposta + (PoliticaImagem.coletar(),))
+
+
+class _Trabalhador:
+    """Um processo de renderização e a ponta da conexão do lado principal."""
+
+    def __init__(self, contexto):
+        self.conexao, remota = contexto.Pipe()
+        self.processo = contexto.Process(target=_trabalhador, args=(remota,), daemon=True)
+        self.processo.start()
+        remota.close()
+
+    def encerrar(self):
+        self.processo.terminate()
+        self.processo.join(5)
+        self.conexao.close()
+
+
+#==========================================================
+# Pool de processos para PyMuPDF e PIL
+#==========================================================
+class PoolRenderizacao:
+    """
+    Executa a renderização de páginas e a conversão de imagens (trabalho
+    de CPU com PyMuPDF e PIL) em processos separados, fora do GIL do
+    servidor. Cada chamada ocupa um processo livre; se não responder no
+    tempo limite, o processo é encerrado e substituído, de modo que um
+    arquivo problemático nunca trava as demais tarefas.
+
+    Com Constantes.PROCESSOS_RENDERIZACAO = 0 as funções rodam na
+    própria thread, sem tempo limite.
+    """
+    _lock = threading.Lock()
+    _livres: queue.Queue | None = None
+    _contexto = None
+    _em_trabalhador = False
+    _documento: tuple[tuple, fitz.Document] | None = None
+
+    @staticmethod
+    def processos() -> int:
+        return Constantes.PROCESSOS_RENDERIZACAO
+
+    @classmethod
+    def iniciar(cls) -> queue.Queue:
+        """
+        Sobe os processos ("spawn": seguro com threads e no Windows). Chamado
+        na primeira execução ou antes, para aquecer o pool.
+        """
+        with cls._lock:
+            if cls._livres is None:
+                cls._contexto = multiprocessing.get_context("spawn")
+                livres = queue.Queue()
+                for _ in range(cls.processos()):
+                    livres.put(_Trabalhador(cls._contexto))
+                cls._livres = livres
+                logger.info(f"Pool de renderização iniciado com {cls.processos()} processo(s)")
+        return cls._livres
+
+    @classmethod
+    def executar(cls, funcao: Callable, *args, timeout: float | None = None):
+        """
+        Executa funcao(*args) em um processo do pool e retorna o resultado.
+        Levanta TimeoutError se passar de timeout (o processo é substituído)
+        e RuntimeError se a função falhar ou o processo morrer.
+        """
+        if cls.processos() <= 0:
+            return funcao(*args)
+
+        livres = cls.iniciar()
+        trabalhador = livres.get()
+        resposta = falha = None
+        try:
+            trabalhador.conexao.send((funcao, args))
+            if trabalhador.conexao.poll(timeout):
+                resposta = trabalhador.conexao.recv()
+            else:
+                logger.warning(
+                    f"Renderização excedeu {timeout} s em "
+                    f"{getattr(funcao, '__qualname__', funcao)}{args}; reiniciando processo"
+                )
+        except (EOFError, OSError) as e:
+            # O processo morreu (ex.: falha nativa do MuPDF em um arquivo corrompido)
+            logger.error(f"Processo de renderização encerrado inesperadamente: {e!r}")
+            falha = e
+        finally:
+            if resposta is None:
+                # Processo travado ou morto: é substituído por um novo
+                trabalhador.encerrar()
+                trabalhador = _Trabalhador(cls._contexto)
+            livres.put(trabalhador)
+
+        if falha is not None:
+            raise RuntimeError("Processo de renderização encerrado inesperadamente") from falha
+        if resposta is None:
+            raise TimeoutError(f"Tempo limite de {timeout} s excedido")
+        ok, resultado, estatisticas = resposta
+        PoliticaImagem.acumular(estatisticas)
+        if not ok:
+            raise RuntimeError(resultado)
+        return resultado
+
+    @classmethod
+    @contextmanager
+    def documento(cls, caminho: str):
+        """
+        Abre o PDF. Dentro de um processo do pool o último documento fica
+        aberto entre as chamadas, para não reinterpretá-lo a cada página.
+        """
+        if not cls._em_trabalhador:
+            with fitz.open(caminho) as documento:
+                yield documento
+            return
+
+        estado = os.stat(caminho)
+        chave = (caminho, estado.st_mtime_ns, estado.st_size)
+        if cls._documento is None or cls._documento[0] != chave:
+            if cls._documento is not None:
+                cls._documento[1].close()
+            cls._documento = (chave, fitz.open(caminho))
+        yield cls._documento[1]
@@ -0,0 +1,264 @@
+import os
+import json
+import logging
+import threading
+from html import escape
+from typing import Callable
+from src.utils.constantes import Constantes
+from src.utils.importacao import ModuloAdiado
+from src.modules.armazenamento import ResultadosTarefa
+from src.modules.metricas import Metricas
+
+# Importado no primeiro resultado (ou no aquecimento)
+markdown = ModuloAdiado("markdown")
+
+logger = logging.getLogger(__name__)
+
+#==========================================================
+# Montagem da página de resultado
+#==========================================================
+class Resultado:
+    """
+    Converte os resultados armazenados de uma tarefa no contexto do
+    template result.html. Independe do framework web, para ser usado
+    tanto pelo Flask (app.py) quanto pelo ASGI (asgi.py).
+
+    Nas opções cujo resultado é o texto das páginas em sequência, a
+    página traz só o primeiro bloco de páginas; os seguintes vêm sob
+    demanda (bloco()). Cada bloco é renderizado uma única vez e guardado
+    no espaço da tarefa.
+    """
+    EXTENSOES_MARKDOWN = ["fenced_code", "tables", "smarty"]
+
+    # Nomes enviados pelo formulário → nomes esperados pelo template
+    OPCOES = {"translation": "translate"}
+    SUB_OPCOES = {"summary": "resumo", "sanitize": "higienizar"}
+
+    @staticmethod
+    def html(texto: str) -> str:
+        """Renderiza Markdown com as extensões usadas no projeto."""
+        with Metricas.etapa("markdown"):
+            return markdown.markdown(texto, extensions=Resultado.EXTENSOES_MARKDOWN)
+
+    @staticmethod
+    def formato(opcoes: dict) -> str | None:
+        """Formato dos blocos paginados (markdown | texto), ou None se a opção não é paginada."""
+        opcao, sub = opcoes["prompt_option"], opcoes.get("sub_prompt_option")
+        if opcao == "text_analysis":
+            return {"summary": "markdown", "sanitize": "markdown", "full_extraction": "texto"}.get(sub)
+        return {"translation": "markdown", "summarize": "markdown", "math_operation": "markdown"}.get(opcao)
+
+    @staticmethod
+    def _em_cache(armazenamento: ResultadosTarefa, nome: str, gerar: Callable[[], str]) -> str:
+        """HTML guardado em html/ no espaço da tarefa, refeito quando chegam novas páginas."""
+        versao = armazenamento.versao()
+        caminho = os.path.join(armazenamento.pasta_html, f"{nome}_{versao}.html")
+        try:
+            with open(caminho, encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            pass
+        html = gerar()
+        os.makedirs(armazenamento.pasta_html, exist_ok=True)
+        temporario = f"{caminho}.{threading.get_ident()}.tmp"
+        with open(temporario, "w", encoding="utf-8") as f:
+            f.write(html)
+        os.replace(temporario, caminho)
+        # As versões anteriores deste trecho não serão mais lidas
+        for arquivo in os.listdir(armazenamento.pasta_html):
+            anterior = arquivo[len(nome) + 1:-len(".html")]
+            if (arquivo.startswith(f"{nome}_") and arquivo.endswith(".html")
+                    and anterior.isdigit() and int(anterior) < versao):
+                try:
+                    os.remove(os.path.join(armazenamento.pasta_html, arquivo))
+                except OSError:
+                    pass
+        return html
+
+    @staticmethod
+    def bloco(armazenamento: ResultadosTarefa, opcoes: dict, inicio: int = 0) -> dict:
+        """
+        HTML das páginas [inicio, inicio + RESULTADO_PAGINAS_POR_BLOCO) e o
+        início do bloco seguinte (None no último): {"html", "proximo"}.
+        """
+        formato = Resultado.formato(opcoes) or "markdown"
+        inicio = max(0, inicio)
+        fim = inicio + Constantes.RESULTADO_PAGINAS_POR_BLOCO
+        total = opcoes.get("total_paginas") or 0
+
+        def gerar() -> str:
+            texto = "\n\n".join(armazenamento.textos(inicio, fim))
+            if formato == "texto":
+                return f"<pre>{escape(texto)}</pre>" if texto else ""
+            return Resultado.html(texto)
+
+        with Metricas.contexto(tarefa=armazenamento.id, funcao=opcoes["prompt_option"]):
+            html = Resultado._em_cache(armazenamento, f"{formato}_{inicio}_{fim}", gerar)
+        return {"html": html, "proximo": fim if fim < total else None}
+
+    @staticmethod
+    def paginas(tarefa_id: str, inicio: int = 0) -> dict | None:
+        """Bloco de páginas pedido pela página de resultado, ou None se não houver."""
+        armazenamento = ResultadosTarefa.abrir(tarefa_id)
+        if armazenamento is None:
+            return None
+        opcoes = armazenamento.metadados()
+        if Resultado.formato(opcoes) is None:
+            return None
+        return Resultado.bloco(armazenamento, opcoes, inicio)
+
+    @staticmethod
+    def _paginado(armazenamento: ResultadosTarefa, opcoes: dict) -> tuple[str, dict]:
+        """Primeiro bloco de páginas e os dados para carregar os seguintes."""
+        primeiro = Resultado.bloco(armazenamento, opcoes)
+        return primeiro["html"], {"job_id": armazenamento.id, "proximo": primeiro["proximo"]}
+
+    @staticmethod
+    def _salvar_debug(armazenamento: ResultadosTarefa):
+        """Grava FULL_DEBUG.txt no espaço da tarefa (apenas com Constantes.FULL_DEBUG)."""
+        caminho = os.path.join(armazenamento.pasta, "FULL_DEBUG.txt")
+        if os.path.exists(caminho):
+            return
+        with open(caminho, "w", encoding="utf-8") as f:
+            f.write("=== DEBUG FULL EXTRACTION ===\n")
+            for registro in armazenamento.registros():
+                f.write(f"\n--- Página {registro['pagina'] + 1} ---\n{registro['texto']}\n")
+        logger.info(f"Extração completa gravada em {caminho!r}")
+
+    @staticmethod
+    def montar(armazenamento: ResultadosTarefa) -> dict | None:
+        """
+        Retorna os argumentos para render_template("result.html", ...)
+        ou None se a opção de processamento não for reconhecida.
+        """
+        opcoes = armazenamento.metadados()
+        with Metricas.contexto(tarefa=armazenamento.id, funcao=opcoes["prompt_option"]), \
+                Metricas.etapa("resultado"):
+            contexto = Resultado._montar(armazenamento, opcoes)
+        if contexto is not None:
+            # Usado nos links de exportação
+            contexto["job_id"] = armazenamento.id
+        return contexto
+
+    @staticmethod
+    def _resumo(armazenamento: ResultadosTarefa, opcoes: dict) -> tuple[str, dict | None]:
+        """Resumo do documento (ResumoHierarquico) ou, sem ele, os resumos das páginas."""
+        resumo = armazenamento.resumo()
+        if resumo is None:
+            return Resultado._paginado(armazenamento, opcoes)
+        return Resultado._em_cache(armazenamento, "resumo", lambda: Resultado.html(resumo)), None
+
+    @staticmethod
+    def _montar(armazenamento: ResultadosTarefa, opcoes: dict) -> dict | None:
+        prompt_opt = Resultado.OPCOES.get(opcoes["prompt_option"], opcoes["prompt_option"])
+        sub_opt = opcoes.get("sub_prompt_option")
+        sub_opt = Resultado.SUB_OPCOES.get(sub_opt, sub_opt)
+
+        logger.info(f"Finalizando processamento - {prompt_opt} ({sub_opt or 'sem sub-opção'})")
+
+        # --- SUMMARIZE ---
+        if prompt_opt == "summarize":
+            html, paginacao = Resultado._resumo(armazenamento, opcoes)
+            return {"results": {"summary_text": html}, "prompt_option": prompt_opt, "paginacao": paginacao}
+
+        # --- VALIDATE ---
+        elif prompt_opt == "validate":
+            all_errors = []
+            for raw in armazenamento.textos():
+                try:
+                    parsed = json.loads(raw)
+                    if isinstance(parsed, dict):
+                        errs = parsed.get("errors", [])
+                    elif isinstance(parsed, list):
+                        errs = parsed
+                    else:
+                        continue
+                    all_errors.extend(errs)
+                except json.JSONDecodeError:
+                    continue
+            return {
+                "results": {"errors": all_errors, "total_errors": len(all_errors)},
+                "prompt_option": prompt_opt,
+            }
+
+        # --- EXTRACT ---
+        elif prompt_opt == "extract":
+            all_data = {"columns": [], "rows": [], "charts": []}
+            for raw in armazenamento.textos():
+                try:
+                    obj = json.loads(raw)
+                    if not all_data["columns"]:
+                        all_data["columns"] = obj.get("table", {}).get("columns", [])
+                    all_data["rows"].extend(obj.get("table", {}).get("rows", []))
+                    all_data["charts"].extend([
+                        f"data:image/png;base64,{c['image']}"
+                        if not c['image'].startswith("data:image")
+                        else c['image']
+                        for c in obj.get("charts", [])
+                    ])
+                except Exception:
+                    continue
+            return {"results": all_data, "prompt_option": prompt_opt}
+
+        # --- TRANSLATE ---
+        elif prompt_opt == "translate":
+            html, paginacao = Resultado._paginado(armazenamento, opcoes)
+            return {
+                "results": {
+                    "summary_text": html,
+                    "target_language": opcoes.get("target_language") or "en",
+                },
+                "prompt_option": prompt_opt,
+                "paginacao": paginacao,
+            }
+
+        # --- TEXT ANALYSIS ---
+        elif prompt_opt == "text_analysis":
+            if sub_opt == "resumo":
+                html, paginacao = Resultado._resumo(armazenamento, opcoes)
+                return {
+                    "results": {"summary_text": html},
+                    "prompt_option": prompt_opt,
+                    "sub_prompt_option": sub_opt,
+                    "paginacao": paginacao,
+                }
+
+            elif sub_opt == "higienizar":
+                html, paginacao = Resultado._paginado(armazenamento, opcoes)
+                return {
+                    "results": {"sanitized_text": html},
+                    "prompt_option": prompt_opt,
+                    "sub_prompt_option": sub_opt,
+                    "paginacao": paginacao,
+                }
+
+            elif sub_opt == "full_extraction":
+                # Debug opcional - salva a extração inteira no espaço da tarefa
+                if Constantes.FULL_DEBUG:
+                    Resultado._salvar_debug(armazenamento)
+
+                html, paginacao = Resultado._paginado(armazenamento, opcoes)
+                return {
+                    "results": {"extracted_html": html},
+                    "prompt_option": prompt_opt,
+                    "sub_prompt_option": "extracao_completa",  # Deve bater com o template
+                    "paginacao": paginacao,
+                }
+
+        # --- AI CHECK ---
+        elif prompt_opt == "ai_check":
+            ai_results = []
+            for raw in armazenamento.textos():
+                try:
+                    ai_results.append(json.loads(raw))
+                except Exception:
+                    continue
+            return {"results": {"ai_results": ai_results}, "prompt_option": prompt_opt}
+
+        # --- MATH OPERATION ---
+        elif prompt_opt == "math_operation":
+            html, paginacao = Resultado._paginado(armazenamento, opcoes)
+            return {"results": {"math_solutions": html}, "prompt_option": prompt_opt, "paginacao": paginacao}
+
+        logger.warning(f"Opção desconhecida: {prompt_opt} / {sub_opt}")
+        return None
@@ -0,0 +1,101 @@
+import hashlib
+import logging
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from src.utils.constantes import Constantes
+from src.utils.prompts import Prompts
+from src.modules.funcoes import Gemini
+from src.modules.cache import CacheRespostas
+from src.modules.consumo import Consumo
+from src.modules.metricas import Metricas
+
+logger = logging.getLogger(__name__)
+
+#==========================================================
+# Resumo hierárquico (map-reduce) de documentos longos
+#==========================================================
+class ResumoHierarquico:
+    """
+    Combina os resumos das páginas (etapa "map", feita pela tarefa) em
+    um único resumo do documento. A cada nível, os resumos são separados
+    em grupos de tamanho_grupo e cada grupo é resumido por uma chamada
+    ao Gemini, em paralelo; no último nível permitido (profundidade_max)
+    tudo o que restar vai em uma única chamada.
+
+    Cada resumo intermediário fica no CacheRespostas, com a chave
+    derivada dos textos do grupo: refazer a redução reaproveita os
+    níveis já calculados, e os resumos das páginas continuam no
+    armazenamento da tarefa.
+    """
+
+    @staticmethod
+    def aplicavel(metadados: dict) -> bool:
+        """Indica se a opção escolhida no formulário é um resumo."""
+        if not Constantes.RESUMO_HIERARQUICO["ativo"]:
+            return False
+        return metadados.get("prompt_option") == "summarize" or (
+            metadados.get("prompt_option") == "text_analysis"
+            and metadados.get("sub_prompt_option") == "summary"
+        )
+
+    @staticmethod
+    def _reduzir_grupo(grupo: list[str], modelo, usar_cache: bool) -> tuple[str, dict]:
+        """Resume um grupo de resumos; em caso de falha, devolve-os concatenados."""
+        if len(grupo) == 1:
+            return grupo[0], Consumo.vazio()
+        prompt = Prompts.PROMPT_RESUMO_REDUCAO.format(total=len(grupo))
+        conteudo = "\n\n".join(
+            f"{Prompts.DELIMITADOR_PARTE.format(n=n)}\n{texto}" for n, texto in enumerate(grupo, start=1)
+        )
+        usar_cache = usar_cache and Constantes.CACHE_RESPOSTAS_ATIVO
+        chave = None
+        if usar_cache:
+            chave = CacheRespostas.gerar_chave(hashlib.sha256(conteudo.encode("utf-8")).hexdigest(), prompt)
+            em_cache = CacheRespostas.obter(chave)
+            if em_cache is not None:
+                return em_cache, Consumo.vazio()
+
+        with Consumo.medir() as uso:
+            try:
+                texto = Gemini.gerar(modelo, [prompt, conteudo]).text
+            except Exception:
+                logger.exception(f"Falha ao reduzir um grupo de {len(grupo)} resumo(s)")
+                return "\n\n".join(grupo), uso
+        if not texto:
+            return "\n\n".join(grupo), uso
+        if chave:
+            CacheRespostas.salvar(chave, texto)
+        return texto, uso
+
+    @classmethod
+    def reduzir(cls, textos: list[str], modelo, usar_cache: bool = True,
+                tamanho_grupo: int | None = None, profundidade_max: int | None = None) -> str:
+        """Reduz os resumos das páginas a um único resumo do documento."""
+        cfg = Constantes.RESUMO_HIERARQUICO
+        tamanho_grupo = max(2, tamanho_grupo or cfg["tamanho_grupo"])
+        profundidade_max = max(1, profundidade_max or cfg["profundidade_max"])
+        if len(textos) <= 1:
+            return textos[0] if textos else ""
+
+        with Metricas.etapa("reduzir"), ThreadPoolExecutor(
+            max_workers=Constantes.MAX_PAGINAS_SIMULTANEAS, thread_name_prefix="resumo"
+        ) as executor:
+            for nivel in range(1, profundidade_max + 1):
+                if nivel == profundidade_max or len(textos) <= tamanho_grupo:
+                    grupos = [textos]
+                else:
+                    grupos = [textos[i:i + tamanho_grupo] for i in range(0, len(textos), tamanho_grupo)]
+                logger.info(f"Resumo hierárquico: nível {nivel}, {len(textos)} resumo(s) em {len(grupos)} grupo(s)")
+                # Cada grupo leva uma cópia do contexto (tarefa/função) para as métricas
+                futuros = [
+                    executor.submit(contextvars.copy_context().run, cls._reduzir_grupo, grupo, modelo, usar_cache)
+                    for grupo in grupos
+                ]
+                textos = []
+                for futuro in futuros:
+                    texto, uso = futuro.result()
+                    textos.append(texto)
+                    Consumo.acrescentar(uso)
+                if len(textos) == 1:
+                    break
+        return textos[0]
@@ -0,0 +1,921 @@
+import time
+import queue
+import bisect
+import sqlite3
+import asyncio
+import logging
+import threading
+from pathlib import Path
+from typing import Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor, wait
+from src.utils.constantes import Constantes
+from src.modules.funcoes import Arquivo, Gemini
+from src.modules.gemini_async import GeminiAsync
+from src.modules.armazenamento import ResultadosTarefa
+from src.modules.uploads import RegistroUploads
+from src.modules.metricas import Metricas
+from src.modules.consumo import Consumo
+from src.modules.resumo import ResumoHierarquico
+from src.modules.registro import RegistroTarefas
+
+logger = logging.getLogger(__name__)
+
+#==========================================================
+# Tarefa de processamento em segundo plano
+#==========================================================
+class Tarefa:
+    """
+    Representa o processamento de um upload. As páginas são preparadas
+    (texto nativo ou imagem renderizada) sob demanda para uma fila
+    limitada, consumida em paralelo pelo pool que as envia ao Gemini;
+    cada resultado é acrescentado ao armazenamento da tarefa assim que
+    a página termina. Com tamanho_lote > 1, as páginas seguem em lotes
+    para uma única chamada ao Gemini.
+
+    Os tokens de cada página são gravados com o resultado e somados ao
+    consumo da tarefa; com um orçamento (metadado "orcamento_tokens"),
+    as páginas restantes deixam de ser enviadas quando ele se esgota.
+
+    Cada página concluída já fica gravada no espaço da tarefa; ao retomar
+    (GerenciadorTarefas.retomar), indices traz só as páginas que faltam e
+    isoladas as que falharam antes, reenviadas uma a uma, fora dos lotes.
+
+    O andamento é publicado no RegistroTarefas, para os demais processos
+    do servidor. No encerramento do processo (GerenciadorTarefas.drenar),
+    as páginas já enviadas ao Gemini terminam e as demais ficam sem
+    registro, para o processo que retomar a tarefa.
+    """
+    AVISO_ORCAMENTO = "Página não processada: orçamento de tokens da tarefa esgotado."
+    # Registrado sem chamar o Gemini nas páginas que o Preprocessamento achou em branco
+    AVISO_EM_BRANCO = "Página em branco."
+
+    def __init__(self, paginas: Iterable[dict | None], total: int, modelo, prompt: str,
+                 armazenamento: ResultadosTarefa, usar_cache: bool = True,
+                 tamanho_lote: int = 1, indices: Iterable[int] | None = None,
+                 isoladas: Iterable[int] | None = None):
+        self.id = armazenamento.id
+        self.paginas = paginas
+        self.total = total
+        self.modelo = modelo
+        self.prompt = prompt
+        self.armazenamento = armazenamento
+        self.usar_cache = usar_cache
+        self.tamanho_lote = max(1, tamanho_lote)
+        # Páginas produzidas por paginas, em ordem (todas, ou as que faltam ao retomar)
+        self.indices = list(range(total)) if indices is None else sorted(indices)
+        self.isoladas = set(isoladas or ())
+        metadados = armazenamento.metadados()
+        # Opção escolhida no formulário e modo de leitura, usados como rótulos das métricas
+        self.funcao = metadados.get("prompt_option") or ""
+        self.modo = metadados.get("modo_leitura") or ""
+        # Tokens consumidos (incluindo execuções anteriores) e orçamento da tarefa (0 = sem limite)
+        self.consumo = Consumo.vazio()
+        Consumo.somar(self.consumo, metadados.get("consumo") or {})
+        self.orcamento = metadados.get("orcamento_tokens") or 0
+        self.interrompida = False
+        # Parada pelo encerramento do processo, com páginas ainda por fazer
+        self.drenada = False
+        self._pendentes = set(self.indices)
+        self.concluidas = total - len(self.indices)
+        self.estado = "pendente"  # pendente | processando | concluida | erro
+        self.erro = None
+        self._lock = threading.Lock()
+        self._fim = threading.Event()
+        # Eventos para o SSE: trechos parciais, páginas concluídas e fim
+        self._eventos: list[dict] = []
+        self._ultimo_evento = 0
+        self._novo_evento = threading.Condition(self._lock)
+
+    def status(self) -> dict:
+        """Retorna um resumo serializável do andamento da tarefa."""
+        with self._lock:
+            return {
+                "id": self.id,
+                "estado": self.estado,
+                "concluidas": self.concluidas,
+                "total": self.total,
+                "erro": self.erro,
+                "consumo": dict(self.consumo),
+                "orcamento": self.orcamento,
+                "interrompida": self.interrompida,
+            }
+
+    @classmethod
+    def falhou(cls, texto: str) -> bool:
+        """Página sem resultado válido (erro ou não enviada), reenviada ao retomar a tarefa."""
+        return texto.startswith("Erro ao processar") or texto == cls.AVISO_ORCAMENTO
+
+    def aguardar(self, timeout: float | None = None) -> bool:
+        """Bloqueia até a tarefa terminar (ou estourar o timeout)."""
+        return self._fim.wait(timeout)
+
+    def _sincronizar(self):
+        """Publica o andamento no RegistroTarefas (uma falha não interrompe a tarefa)."""
+        try:
+            if self.drenada:
+                RegistroTarefas.liberar(self.status())
+            else:
+                RegistroTarefas.atualizar(self.status())
+        except sqlite3.Error:
+            logger.warning(f"[{self.id}] Não foi possível atualizar o registro da tarefa", exc_info=True)
+
+    def _publicar(self, tipo: str, **dados):
+        """
+        Registra um evento e acorda os clientes SSE que aguardam. O
+        resultado de uma página (ou o reinício do seu texto) substitui os
+        trechos parciais dela, que não são mais reenviados a quem reconecta.
+        """
+        with self._novo_evento:
+            if tipo in ("pagina", "reinicio"):
+                self._eventos = [
+                    e for e in self._eventos
+                    if e["tipo"] not in ("parcial", "reinicio") or e["pagina"] != dados["pagina"]
+                ]
+            self._ultimo_evento += 1
+            self._eventos.append({"id": self._ultimo_evento, "tipo": tipo, **dados})
+            self._novo_evento.notify_all()
+
+    def eventos_desde(self, ultimo_id: int, timeout: float | None = None) -> list[dict]:
+        """
+        Retorna os eventos posteriores a ultimo_id, aguardando até timeout
+        segundos caso ainda não exista nenhum.
+        """
+        with self._novo_evento:
+            if self._ultimo_evento <= ultimo_id and not self._fim.is_set():
+                self._novo_evento.wait(timeout)
+            return self._eventos[bisect.bisect_right(self._eventos, ultimo_id, key=lambda e: e["id"]):]
+
+    def _parcial(self, indice: int) -> Callable[[str | None], None]:
+        """
+        Callback de streaming que publica os trechos de uma página (None:
+        a chamada foi repetida e o texto da página recomeça).
+        """
+        def publicar(trecho: str | None):
+            if trecho is None:
+                self._publicar("reinicio", pagina=indice)
+            else:
+                self._publicar("parcial", pagina=indice, texto=trecho)
+        return publicar
+
+    def _processar_pagina(self, indice: int, pagina: dict | None) -> tuple[str, dict]:
+        """Processa uma página e devolve o texto e os tokens consumidos."""
+        with Metricas.contexto(pagina=indice + 1), Consumo.medir() as uso:
+            return self._enviar_pagina(indice, pagina), uso
+
+    def _pular(self, indice: int, pagina: dict | None) -> tuple[int, str, None]:
+        """Descarta uma página não enviada por falta de orçamento."""
+        self._descartar(pagina)
+        return indice, self.AVISO_ORCAMENTO, None
+
+    @staticmethod
+    def _descartar(pagina: dict | None):
+        """Apaga a imagem renderizada de uma página que não será enviada."""
+        if pagina is not None and pagina["imagem"]:
+            Path(pagina["imagem"]).unlink(missing_ok=True)
+
+    def _enviar_pagina(self, indice: int, pagina: dict | None) -> str:
+        if pagina is None:
+            return "Erro ao processar imagem."
+        if pagina.get("em_branco"):
+            return self.AVISO_EM_BRANCO
+        if pagina["texto"] is not None:
+            logger.info(f"[{self.id}] Página {indice+1}/{self.total}: camada de texto")
+            return Gemini.processar_texto(
+                pagina["texto"], self.modelo, self.prompt, self.usar_cache,
+                ao_receber=self._parcial(indice)
+            )
+
+        img_path = pagina["imagem"]
+        logger.info(f"[{self.id}] Página {indice+1}/{self.total}: {img_path!r}")
+        try:
+            return Gemini.processar_imagem(
+                img_path, self.modelo, self.prompt, self.usar_cache, tarefa_id=self.id,
+                ao_receber=self._parcial(indice)
+            )
+        finally:
+            # A imagem renderizada não é mais necessária após o resultado
+            Path(img_path).unlink(missing_ok=True)
+
+    def _processar_lote(self, lote: list[tuple[int, dict | None]]) -> list[tuple[int, str, dict | None]]:
+        """
+        Processa um lote de páginas em uma única chamada; se a resposta
+        não puder ser dividida, cada página é processada individualmente.
+        O consumo de um lote é repartido igualmente entre suas páginas.
+        """
+        validas = [(i, p) for i, p in lote if p is not None and not p.get("em_branco")]
+        if len(validas) > 1 and not self.interrompida:
+            logger.info(
+                f"[{self.id}] Lote com páginas {', '.join(str(i+1) for i, _ in validas)}/{self.total}"
+            )
+            parciais = [self._parcial(i) for i, _ in validas]
+            with Consumo.medir() as uso_lote:
+                textos = Gemini.processar_lote(
+                    [p for _, p in validas], self.modelo, self.prompt, self.usar_cache, tarefa_id=self.id,
+                    ao_receber=lambda posicao, trecho: parciais[posicao](trecho)
+                )
+            if textos is not None:
+                for _, pagina in validas:
+                    if pagina["imagem"]:
+                        Path(pagina["imagem"]).unlink(missing_ok=True)
+                resultados = dict(zip((i for i, _ in validas), textos))
+                usos = dict(zip((i for i, _ in validas), Consumo.dividir(uso_lote, len(validas))))
+                return [
+                    (i, self.AVISO_EM_BRANCO, None) if p is not None and p.get("em_branco")
+                    else (i, resultados.get(i, "Erro ao processar imagem."), usos.get(i))
+                    for i, p in lote
+                ]
+            # A chamada que não pôde ser dividida também conta para a tarefa
+            self._acumular(uso_lote)
+
+        processados = []
+        for indice, pagina in lote:
+            if GerenciadorTarefas.drenando():
+                # Encerramento do processo: a página fica sem registro, para quem retomar
+                self._descartar(pagina)
+                continue
+            if self.interrompida:
+                processados.append(self._pular(indice, pagina))
+                continue
+            try:
+                texto, uso = self._processar_pagina(indice, pagina)
+            except Exception:
+                logger.exception(f"[{self.id}] Falha na página {indice+1}")
+                texto, uso = "Erro ao processar imagem.", None
+            processados.append((indice, texto, uso))
+        return processados
+
+    def _consumir(self, fila: queue.Queue):
+        """Retira lotes de páginas da fila até receber o sinal de fim (None)."""
+        while (lote := fila.get()) is not None:
+            if GerenciadorTarefas.drenando():
+                # Encerramento do processo: lotes ainda não enviados ficam para quem retomar
+                for _, pagina in lote:
+                    self._descartar(pagina)
+                continue
+            paginas = f"{lote[0][0]+1}-{lote[-1][0]+1}" if len(lote) > 1 else lote[0][0] + 1
+            try:
+                with Metricas.contexto(tarefa=self.id, funcao=self.funcao, pagina=paginas):
+                    processados = self._processar_lote(lote)
+            except Exception:
+                logger.exception(f"[{self.id}] Falha no lote {[i+1 for i, _ in lote]}")
+                processados = [(i, "Erro ao processar imagem.", None) for i, _ in lote]
+            for indice, texto, uso in processados:
+                self._registrar(indice, texto, uso)
+
+    def _acumular(self, uso: dict):
+        """Soma o consumo ao total da tarefa e a interrompe se o orçamento acabar."""
+        with self._lock:
+            Consumo.somar(self.consumo, uso)
+            esgotou = (bool(self.orcamento) and not self.interrompida
+                       and self.consumo["tokens_total"] >= self.orcamento)
+            if esgotou:
+                self.interrompida = True
+        if esgotou:
+            logger.warning(
+                f"[{self.id}] Orçamento de {self.orcamento} tokens esgotado; "
+                "as páginas restantes não serão enviadas"
+            )
+        # Por função, modo de leitura e dpi: mostra o que mais consome cota
+        rotulos = {"funcao": self.funcao, "modo": self.modo, "dpi": Constantes.POLITICA_IMAGEM["dpi"]}
+        for tipo in ("prompt", "imagem", "saida"):
+            if uso[f"tokens_{tipo}"]:
+                Metricas.contar("tokens", uso[f"tokens_{tipo}"], tipo=tipo, **rotulos)
+
+    def _registrar(self, indice: int, texto: str, uso: dict | None = None):
+        """Grava o resultado de uma página e avisa os clientes SSE."""
+        self.armazenamento.acrescentar(indice, texto, uso)
+        if uso is not None:
+            self._acumular(uso)
+            if uso["finalizacao"]:
+                Metricas.contar("finalizacoes", funcao=self.funcao, motivo=uso["finalizacao"])
+        with self._lock:
+            self._pendentes.discard(indice)
+            self.concluidas += 1
+        if texto == self.AVISO_ORCAMENTO:
+            resultado = "interrompida"
+        elif texto == self.AVISO_EM_BRANCO:
+            resultado = "em_branco"
+        else:
+            resultado = "erro" if texto.startswith("Erro ao processar") else "ok"
+        Metricas.contar("paginas", funcao=self.funcao, resultado=resultado)
+        self._sincronizar()
+        self._publicar("pagina", pagina=indice, texto=texto)
+
+    def _resumir(self):
+        """
+        Nas opções de resumo, reduz os resumos das páginas a um único
+        resumo do documento (ResumoHierarquico), gravado no armazenamento.
+        """
+        if not ResumoHierarquico.aplicavel(self.armazenamento.metadados()):
+            return
+        if not self.indices and self.armazenamento.resumo() is not None:
+            # Retomada sem páginas novas: o resumo gravado continua válido
+            return
+        if self.interrompida:
+            logger.warning(f"[{self.id}] Orçamento esgotado; resumo do documento não gerado")
+            return
+        textos = [
+            t for t in self.armazenamento.textos()
+            if not self.falhou(t) and t not in ("Nenhuma informação extraída.", self.AVISO_EM_BRANCO)
+        ]
+        if len(textos) < 2:
+            return
+        try:
+            with Consumo.medir() as uso:
+                resumo = ResumoHierarquico.reduzir(textos, self.modelo, self.usar_cache)
+            self.armazenamento.salvar_resumo(resumo)
+            logger.info(f"[{self.id}] Resumo do documento gerado a partir de {len(textos)} página(s)")
+        except Exception:
+            logger.exception(f"[{self.id}] Falha no resumo do documento")
+            return
+        self._acumular(uso)
+
+    def _concluir(self):
+        """
+        Marca como erro (ou não enviadas) as páginas que não chegaram a ser
+        processadas e, nos resumos, gera o resumo do documento inteiro.
+        """
+        motivo = self.AVISO_ORCAMENTO if self.interrompida else "Erro ao processar imagem."
+        for indice in sorted(self._pendentes):
+            self._registrar(indice, motivo)
+        self._resumir()
+        with self._lock:
+            self.estado = "concluida"
+        logger.info(
+            f"[{self.id}] Tarefa concluída ({self.total} página(s), "
+            f"{self.consumo['tokens_total']} tokens{', interrompida pelo orçamento' if self.interrompida else ''})"
+        )
+
+    def _drenar(self) -> bool:
+        """
+        Após o encerramento do processo parar a produção: se faltam páginas,
+        a tarefa volta a pendente (sem concluí-la) para ser retomada.
+        """
+        if not GerenciadorTarefas.drenando() or not self._pendentes:
+            return False
+        with self._lock:
+            self.drenada = True
+            self.estado = "pendente"
+        logger.warning(
+            f"[{self.id}] Processo em encerramento: {len(self._pendentes)} página(s) "
+            "ficam para o processo que retomar a tarefa"
+        )
+        return True
+
+    def _encerrar(self):
+        """Grava o consumo, libera os uploads da tarefa e publica o evento de fim."""
+        try:
+            metadados = self.armazenamento.metadados()
+            with self._lock:
+                metadados.update(consumo=dict(self.consumo), interrompida=self.interrompida)
+            self.armazenamento.salvar_metadados(metadados)
+        except OSError:
+            logger.warning(f"[{self.id}] Não foi possível gravar o consumo da tarefa", exc_info=True)
+        # Exclui da File API os uploads que só esta tarefa utilizava
+        RegistroUploads.liberar(self.id)
+        Metricas.contar("tarefas", funcao=self.funcao, estado=self.estado)
+        self._sincronizar()
+        self._fim.set()
+        self._publicar("fim", estado=self.estado)
+
+    def executar(self, executor: ThreadPoolExecutor):
+        """
+        Produz as páginas (renderização) nesta thread enquanto os
+        consumidores do pool as enviam ao Gemini.
+        """
+        with Metricas.contexto(tarefa=self.id, funcao=self.funcao):
+            self._produzir(executor)
+
+    def _produzir(self, executor: ThreadPoolExecutor):
+        with self._lock:
+            self.estado = "processando"
+        self._sincronizar()
+        fila = queue.Queue(maxsize=max(1, Constantes.FILA_PAGINAS_RENDERIZADAS // self.tamanho_lote))
+        n_lotes = -(-len(self.indices) // self.tamanho_lote)
+        n_consumidores = max(1, min(Constantes.MAX_PAGINAS_SIMULTANEAS, n_lotes))
+        consumidores = [executor.submit(self._consumir, fila) for _ in range(n_consumidores)]
+        try:
+            try:
+                lote = []
+                for indice, pagina in zip(self.indices, self.paginas):
+                    if GerenciadorTarefas.drenando():
+                        # Encerramento do processo: para de renderizar
+                        self._descartar(pagina)
+                        getattr(self.paginas, "close", lambda: None)()
+                        break
+                    if self.interrompida:
+                        # Orçamento esgotado: para de renderizar as páginas restantes
+                        self._pular(indice, pagina)
+                        getattr(self.paginas, "close", lambda: None)()
+                        break
+                    if indice in self.isoladas:
+                        fila.put([(indice, pagina)])
+                        continue
+                    lote.append((indice, pagina))
+                    if len(lote) == self.tamanho_lote:
+                        fila.put(lote)
+                        lote = []
+                if lote:
+                    fila.put(lote)
+            finally:
+                for _ in consumidores:
+                    fila.put(None)
+            wait(consumidores)
+
+            if not self._drenar():
+                self._concluir()
+        except Exception as e:
+            logger.exception(f"[{self.id}] Erro geral na tarefa")
+            with self._lock:
+                self.estado = "erro"
+                self.erro = str(e)
+        finally:
+            self._encerrar()
+
+#==========================================================
+# Tarefa assíncrona (entrada ASGI)
+#==========================================================
+class TarefaAsync(Tarefa):
+    """
+    Mesma tarefa, executada como corrotina no loop do asyncio: a
+    renderização roda em threads auxiliares e as chamadas ao Gemini
+    usam GeminiAsync, sem uma thread do SO por página em andamento.
+    Os lotes de páginas não se aplicam a esta variante.
+    """
+
+    async def _processar_pagina_async(self, indice: int, pagina: dict | None) -> tuple[str, dict]:
+        with Metricas.contexto(pagina=indice + 1), Consumo.medir() as uso:
+            return await self._enviar_pagina_async(indice, pagina), uso
+
+    async def _enviar_pagina_async(self, indice: int, pagina: dict | None) -> str:
+        if pagina is None:
+            return "Erro ao processar imagem."
+        if pagina.get("em_branco"):
+            return self.AVISO_EM_BRANCO
+        if pagina["texto"] is not None:
+            logger.info(f"[{self.id}] Página {indice+1}/{self.total}: camada de texto")
+            return await GeminiAsync.processar_texto(
+                pagina["texto"], self.modelo, self.prompt, self.usar_cache,
+                ao_receber=self._parcial(indice)
+            )
+
+        img_path = pagina["imagem"]
+        logger.info(f"[{self.id}] Página {indice+1}/{self.total}: {img_path!r}")
+        try:
+            return await GeminiAsync.processar_imagem(
+                img_path, self.modelo, self.prompt, self.usar_cache, tarefa_id=self.id,
+                ao_receber=self._parcial(indice)
+            )
+        finally:
+            Path(img_path).unlink(missing_ok=True)
+
+    async def _consumir_async(self, fila: asyncio.Queue):
+        while (item := await fila.get()) is not None:
+            indice, pagina = item
+            if GerenciadorTarefas.drenando():
+                # Encerramento do processo: a página fica sem registro, para quem retomar
+                self._descartar(pagina)
+                continue
+            if self.interrompida:
+                indice, texto, uso = self._pular(indice, pagina)
+            else:
+                try:
+                    texto, uso = await self._processar_pagina_async(indice, pagina)
+                except Exception:
+                    logger.exception(f"[{self.id}] Falha na página {indice+1}")
+                    texto, uso = "Erro ao processar imagem.", None
+            await asyncio.to_thread(self._registrar, indice, texto, uso)
+
+    async def executar_async(self):
+        """Renderiza as páginas em threads auxiliares e as consome no loop."""
+        # As tasks dos consumidores e as threads auxiliares herdam este contexto
+        with Metricas.contexto(tarefa=self.id, funcao=self.funcao):
+            await self._produzir_async()
+
+    async def _produzir_async(self):
+        with self._lock:
+            self.estado = "processando"
+        await asyncio.to_thread(self._sincronizar)
+        fila = asyncio.Queue(maxsize=Constantes.FILA_PAGINAS_RENDERIZADAS)
+        n_consumidores = max(1, min(Constantes.MAX_CHAMADAS_ASYNC, len(self.indices)))
+        consumidores = [asyncio.create_task(self._consumir_async(fila)) for _ in range(n_consumidores)]
+        try:
+            try:
+                paginas = iter(self.paginas)
+                fim = object()
+                for indice in self.indices:
+                    if (pagina := await asyncio.to_thread(next, paginas, fim)) is fim:
+                        break
+                    if GerenciadorTarefas.drenando():
+                        self._descartar(pagina)
+                        await asyncio.to_thread(getattr(paginas, "close", lambda: None))
+                        break
+                    if self.interrompida:
+                        self._pular(indice, pagina)
+                        await asyncio.to_thread(getattr(paginas, "close", lambda: None))
+                        break
+                    await fila.put((indice, pagina))
+            finally:
+                for _ in consumidores:
+                    await fila.put(None)
+            await asyncio.gather(*consumidores)
+            if not self._drenar():
+                await asyncio.to_thread(self._concluir)
+        except Exception as e:
+            logger.exception(f"[{self.id}] Erro geral na tarefa")
+            with self._lock:
+                self.estado = "erro"
+                self.erro = str(e)
+        finally:
+            await asyncio.to_thread(self._encerrar)
+
+#==========================================================
+# Tarefa de outro processo do servidor
+#==========================================================
+class TarefaRemota:
+    """
+    Visão somente leitura de uma tarefa processada por outro worker:
+    o andamento vem do RegistroTarefas e as páginas, do espaço da tarefa.
+    Oferece status, aguardar e eventos_desde como a Tarefa, mas sem os
+    trechos parciais do streaming (só páginas concluídas e o fim). Os ids
+    dos eventos não coincidem com os do processo dono: a primeira leitura
+    reenvia todas as páginas já gravadas, numeradas após ultimo_id.
+    """
+    INTERVALO_S = 0.5
+
+    def __init__(self, armazenamento: ResultadosTarefa, registro: dict):
+        self.id = armazenamento.id
+        self.armazenamento = armazenamento
+        self.total = registro["total"]
+        self._registro = registro
+        # Posição já lida do JSONL e quantos eventos de página foram gerados
+        self._posicao = 0
+        self._lidos = 0
+
+    @property
+    def estado(self) -> str:
+        return self._registro["estado"]
+
+    @property
+    def erro(self) -> str | None:
+        return self._registro["erro"]
+
+    def _atualizar(self) -> bool:
+        """Relê o registro; True enquanto o dono ainda processa a tarefa."""
+        if (registro := RegistroTarefas.obter(self.id)) is not None:
+            self._registro = registro
+        return self._registro["vivo"]
+
+    def status(self) -> dict:
+        self._atualizar()
+        return {
+            "id": self.id,
+            "estado": self.estado,
+            "concluidas": self._registro["concluidas"],
+            "total": self.total,
+            "erro": self.erro,
+            "consumo": self._registro["consumo"] or Consumo.vazio(),
+            "orcamento": self._registro["orcamento"],
+            "interrompida": self._registro["interrompida"],
+        }
+
+    def aguardar(self, timeout: float | None = None) -> bool:
+        limite = None if timeout is None else time.monotonic() + timeout
+        while self._atualizar():
+            if limite is not None and time.monotonic() >= limite:
+                return False
+            time.sleep(self.INTERVALO_S)
+        return True
+
+    def eventos_desde(self, ultimo_id: int, timeout: float | None = None) -> list[dict]:
+        """Páginas gravadas desde a última leitura e, quando o dono termina, o fim."""
+        limite = None if timeout is None else time.monotonic() + timeout
+        while True:
+            # O registro antes do disco: se o dono já terminou, todas as páginas já estão gravadas
+            vivo = self._atualizar()
+            registros, self._posicao = self.armazenamento.novos(self._posicao)
+            self._lidos = max(self._lidos, ultimo_id)
+            eventos = []
+            for registro in registros:
+                self._lidos += 1
+                eventos.append({"id": self._lidos, "tipo": "pagina",
+                                "pagina": registro["pagina"], "texto": registro["texto"]})
+            if not vivo:
+                eventos.append({"id": self._lidos + 1, "tipo": "fim", **self.status()})
+            if eventos or (limite is not None and time.monotonic() >= limite):
+                return eventos
+            time.sleep(self.INTERVALO_S)
+
+#==========================================================
+# Gerenciador das tarefas ativas
+#==========================================================
+class GerenciadorTarefas:
+    """
+    Mantém as tarefas do processo e o pool compartilhado que limita
+    quantas páginas vão ao Gemini ao mesmo tempo.
+
+    Com vários workers, cada tarefa é reivindicada no RegistroTarefas pelo
+    processo que a executa; os demais a enxergam como TarefaRemota
+    (localizar) e só a retomam quando o dono para de renovar o batimento.
+    """
+    _tarefas: dict[str, Tarefa] = {}
+    _lock = threading.Lock()
+    _executor: ThreadPoolExecutor | None = None
+    # Encerramento do processo em curso: nenhuma página nova é enviada
+    _drenando = threading.Event()
+
+    @classmethod
+    def _obter_executor(cls) -> ThreadPoolExecutor:
+        with cls._lock:
+            if cls._executor is None:
+                cls._executor = ThreadPoolExecutor(
+                    max_workers=Constantes.MAX_PAGINAS_SIMULTANEAS,
+                    thread_name_prefix="gemini",
+                )
+            return cls._executor
+
+    @classmethod
+    def criar(cls, paginas: Iterable[dict | None], total: int, modelo, prompt: str,
+              armazenamento: ResultadosTarefa, usar_cache: bool = True,
+              tamanho_lote: int = 1) -> Tarefa:
+        """Registra a tarefa e inicia o processamento em segundo plano."""
+        tarefa = Tarefa(paginas, total, modelo, prompt, armazenamento, usar_cache, tamanho_lote)
+        RegistroTarefas.reivindicar(tarefa.id, total)
+        cls._iniciar(tarefa)
+        logger.info(f"Tarefa {tarefa.id} criada com {tarefa.total} página(s)")
+        return tarefa
+
+    @classmethod
+    def _iniciar(cls, tarefa: Tarefa):
+        executor = cls._obter_executor()
+        with cls._lock:
+            cls._tarefas[tarefa.id] = tarefa
+        threading.Thread(
+            target=tarefa.executar,
+            args=(executor,),
+            name=f"tarefa-{tarefa.id}",
+            daemon=True,
+        ).start()
+
+    @classmethod
+    def criar_async(cls, paginas: Iterable[dict | None], total: int, modelo, prompt: str,
+                    armazenamento: ResultadosTarefa, usar_cache: bool = True) -> TarefaAsync:
+        """Registra a tarefa e a agenda como corrotina no loop em execução."""
+        tarefa = TarefaAsync(paginas, total, modelo, prompt, armazenamento, usar_cache)
+        RegistroTarefas.reivindicar(tarefa.id, total)
+        cls._iniciar_async(tarefa)
+        logger.info(f"Tarefa assíncrona {tarefa.id} criada com {tarefa.total} página(s)")
+        return tarefa
+
+    @classmethod
+    def _iniciar_async(cls, tarefa: TarefaAsync):
+        with cls._lock:
+            cls._tarefas[tarefa.id] = tarefa
+        # Mantém a referência da task para que não seja coletada antes do fim
+        tarefa.task = asyncio.get_running_loop().create_task(tarefa.executar_async())
+
+    @staticmethod
+    def pendentes(armazenamento: ResultadosTarefa) -> tuple[list[int], set[int]]:
+        """Páginas sem resultado válido e, entre elas, as que já falharam."""
+        total = armazenamento.metadados().get("total_paginas") or 0
+        validas, falhas = set(), set()
+        for registro in armazenamento.registros():
+            (falhas if Tarefa.falhou(registro["texto"]) else validas).add(registro["pagina"])
+        return [i for i in range(total) if i not in validas], falhas
+
+    @classmethod
+    def retomavel(cls, tarefa_id: str | None) -> bool:
+        """Indica se a tarefa parada tem páginas a refazer e os arquivos para isso."""
+        armazenamento = ResultadosTarefa.abrir(tarefa_id)
+        if armazenamento is None or cls.em_andamento(tarefa_id) or not armazenamento.metadados().get("documentos"):
+            return False
+        return bool(cls.pendentes(armazenamento)[0])
+
+    @classmethod
+    def retomar(cls, tarefa_id: str | None, modelo) -> Tarefa | TarefaRemota | None:
+        """
+        Recria a tarefa a partir do seu espaço em disco (após um reinício do
+        processo, um erro geral ou para repetir as páginas com erro): só as
+        páginas que faltam ou falharam são renderizadas e reenviadas. Uma
+        tarefa ainda em andamento é devolvida como está (TarefaRemota, se
+        outro processo a reivindicou antes).
+        """
+        tarefa, nova = cls._preparar_retomada(tarefa_id, modelo, Tarefa)
+        if nova:
+            cls._iniciar(tarefa)
+            cls._registrar_retomada(tarefa)
+        return tarefa
+
+    @classmethod
+    async def retomar_async(cls, tarefa_id: str | None, modelo) -> Tarefa | TarefaRemota | None:
+        """
+        Variante de retomar() para o loop do asyncio: a leitura do disco e a
+        reivindicação no RegistroTarefas rodam numa thread; no loop, só a
+        criação da task.
+        """
+        tarefa, nova = await asyncio.to_thread(cls._preparar_retomada, tarefa_id, modelo, TarefaAsync)
+        if nova:
+            # Outra requisição pode ter retomado a mesma tarefa enquanto esta esperava a thread
+            if cls.ativa(tarefa.id):
+                return cls.obter(tarefa.id)
+            cls._iniciar_async(tarefa)
+            cls._registrar_retomada(tarefa)
+        return tarefa
+
+    @classmethod
+    def _preparar_retomada(cls, tarefa_id: str | None, modelo,
+                           classe: type[Tarefa]) -> tuple[Tarefa | TarefaRemota | None, bool]:
+        """
+        Parte de retomar() que lê o disco e o registro: (tarefa, nova), em
+        que nova indica uma tarefa criada aqui e ainda não iniciada.
+        """
+        if cls.ativa(tarefa_id):
+            return cls.obter(tarefa_id), False
+        armazenamento = ResultadosTarefa.abrir(tarefa_id)
+        if armazenamento is None:
+            return None, False
+        metadados = armazenamento.metadados()
+        # Espaços criados antes dos metadados de retomada não guardam os documentos
+        if not metadados.get("documentos") or not metadados.get("total_paginas"):
+            return None, False
+
+        if not RegistroTarefas.reivindicar(tarefa_id, metadados["total_paginas"]):
+            return cls.observar(tarefa_id), False
+
+        faltam, falhas = cls.pendentes(armazenamento)
+        paginas = Arquivo.gerar_paginas(
+            metadados["documentos"], metadados.get("modo_leitura") or Constantes.MODO_LEITURA_PADRAO,
+            armazenamento.pasta_imagens, faltam,
+        )
+        tarefa = classe(
+            paginas, metadados["total_paginas"], modelo, metadados["prompt"], armazenamento,
+            metadados.get("usar_cache", True), metadados.get("tamanho_lote", 1),
+            indices=faltam, isoladas=falhas,
+        )
+        return tarefa, True
+
+    @staticmethod
+    def _registrar_retomada(tarefa: Tarefa):
+        Metricas.contar("tarefas_retomadas", funcao=tarefa.funcao)
+        logger.info(
+            f"Tarefa {tarefa.id} retomada: {len(tarefa.indices)} de {tarefa.total} página(s) a processar "
+            f"({len(tarefa.isoladas)} com erro anterior)"
+        )
+
+    @classmethod
+    def obter(cls, tarefa_id: str | None) -> Tarefa | None:
+        with cls._lock:
+            return cls._tarefas.get(tarefa_id) if tarefa_id else None
+
+    @classmethod
+    def remover(cls, tarefa_id: str | None):
+        with cls._lock:
+            cls._tarefas.pop(tarefa_id, None)
+
+    @classmethod
+    def observar(cls, tarefa_id: str | None) -> TarefaRemota | None:
+        """Tarefa que outro processo vivo está processando (ou None)."""
+        registro = RegistroTarefas.obter(tarefa_id)
+        armazenamento = ResultadosTarefa.abrir(tarefa_id)
+        if registro is None or armazenamento is None:
+            return None
+        if registro["estado"] in RegistroTarefas.ATIVOS and not registro["vivo"]:
+            return None
+        return TarefaRemota(armazenamento, registro)
+
+    @classmethod
+    def localizar(cls, tarefa_id: str | None) -> Tarefa | TarefaRemota | None:
+        """
+        Tarefa deste processo ou, se outro processo vivo a reivindicou
+        depois, a visão remota dela. None se ninguém a processa (a rota
+        decide se a retoma).
+        """
+        tarefa = cls.obter(tarefa_id)
+        if tarefa is not None and (cls.ativa(tarefa_id) or not RegistroTarefas.ativa(tarefa_id)):
+            return tarefa
+        return cls.observar(tarefa_id) or tarefa
+
+    @classmethod
+    def ativa(cls, tarefa_id: str) -> bool:
+        """Indica se a tarefa ainda está sendo processada neste processo."""
+        tarefa = cls.obter(tarefa_id)
+        return tarefa is not None and not tarefa.aguardar(0)
+
+    @classmethod
+    def em_andamento(cls, tarefa_id: str | None) -> bool:
+        """Indica se a tarefa está sendo processada neste ou em outro processo."""
+        return cls.ativa(tarefa_id) or RegistroTarefas.ativa(tarefa_id)
+
+    @classmethod
+    def drenando(cls) -> bool:
+        return cls._drenando.is_set()
+
+    @classmethod
+    def iniciar_drenagem(cls):
+        """Para de enviar páginas novas (chamado ao receber o sinal de encerramento)."""
+        if not cls._drenando.is_set():
+            cls._drenando.set()
+            logger.info("Encerramento do processo: drenando as tarefas em andamento")
+
+    @classmethod
+    def drenar(cls, timeout: float | None = None) -> int:
+        """
+        Encerramento gracioso: não envia mais páginas, espera as já enviadas
+        ao Gemini terminarem (até timeout, DRENAGEM_MAX_S por padrão) e
+        devolve as tarefas inacabadas ao registro, para outro processo
+        retomá-las. Retorna quantas tarefas ainda não pararam.
+        """
+        cls.iniciar_drenagem()
+        limite = time.monotonic() + (Constantes.DRENAGEM_MAX_S if timeout is None else timeout)
+        with cls._lock:
+            tarefas = list(cls._tarefas.values())
+        restantes = 0
+        for tarefa in tarefas:
+            if not tarefa.aguardar(max(0.0, limite - time.monotonic())):
+                restantes += 1
+        if restantes:
+            logger.warning(f"Encerramento do processo: {restantes} tarefa(s) não pararam a tempo")
+        return restantes
+
+    @classmethod
+    def descartar(cls, tarefa_id: str | None) -> bool:
+        """
+        Remove a tarefa e apaga seu espaço em disco, a menos que ainda
+        esteja em andamento (nesse caso o ColetorEspacos a remove depois).
+        """
+        armazenamento = ResultadosTarefa.abrir(tarefa_id)
+        if armazenamento is None or cls.em_andamento(tarefa_id):
+            return False
+        cls.remover(tarefa_id)
+        RegistroTarefas.remover(tarefa_id)
+        armazenamento.remover()
+        logger.info(f"Espaço da tarefa {tarefa_id} removido")
+        return True
+
+#==========================================================
+# Coletor dos espaços de tarefas abandonados
+#==========================================================
+class ColetorEspacos:
+    """
+    Remove em segundo plano os espaços de tarefas que ninguém limpou:
+    primeiro os sem atividade há mais de ESPACO_TTL_S e, enquanto a soma
+    de todos passar de ESPACO_QUOTA_MB, os inativos mais antigos.
+    Tarefas em andamento (em qualquer processo) e espaços recém-criados (ainda recebendo os
+    arquivos, ESPACO_CARENCIA_S) nunca são removidos.
+    """
+    _thread: threading.Thread | None = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def iniciar(cls):
+        """Inicia a thread do coletor (uma vez por processo)."""
+        with cls._lock:
+            if cls._thread is None:
+                cls._thread = threading.Thread(target=cls._executar, name="coletor-espacos", daemon=True)
+                cls._thread.start()
+
+    @classmethod
+    def _executar(cls):
+        while True:
+            try:
+                cls.coletar()
+            except Exception:
+                logger.exception("Falha na coleta dos espaços de tarefas")
+            time.sleep(Constantes.ESPACO_INTERVALO_S)
+
+    @classmethod
+    def coletar(cls) -> dict:
+        """Executa uma coleta e retorna o que foi removido e o espaço em uso."""
+        agora = time.time()
+        espacos = []
+        em_uso = 0
+        for tarefa_id in ResultadosTarefa.listar():
+            ultima, tamanho = ResultadosTarefa(tarefa_id).uso_disco()
+            em_uso += tamanho
+            if not GerenciadorTarefas.em_andamento(tarefa_id):
+                espacos.append((ultima, tamanho, tarefa_id))
+        espacos.sort()
+
+        quota = Constantes.ESPACO_QUOTA_MB * 1024 * 1024
+        removidos = {"ttl": 0, "quota": 0}
+        liberados = 0
+        for ultima, tamanho, tarefa_id in espacos:
+            idade = agora - ultima
+            if idade > Constantes.ESPACO_TTL_S:
+                motivo = "ttl"
+            elif em_uso > quota and idade > Constantes.ESPACO_CARENCIA_S:
+                motivo = "quota"
+            else:
+                continue
+            if GerenciadorTarefas.descartar(tarefa_id):
+                removidos[motivo] += 1
+                Metricas.contar("espacos_removidos", motivo=motivo)
+                em_uso -= tamanho
+                liberados += tamanho
+
+        if any(removidos.values()):
+            logger.info(
+                f"Coletor: {removidos['ttl']} espaço(s) expirado(s) e {removidos['quota']} "
+                f"acima da cota removidos ({liberados / 1e6:.1f} MB liberados)"
+            )
+        return {**removidos, "bytes_liberados": liberados, "bytes_em_uso": em_uso}
@@ -0,0 +1,163 @@
+import time
+import hashlib
+import logging
+import threading
+from datetime import datetime, timezone
+from src.modules.metricas import Metricas
+from src.utils.constantes import Constantes
+from src.utils.importacao import ModuloAdiado
+
+# Importado no primeiro envio (ou no aquecimento)
+genai = ModuloAdiado("google.generativeai")
+
+logger = logging.getLogger(__name__)
+
+#==========================================================
+# Registro de arquivos enviados à File API do Gemini
+#==========================================================
+class RegistroUploads:
+    """
+    Associa o hash do conteúdo de um arquivo ao handle já enviado à
+    File API, para que páginas idênticas (ou vários prompts sobre a
+    mesma página) reutilizem o mesmo upload. Cada upload guarda as
+    tarefas que o utilizam; quando a última tarefa é liberada, o
+    arquivo remoto é excluído.
+    """
+    # Margem de segurança antes da expiração informada pela API
+    MARGEM_EXPIRACAO = 10 * 60
+    # Validade padrão da File API quando o handle não informa (48 h)
+    VALIDADE_PADRAO = 48 * 60 * 60
+
+    _handles: dict[str, dict] = {}
+    # Lock por hash e quantas chamadas de obter() o utilizam no momento
+    _locks_hash: dict[str, dict] = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def hash_arquivo(caminho: str) -> str:
+        """SHA-256 do conteúdo do arquivo, lido em blocos."""
+        h = hashlib.sha256()
+        with open(caminho, "rb") as f:
+            for bloco in iter(lambda: f.read(1024 * 1024), b""):
+                h.update(bloco)
+        return h.hexdigest()
+
+    @classmethod
+    def _expiracao(cls, upload) -> float:
+        exp = getattr(upload, "expiration_time", None)
+        if isinstance(exp, datetime):
+            if exp.tzinfo is None:
+                exp = exp.replace(tzinfo=timezone.utc)
+            return exp.timestamp()
+        return time.time() + cls.VALIDADE_PADRAO
+
+    @staticmethod
+    def _aguardar_ativo(upload):
+        """
+        Faz polling até o arquivo ficar ACTIVE na File API. Passado
+        Constantes.TEMPO_MAX_UPLOAD_ATIVO_S, o upload é excluído e a
+        página falha (e pode ser refeita ao retomar a tarefa).
+        """
+        limite = time.monotonic() + Constantes.TEMPO_MAX_UPLOAD_ATIVO_S
+        with Metricas.etapa("polling"):
+            estado = genai.get_file(upload.name).state.name
+            while estado != "ACTIVE":
+                if estado == "FAILED":
+                    raise RuntimeError(f"Falha no processamento do upload {upload.name!r}")
+                if time.monotonic() > limite:
+                    RegistroUploads.excluir_remoto(upload)
+                    raise TimeoutError(
+                        f"Upload {upload.name!r} não ficou ACTIVE em {Constantes.TEMPO_MAX_UPLOAD_ATIVO_S} s"
+                    )
+                time.sleep(2)
+                estado = genai.get_file(upload.name).state.name
+
+    @staticmethod
+    def excluir_remoto(upload):
+        """Exclui o arquivo da File API; falhas apenas são registradas."""
+        try:
+            genai.delete_file(upload.name)
+        except Exception:
+            logger.warning(f"Não foi possível excluir o upload {upload.name!r}", exc_info=True)
+
+    @classmethod
+    def consultar(cls, hash_conteudo: str, dono: str | None = None):
+        """
+        Retorna o handle registrado para o hash se ainda estiver válido
+        (vinculando-o ao dono), ou None se não existir ou estiver expirando.
+        """
+        with cls._lock:
+            registro = cls._handles.get(hash_conteudo)
+            if registro and registro["expira_em"] - cls.MARGEM_EXPIRACAO > time.time():
+                registro["donos"].add(dono)
+                logger.debug(f"Upload reutilizado: {registro['upload'].name!r}")
+                return registro["upload"]
+            if registro:
+                logger.info(f"Upload expirado, reenviando: {registro['upload'].name!r}")
+            return None
+
+    @classmethod
+    def registrar(cls, hash_conteudo: str, upload, dono: str | None = None):
+        """
+        Registra um handle já ACTIVE, mantendo os donos anteriores. Um
+        handle substituído (expirado) é excluído da File API.
+        """
+        with cls._lock:
+            anterior = cls._handles.get(hash_conteudo)
+            cls._handles[hash_conteudo] = {
+                "upload": upload,
+                "expira_em": cls._expiracao(upload),
+                "donos": (anterior["donos"] if anterior else set()) | {dono},
+            }
+        logger.debug(f"Upload registrado: {upload.name!r}")
+        if anterior and anterior["upload"].name != upload.name:
+            cls.excluir_remoto(anterior["upload"])
+
+    @classmethod
+    def obter(cls, caminho: str, mime_type: str, hash_conteudo: str | None = None,
+              dono: str | None = None):
+        """
+        Retorna um handle ACTIVE para o arquivo, reutilizando o upload
+        existente enquanto ele não expira. Handles vencidos são
+        reenviados de forma transparente.
+        """
+        hash_conteudo = hash_conteudo or cls.hash_arquivo(caminho)
+        with cls._lock:
+            entrada = cls._locks_hash.setdefault(hash_conteudo, {"lock": threading.Lock(), "usos": 0})
+            entrada["usos"] += 1
+
+        try:
+            with entrada["lock"]:
+                upload = cls.consultar(hash_conteudo, dono)
+                if upload is not None:
+                    return upload
+                with Metricas.etapa("upload"):
+                    upload = genai.upload_file(caminho, mime_type=mime_type)
+                cls._aguardar_ativo(upload)
+                cls.registrar(hash_conteudo, upload, dono)
+                return upload
+        finally:
+            # O lock só sai do dicionário quando ninguém mais o aguarda
+            with cls._lock:
+                entrada["usos"] -= 1
+                if not entrada["usos"]:
+                    cls._locks_hash.pop(hash_conteudo, None)
+
+    @classmethod
+    def liberar(cls, dono: str | None):
+        """
+        Remove o vínculo da tarefa com seus uploads e exclui, em lote,
+        os arquivos remotos que não são mais usados por nenhuma tarefa.
+        """
+        excluir = []
+        with cls._lock:
+            for hash_conteudo, registro in list(cls._handles.items()):
+                registro["donos"].discard(dono)
+                if not registro["donos"]:
+                    excluir.append(registro["upload"])
+                    del cls._handles[hash_conteudo]
+
+        for upload in excluir:
+            cls.excluir_remoto(upload)
+        if excluir:
+            logger.info(f"{len(excluir)} upload(s) remoto(s) excluído(s)")
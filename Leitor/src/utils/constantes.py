@@ -12,8 +12,10 @@ class Constantes:
     CHAVE_API_GEMINI=""#os.environ.get("GEMINI_API_KEY", "sua_api_key_aqui")
     MODELO_GEMINI = 'gemini-2.0-flash'
  
-    # Configuração do Flask
-    CHAVE_FLASK = 'sua_chave_secreta'
+    # Configuração do Flask (a mesma chave em todos os processos e servidores)
+    CHAVE_FLASK_PADRAO = 'sua_chave_secreta'      # Pública: os servidores de produção recusam iniciar com ela
+    CHAVE_FLASK = os.environ.get("LEITOR_CHAVE_FLASK") or CHAVE_FLASK_PADRAO
+    DEBUG = os.environ.get("LEITOR_DEBUG") == "1"     # Servidor de desenvolvimento do Flask em modo debug
  
     # Configuração do modelo Gemini
     CONFIG_GEMINI = {
@@ -25,15 +27,144 @@ class Constantes:
     
     base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
     # Define o caminho base "Leitor/apoio/temp" a partir da raiz do pacote
-    pasta_base_temp = os.path.join(base_dir, "Leitor", "src", "temp")
+    # (LEITOR_PASTA_TEMP aponta para outra pasta, ex.: no benchmark)
+    pasta_base_temp = os.environ.get("LEITOR_PASTA_TEMP") or os.path.join(base_dir, "Leitor", "src", "temp")
     os.makedirs(pasta_base_temp, exist_ok=True)
     
     # Pastas temporárias
     PASTA_UPLOAD = os.path.join(pasta_base_temp, "uploads")
     PASTA_DADOS_TEMP = os.path.join(pasta_base_temp, "temp_data")
     PASTA_IMAGENS_TEMP = os.path.join(pasta_base_temp, "temp_images")
+    # Cache persistente (não é apagado pelo /limpar)
+    PASTA_CACHE = os.path.join(pasta_base_temp, "cache")
+    # Espaços das tarefas (temp_data/<id>/), removidos em segundo plano pelo ColetorEspacos
+    ESPACO_TTL_S = int(os.environ.get("LEITOR_ESPACO_TTL_S", 2 * 60 * 60))       # Sem atividade há mais que isso
+    ESPACO_QUOTA_MB = int(os.environ.get("LEITOR_ESPACO_QUOTA_MB", 2048))         # Soma de todos os espaços
+    ESPACO_CARENCIA_S = 5 * 60          # Espaços mais recentes não são removidos pela cota
+    ESPACO_INTERVALO_S = 60             # Intervalo entre as coletas
     # Extensões permitidas
     PERMITE_EXTENCAO_UPLOAD = {'pdf','jpg','png'}
+    # Limites dos uploads, verificados durante a gravação (antes de renderizar)
+    TAMANHO_MAX_ARQUIVO_MB = int(os.environ.get("LEITOR_TAMANHO_MAX_ARQUIVO_MB", 50))
+    TAMANHO_MAX_ENVIO_MB = int(os.environ.get("LEITOR_TAMANHO_MAX_ENVIO_MB", 200))   # Todos os arquivos de um envio
+    MAX_PAGINAS_ARQUIVO = int(os.environ.get("LEITOR_MAX_PAGINAS_ARQUIVO", 500))
+    MAX_PAGINAS_TAREFA = int(os.environ.get("LEITOR_MAX_PAGINAS_TAREFA", 2000))
+    BLOCO_UPLOAD = 1024 * 1024          # Tamanho dos blocos lidos e gravados
+
+    # Modo de produção: processos do servidor (gunicorn/uvicorn --workers) nesta
+    # máquina. As cotas do Gemini e os processos de renderização são divididos entre eles.
+    PROCESSOS_SERVIDOR = max(1, int(os.environ.get("LEITOR_PROCESSOS_SERVIDOR", 1)))
+    # Registro das tarefas visto por todos os processos (SQLite no espaço temporário,
+    # que deve ser compartilhado entre servidores diferentes)
+    ARQUIVO_REGISTRO_TAREFAS = os.path.join(pasta_base_temp, "tarefas.db")
+    BATIMENTO_S = 10                    # Intervalo em que o processo dono renova suas tarefas
+    BATIMENTO_EXPIRA_S = 45             # Sem renovação há mais que isso, outro processo retoma a tarefa
+    # Ao encerrar um processo: espera pelas páginas já enviadas ao Gemini; as demais
+    # ficam para o processo que retomar a tarefa
+    DRENAGEM_MAX_S = int(os.environ.get("LEITOR_DRENAGEM_MAX_S", 25))
+
+    # Processamento em segundo plano
+    # Número máximo de páginas enviadas ao Gemini ao mesmo tempo (todas as tarefas)
+    MAX_PAGINAS_SIMULTANEAS = int(os.environ.get("LEITOR_MAX_PAGINAS_SIMULTANEAS", 4))
+    # Chamadas simultâneas ao Gemini na entrada ASGI (asyncio, sem thread por chamada)
+    MAX_CHAMADAS_ASYNC = int(os.environ.get("LEITOR_MAX_CHAMADAS_ASYNC", 200))
+    # Páginas já renderizadas aguardando envio (limita disco e memória)
+    FILA_PAGINAS_RENDERIZADAS = 4
+
+    # Renderização de PDFs e conversão de imagens em processos separados
+    # 0 = na própria thread (sem tempos limite)
+    PROCESSOS_RENDERIZACAO = int(os.environ.get(
+        "LEITOR_PROCESSOS_RENDERIZACAO", max(1, (os.cpu_count() or 1) // PROCESSOS_SERVIDOR)
+    ))
+    TEMPO_MAX_PAGINA_S = 60             # Uma página (ou imagem) acima disso é descartada
+    TEMPO_MAX_DOCUMENTO_S = 15 * 60     # Páginas restantes de um documento acima disso são descartadas
+    TEMPO_MAX_UPLOAD_ATIVO_S = 120      # Upload que não fica ACTIVE na File API nesse tempo falha a página
+
+    # Cotas e concorrência das chamadas ao Gemini (AgendadorGemini), compartilhadas
+    # por todas as tarefas do processo. Ajuste rpm/tpm ao plano da chave de API.
+    COTA_GEMINI = {
+        # Cota da chave inteira, dividida entre os processos do servidor
+        "rpm": int(os.environ.get("LEITOR_GEMINI_RPM", 2000)) // PROCESSOS_SERVIDOR,        # Requisições por minuto
+        "tpm": int(os.environ.get("LEITOR_GEMINI_TPM", 4_000_000)) // PROCESSOS_SERVIDOR,   # Tokens de entrada por minuto
+        "rajada_s": 10,                 # Rajada máxima, em segundos de cota
+        "tokens_por_imagem": 1548,      # Estimativa: 6 blocos de 768 px x 258 tokens (A4 a 150 dpi)
+        "concorrencia_inicial": MAX_PAGINAS_SIMULTANEAS,
+        "concorrencia_max": MAX_CHAMADAS_ASYNC,
+        "latencia_alvo_s": 60,          # Acima disso a concorrência é reduzida em 10%
+        "tentativas": 5,                # Tentativas para erros de limite (429) e transitórios
+        "espera_base_s": 1,             # Backoff exponencial com jitter: base * 2^(n-1)
+        "espera_max_s": 60,
+    }
+
+    # Contabilidade de tokens (Consumo)
+    # Orçamento de tokens de cada tarefa (0 = sem limite); o formulário pode
+    # definir outro valor. Ao ultrapassá-lo, as páginas restantes não são enviadas.
+    ORCAMENTO_TOKENS_TAREFA = int(os.environ.get("LEITOR_ORCAMENTO_TOKENS_TAREFA", 0))
+    TOKENS_SAIDA_POR_PAGINA = 800       # Estimativa prévia da resposta de cada página
+
+    # Páginas agrupadas em uma única chamada ao Gemini, por função (1 = desativado).
+    # Resumos e traduções toleram lotes grandes; extrações precisam de lotes pequenos.
+    LOTE_PAGINAS = {
+        "text_analysis": 4,
+        "translation": 4,
+        "math_operation": 2,
+        "ai_check": 1,
+        "extract": 1,
+        "validate": 1,
+    }
+
+    # Resumo hierárquico (map-reduce) de documentos longos: os resumos das
+    # páginas são agrupados e resumidos de novo, em paralelo, até restar um só
+    RESUMO_HIERARQUICO = {
+        "ativo": True,
+        "tamanho_grupo": 10,        # Resumos combinados em cada chamada
+        "profundidade_max": 3,      # Níveis de redução; o último combina tudo o que restar
+    }
+
+    # Política de renderização/codificação das páginas enviadas ao Gemini.
+    # O Gemini divide imagens grandes em blocos de 768x768 px; 150 dpi em
+    # A4 (~1240x1754 px) já preserva texto corrido sem gastar blocos extras.
+    POLITICA_IMAGEM = {
+        "dpi": 150,
+        "formato": "JPEG",          # PNG | JPEG | WEBP
+        "qualidade": 85,            # JPEG/WEBP
+        "tons_de_cinza": "auto",    # auto (páginas só com texto) | sempre | nunca
+        "max_pixels": 2_500_000,    # Limite de pixels por página
+    }
+
+    # Pré-processamento das páginas rasterizadas antes da codificação (Preprocessamento):
+    # margens uniformes recortadas e folhas em branco não enviadas ao Gemini
+    PREPROCESSAMENTO = {
+        "ativo": os.environ.get("LEITOR_PREPROCESSAMENTO", "1") == "1",
+        "recortar_margens": True,
+        "margem_px": 12,            # Folga mantida em volta do conteúdo recortado
+        "tolerancia": 24,           # Diferença (0-255) da cor da borda que já conta como conteúdo
+        "pular_em_branco": True,
+        "branco_papel_min": 200,    # Só páginas com papel claro (0-255) podem ser puladas
+        "branco_desvio_max": 12,    # Nem páginas com variação de tons (desvio padrão) acima disso
+        "branco_contraste": 80,     # Tinta: pixels que diferem ao menos isso do papel
+        "branco_tinta_max": 0.0005, # Abaixo dessa fração de tinta a página está em branco
+        "endireitar": False,        # Corrige a inclinação de digitalizações (até inclinacao_max_graus)
+        "inclinacao_max_graus": 5,
+        "binarizar": False,         # Preto e branco (Otsu) nas páginas em tons de cinza
+    }
+
+    # Leitura da camada de texto nativa de PDFs digitais
+    # auto: usa o texto quando a página tem texto suficiente e nenhuma figura
+    # texto: usa o texto sempre que existir | imagem: sempre rasteriza
+    MODO_LEITURA_PADRAO = "auto"
+    TEXTO_MIN_CARACTERES = 200      # Mínimo de caracteres para considerar o texto utilizável
+    TEXTO_MAX_DESENHOS = 50         # Acima disso a página tem gráficos/tabelas desenhadas
+
+    # Página de resultado: páginas por bloco carregado sob demanda
+    RESULTADO_PAGINAS_POR_BLOCO = 20
+    # Grava FULL_DEBUG.txt no espaço da tarefa na extração completa (LEITOR_FULL_DEBUG=1)
+    FULL_DEBUG = os.environ.get("LEITOR_FULL_DEBUG") == "1"
+
+    # Cache de respostas do Gemini
+    CACHE_RESPOSTAS_ATIVO = True
+    CACHE_MAX_MB = 200                      # Tamanho máximo do cache em disco
+    CACHE_TTL_SEGUNDOS = 7 * 24 * 60 * 60   # Validade de cada resposta (7 dias)
  
 
 class Caminhos:
@@ -56,6 +187,7 @@ class Caminhos:
     PASTA_UPLOAD       = TEMP_DIR / 'uploads'
     PASTA_DADOS_TEMP   = TEMP_DIR / 'temp_data'
     PASTA_IMAGENS_TEMP = TEMP_DIR / 'temp_images'
+    PASTA_CACHE        = TEMP_DIR / 'cache'
 
     # 7) pasta de assets web
     STATIC_DIR    = UTILS_DIR / 'static'
@@ -0,0 +1,60 @@
+import time
+import importlib
+import threading
+
+#==========================================================
+# Importação sob demanda de bibliotecas pesadas
+#==========================================================
+class ModuloAdiado:
+    """
+    Substitui um `import` de módulo pesado (PyMuPDF, PIL, SDK do Gemini,
+    markdown): o módulo só é importado no primeiro acesso a um atributo,
+    fora da partida do aplicativo.
+
+        fitz = ModuloAdiado("fitz")     # no lugar de: import fitz
+        fitz.open(caminho)              # importa aqui, na primeira vez
+
+    As anotações de tipo que citam o módulo precisam de
+    `from __future__ import annotations` para não forçar a importação.
+    Como o nome do módulo é uma string, empacotadores (PyInstaller) não o
+    encontram sozinhos: liste-o em hiddenimports.
+    """
+    _lock = threading.Lock()
+    _registrados: dict[str, "ModuloAdiado"] = {}
+    # Nome do módulo → segundos gastos na importação
+    _tempos: dict[str, float] = {}
+
+    def __init__(self, nome: str):
+        self._nome = nome
+        self._modulo = None
+        with ModuloAdiado._lock:
+            ModuloAdiado._registrados.setdefault(nome, self)
+
+    def _carregar(self):
+        if self._modulo is None:
+            inicio = time.perf_counter()
+            modulo = importlib.import_module(self._nome)
+            # Só a primeira importação do processo conta (as demais vêm de sys.modules)
+            ModuloAdiado._tempos.setdefault(self._nome, time.perf_counter() - inicio)
+            self._modulo = modulo
+        return self._modulo
+
+    def __getattr__(self, atributo: str):
+        return getattr(self._carregar(), atributo)
+
+    def __repr__(self) -> str:
+        estado = "carregado" if self._modulo is not None else "adiado"
+        return f"<ModuloAdiado {self._nome!r} ({estado})>"
+
+    @classmethod
+    def carregar_todos(cls) -> dict[str, float]:
+        """Importa todos os módulos adiados (aquecimento) e devolve os tempos de importação."""
+        with cls._lock:
+            modulos = list(cls._registrados.values())
+        for modulo in modulos:
+            modulo._carregar()
+        return cls.tempos()
+
+    @classmethod
+    def tempos(cls) -> dict[str, float]:
+        return {nome: round(segundos, 4) for nome, segundos in cls._tempos.items()}
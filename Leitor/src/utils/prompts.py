@@ -1,5 +1,3 @@
-import os
-
 class Prompts:
     # ============================================
     # ANÁLISE DE TEXTO (3 modalidades)
@@ -123,6 +121,43 @@ class Prompts:
         "Retorne o documento ANOTADO com as soluções inseridas após cada problema."
     )
 
+    # ============================================
+    # LOTE DE PÁGINAS (várias páginas por chamada)
+    # ============================================
+
+    DELIMITADOR_PAGINA = "=== PÁGINA {n} ==="
+
+    PROMPT_LOTE_PAGINAS = (
+        "Você receberá {total} páginas de um documento, cada uma precedida pela linha "
+        "'=== PÁGINA N ==='. Instruções:\n"
+        "1. Aplique as instruções abaixo a CADA página separadamente\n"
+        "2. Inicie a resposta de cada página com a linha exata '=== PÁGINA N ===' "
+        "(N de 1 a {total}, na mesma ordem)\n"
+        "3. Não escreva nada antes da primeira linha de página nem junte páginas\n"
+        "4. Se uma página não tiver conteúdo, escreva apenas 'Nenhuma informação extraída.'\n\n"
+        "INSTRUÇÕES PARA CADA PÁGINA:\n"
+    )
+
+    # ============================================
+    # RESUMO HIERÁRQUICO (redução dos resumos das páginas)
+    # ============================================
+
+    DELIMITADOR_PARTE = "=== PARTE {n} ==="
+
+    PROMPT_RESUMO_REDUCAO = (
+        "Você receberá {total} resumos parciais de partes consecutivas de um mesmo documento, "
+        "cada um precedido pela linha '=== PARTE N ==='. Combine-os em UM ÚNICO resumo executivo:\n"
+        "1. Identifique os 3-7 tópicos principais do conjunto, unindo assuntos repetidos entre as partes\n"
+        "2. Para cada tópico, crie uma seção com:\n"
+        "   - Título descritivo (## Nível Markdown)\n"
+        "   - Parágrafo resumido (3-5 frases)\n"
+        "   - Destaque de dados numéricos ou fatos relevantes\n"
+        "3. Mantenha fidelidade aos resumos recebidos, sem acrescentar informações\n"
+        "4. Não mencione as partes nem os delimitadores\n"
+        "5. Formato de saída: Markdown com títulos, parágrafos e listas\n"
+        "Retorne SOMENTE o texto formatado, sem comentários adicionais."
+    )
+
     # ============================================
     # VALIDAÇÃO DE ENTRADA
     # ============================================
@@ -146,4 +181,30 @@ class Prompts:
         elif function_type == "math_operation":
             return Prompts.PROMPT_OPERACAO_MATEMATICA
         
-        return ""
\ No newline at end of file
+        return ""
+
+    @staticmethod
+    def montar_prompt(function_type, sub_type=None, target_lang=None):
+        """Monta o prompt final enviado ao Gemini a partir das opções do formulário"""
+        prompt_text = Prompts.get_prompt(function_type, sub_type)
+
+        if function_type == "text_analysis":
+            if sub_type == "summary":
+                prompt_text += Prompts.PROMPT_ANALISE_TEXTO_RESUMO
+
+            elif sub_type == "full_extraction":
+                prompt_text += Prompts.PROMPT_ANALISE_TEXTO
+
+            elif sub_type == "sanitize":
+                prompt_text += Prompts.PROMPT_ANALISE_TEXTO_HIGIENIZAR
+
+        elif function_type == "translation":
+            prompt_text += f"\n\nTraduzir para: {target_lang}\n"
+
+        elif function_type == "math_operation":
+            prompt_text += Prompts.PROMPT_OPERACAO_MATEMATICA
+
+        elif function_type == "ai_check":
+            prompt_text += Prompts.PROMPT_CHECAGEM_IA
+
+        return prompt_text
@@ -0,0 +1,132 @@
+document.addEventListener("DOMContentLoaded", () => {
+  // =========================
+  // Referências aos elementos principais
+  // =========================
+  const painel = document.getElementById("painel-processamento");
+  const barra = document.getElementById("barra-progresso");
+  const txtProgresso = document.getElementById("txt_progresso");
+  const carregando = document.getElementById("carregando");
+  const verResultado = document.getElementById("ver-resultado");
+  const preview = document.getElementById("preview");
+
+  const total = parseInt(painel.dataset.total, 10) || 0;
+  const incremental = painel.dataset.incremental === "1";
+  const statusUrl = painel.dataset.statusUrl;
+  const eventosUrl = painel.dataset.eventosUrl;
+  const resultadoUrl = painel.dataset.resultadoUrl;
+
+  // Páginas já concluídas (evita contagem dupla em reconexões do SSE)
+  const paginasConcluidas = new Set();
+
+  // =========================
+  // Atualiza a barra de progresso
+  // =========================
+  function atualizar(status) {
+    const total = status.total || 0;
+    const pct = total ? Math.round((status.concluidas / total) * 100) : 0;
+    barra.style.width = `${pct}%`;
+    barra.textContent = `${pct}%`;
+    txtProgresso.textContent = `${status.concluidas} de ${total} página(s) concluída(s)`;
+  }
+
+  // =========================
+  // Encerra o acompanhamento
+  // =========================
+  function finalizar(estado) {
+    // Com pré-visualização, o usuário continua lendo e abre o resultado quando quiser
+    if (incremental && estado === "concluida") {
+      carregando.style.display = "none";
+      verResultado.style.display = "inline-block";
+      return;
+    }
+    window.location.href = resultadoUrl;
+  }
+
+  // =========================
+  // Bloco de pré-visualização de uma página (mantido em ordem)
+  // =========================
+  function blocoPagina(pagina) {
+    let bloco = document.getElementById(`pagina-${pagina}`);
+    if (bloco) return bloco;
+
+    bloco = document.createElement("div");
+    bloco.id = `pagina-${pagina}`;
+    bloco.dataset.pagina = pagina;
+    bloco.style.whiteSpace = "pre-wrap";
+
+    const seguinte = Array.from(preview.children).find(el => parseInt(el.dataset.pagina, 10) > pagina);
+    preview.insertBefore(bloco, seguinte || null);
+    return bloco;
+  }
+
+  // =========================
+  // Acompanhamento via Server-Sent Events
+  // =========================
+  function acompanharEventos() {
+    const fonte = new EventSource(eventosUrl);
+
+    fonte.addEventListener("parcial", (e) => {
+      if (!incremental) return;
+      const dados = JSON.parse(e.data);
+      const bloco = blocoPagina(dados.pagina);
+      if (!bloco.dataset.concluida) bloco.textContent += dados.texto;
+    });
+
+    // Chamada repetida: o texto parcial da página recomeça
+    fonte.addEventListener("reinicio", (e) => {
+      if (!incremental) return;
+      const bloco = blocoPagina(JSON.parse(e.data).pagina);
+      if (!bloco.dataset.concluida) bloco.textContent = "";
+    });
+
+    fonte.addEventListener("pagina", (e) => {
+      const dados = JSON.parse(e.data);
+      paginasConcluidas.add(dados.pagina);
+      atualizar({ concluidas: paginasConcluidas.size, total });
+
+      if (incremental) {
+        const bloco = blocoPagina(dados.pagina);
+        bloco.style.whiteSpace = "";
+        bloco.innerHTML = dados.html;
+        bloco.dataset.concluida = "1";
+      }
+    });
+
+    fonte.addEventListener("fim", (e) => {
+      fonte.close();
+      finalizar(JSON.parse(e.data).estado);
+    });
+    // Em caso de erro o EventSource reconecta sozinho (Last-Event-ID)
+  }
+
+  // =========================
+  // Consulta o status (long-polling) até a tarefa terminar
+  // =========================
+  async function consultar() {
+    try {
+      const resp = await fetch(`${statusUrl}?aguardar=5`);
+      const status = await resp.json();
+
+      if (!resp.ok || status.estado === "desconhecida") {
+        window.location.href = "/";
+        return;
+      }
+
+      atualizar(status);
+
+      if (status.estado === "concluida" || status.estado === "erro") {
+        finalizar(status.estado);
+        return;
+      }
+    } catch (err) {
+      console.error("Erro ao consultar status: ", err);
+    }
+    setTimeout(consultar, 500);
+  }
+
+  if (window.EventSource) {
+    acompanharEventos();
+  } else {
+    consultar();
+  }
+});
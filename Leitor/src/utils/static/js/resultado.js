@@ -0,0 +1,46 @@
+document.addEventListener("DOMContentLoaded", () => {
+  // =========================
+  // Blocos seguintes do resultado, carregados ao chegar ao fim da página
+  // =========================
+  const sentinela = document.getElementById("carregar-mais");
+  const conteudo = document.getElementById("conteudo-resultado");
+  if (!sentinela || !conteudo) return;
+
+  const url = sentinela.dataset.url;
+  let proximo = parseInt(sentinela.dataset.proximo, 10);
+  let carregando = false;
+  // Dentro do contêiner: quando ele rola (extração completa), a sentinela
+  // só aparece ao chegar ao fim do texto
+  conteudo.appendChild(sentinela);
+
+  async function carregar() {
+    if (carregando || Number.isNaN(proximo)) return;
+    carregando = true;
+    try {
+      const resp = await fetch(`${url}?inicio=${proximo}`);
+      if (!resp.ok) throw new Error(`HTTP ${resp.status}`);
+      const bloco = await resp.json();
+      sentinela.insertAdjacentHTML("beforebegin", bloco.html);
+      if (bloco.proximo === null) {
+        observador.disconnect();
+        sentinela.remove();
+        return;
+      }
+      proximo = bloco.proximo;
+    } catch (erro) {
+      console.error("Erro ao carregar páginas:", erro);
+      sentinela.textContent = "Erro ao carregar mais páginas. Role novamente para tentar de novo.";
+      return;
+    } finally {
+      carregando = false;
+    }
+    // A sentinela pode continuar visível (bloco curto): carrega o próximo
+    const area = sentinela.getBoundingClientRect();
+    if (area.top < window.innerHeight) carregar();
+  }
+
+  const observador = new IntersectionObserver((entradas) => {
+    if (entradas.some((e) => e.isIntersecting)) carregar();
+  }, { rootMargin: "400px" });
+  observador.observe(sentinela);
+});
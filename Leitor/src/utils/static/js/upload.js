@@ -87,6 +87,14 @@ document.addEventListener("DOMContentLoaded", () => {
   clearTemp();
   window.addEventListener("beforeunload", clearTemp);
 
+  // =========================
+  // Aquecimento do servidor (bibliotecas, Gemini, renderização)
+  // depois que a página foi desenhada, para não atrasá-la
+  // =========================
+  window.addEventListener("load", () => {
+    requestAnimationFrame(() => setTimeout(() => navigator.sendBeacon("/aquecer"), 0));
+  });
+
   // =========================
   // Detecta reload ou back/forward e redireciona
   // =========================